@@ -0,0 +1,83 @@
+"""
+Compare construction time and memory of the eager LookupDict, the lazy
+LazyLookupDict and typed records on `questions` pages.
+
+Bodies dominate the memory of pages with bodies, run with --body-words 0 to
+compare the representations themselves.
+
+Usage::
+
+    python bench/bench_lookupdict.py [--pages N] [--body-words N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench.payloads import questions_page
+from pyse.structures import LookupDict, LazyLookupDict
+from pyse.records import Question, wrap_records
+
+classes = {
+    "eager": lambda j: LookupDict(data=j, name="response_wrapper"),
+    "lazy": lambda j: LazyLookupDict(data=j, name="response_wrapper"),
+    "typed": lambda j: wrap_records(j, Question),
+}
+
+def measure(mode, pages, body_words):
+    """
+    Build `pages` responses with one wrapper class, in this process
+    """
+    wrap = classes[mode]
+    raw = [json.dumps(questions_page(p, body_words=body_words)) for p in range(1, pages + 1)]
+
+    start = time.perf_counter()
+    for text in raw:
+        wrap(json.loads(text))
+    seconds = time.perf_counter() - start
+
+    # keep every page alive to measure the memory held by the wrappers
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    kept = [wrap(json.loads(text)) for text in raw]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "mode": mode,
+        "pages": pages,
+        "seconds_per_page": seconds / pages,
+        "traced_peak_bytes": peak,
+        "peak_rss_kb": rss_after,
+        "rss_growth_kb": rss_after - rss_before,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--mode", choices=classes, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.pages, args.body_words)))
+        return
+
+    # one process per mode, so peak RSS isn't shared between them
+    for mode in classes:
+        out = subprocess.run([sys.executable, __file__, "--mode", mode,
+                              "--pages", str(args.pages),
+                              "--body-words", str(args.body_words)],
+                             check=True, capture_output=True, text=True).stdout
+        print(out.strip())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Canned Stack Exchange API payloads for the benchmarks.
+
+The payloads are generated, not recorded, but follow the shape of real
+responses: a response wrapper around `pagesize` items with nested
+`owner` objects, tag lists and (optionally) bodies.
+"""
+
+import random
+
+_words = ("python json request list dict thread async cache error value "
+          "string function class module import return loop memory page").split()
+_tags = ["python", "javascript", "java", "c#", "php", "android", "html",
+         "jquery", "c++", "css", "ios", "mysql", "sql", "r", "node.js"]
+
+def _text(rng, words):
+    return " ".join(rng.choice(_words) for _ in range(words))
+
+def owner(rng, user_id):
+    return {
+        "reputation": rng.randint(1, 500000),
+        "user_id": user_id,
+        "user_type": "registered",
+        "accept_rate": rng.randint(0, 100),
+        "profile_image": f"https://www.gravatar.com/avatar/{user_id:032x}?s=128&d=identicon&r=PG",
+        "display_name": _text(rng, 2),
+        "link": f"https://stackoverflow.com/users/{user_id}/user",
+    }
+
+def question(rng, question_id, body_words=0):
+    created = 1600000000 + question_id * 37
+    q = {
+        "tags": rng.sample(_tags, rng.randint(1, 5)),
+        "owner": owner(rng, rng.randint(1, 10**7)),
+        "is_answered": rng.random() < 0.6,
+        "view_count": rng.randint(0, 100000),
+        "answer_count": rng.randint(0, 20),
+        "score": rng.randint(-5, 500),
+        "last_activity_date": created + rng.randint(0, 10**6),
+        "creation_date": created,
+        "question_id": question_id,
+        "content_license": "CC BY-SA 4.0",
+        "link": f"https://stackoverflow.com/questions/{question_id}/question",
+        "title": _text(rng, 10),
+    }
+    if body_words:
+        q["body"] = "<p>" + _text(rng, body_words) + "</p>"
+    return q
+
+def questions_page(page=1, pagesize=100, body_words=0, total=None, seed=0):
+    """
+    Build a `questions` response wrapper
+
+    :param page:       page number, selects the question ids
+    :param pagesize:   number of items on the page
+    :param body_words: words per question body, 0 for no bodies
+    :param total:      total number of questions, sets `has_more`
+    """
+    rng = random.Random(seed * 1000003 + page)
+    start = (page - 1) * pagesize
+    stop = start + pagesize if total is None else min(start + pagesize, total)
+    return {
+        "items": [question(rng, i + 1, body_words) for i in range(start, stop)],
+        "has_more": total is None or stop < total,
+        "quota_max": 10000,
+        "quota_remaining": 9999,
+    }
@@ -0,0 +1,320 @@
+"""
+Offline benchmark suite for pyse, run against the local stub server.
+
+Results are printed as JSON, and can be written to a file and compared
+against the results of another release.
+
+Usage::
+
+    python bench/run.py [--quick] [--latency 0.0] [--body-words 300]
+                        [--only NAME ...] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+import pyse
+import pyse.api
+from pyse import queries
+from pyse.structures import LookupDict, LazyLookupDict, URLTree
+from pyse.queries import _queries
+from pyse.records import Question, wrap_records
+from bench.payloads import questions_page
+from bench.stub_server import StubServer
+
+benchmarks = {}
+
+def benchmark(fn):
+    benchmarks[fn.__name__] = fn
+    return fn
+
+def summarize(seconds):
+    """
+    Summarize a list of per-operation timings
+    """
+    seconds = sorted(seconds)
+    return {
+        "n": len(seconds),
+        "mean_ms": statistics.mean(seconds) * 1000,
+        "p50_ms": seconds[len(seconds) // 2] * 1000,
+        "p95_ms": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1000,
+        "min_ms": seconds[0] * 1000,
+        "ops_per_s": len(seconds) / sum(seconds) if sum(seconds) else float("inf"),
+    }
+
+def timings(fn, n):
+    out = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return out
+
+@benchmark
+def query_latency(ctx):
+    """sequential query() calls for one 100-question page"""
+    def call():
+        pyse.query(queries.questions.ALL, site="stackoverflow", pagesize=100)
+    call()
+    return summarize(timings(call, ctx.n(200)))
+
+@benchmark
+def query_threaded(ctx):
+    """query() throughput from 8 threads"""
+    threads, per_thread = 8, ctx.n(50)
+
+    def worker():
+        for _ in range(per_thread):
+            pyse.query(queries.questions.ALL, site="stackoverflow", pagesize=30)
+
+    # every thread sends the same request. measure the transport, not
+    # coalescing, like before single-flight existed
+    previous = pyse.set_single_flight(None)
+    try:
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        seconds = time.perf_counter() - start
+    finally:
+        pyse.set_single_flight(previous)
+    return {"threads": threads, "requests": threads * per_thread,
+            "seconds": seconds, "ops_per_s": threads * per_thread / seconds}
+
+@benchmark
+def query_iter_pages(ctx):
+    """query_iter() over every question served by the stub"""
+    start = time.perf_counter()
+    items = sum(1 for _ in pyse.query_iter(queries.questions.ALL, site="stackoverflow"))
+    seconds = time.perf_counter() - start
+    return {"items": items, "seconds": seconds, "items_per_s": items / seconds}
+
+@benchmark
+def query_pipeline(ctx):
+    """query_pipeline() over every question served by the stub, against
+    sequential pages"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(fn):
+        start = time.perf_counter()
+        items = sum(len(page.items) for page in fn())
+        seconds = time.perf_counter() - start
+        return {"items": items, "seconds": seconds, "items_per_s": items / seconds}
+
+    def sequential():
+        page = 1
+        while True:
+            r = pyse.query(queries.questions.ALL, site="stackoverflow", pagesize=100,
+                           page=page, use_cache=False)
+            yield r
+            if not r.has_more:
+                return
+            page += 1
+
+    with ThreadPoolExecutor(4) as threads:
+        return {
+            "sequential": run(sequential),
+            "process_pool": run(lambda: pyse.query_pipeline(queries.questions.ALL,
+                                                            site="stackoverflow")),
+            "thread_pool": run(lambda: pyse.query_pipeline(queries.questions.ALL,
+                                                           site="stackoverflow",
+                                                           executor=threads)),
+        }
+
+@benchmark
+def query_stream_page(ctx):
+    """query_stream() for one 100-question page"""
+    def call():
+        for _ in pyse.query_stream(queries.questions.ALL, site="stackoverflow",
+                                   pagesize=100):
+            pass
+    return summarize(timings(call, ctx.n(100)))
+
+@benchmark
+def lookupdict(ctx):
+    """wrapping one decoded 100-question page, eagerly, lazily and as records"""
+    page = questions_page(body_words=ctx.body_words)
+    return {
+        "eager": summarize(timings(lambda: LookupDict(data=page, name="response_wrapper"),
+                                   ctx.n(200))),
+        "lazy": summarize(timings(lambda: LazyLookupDict(data=page, name="response_wrapper"),
+                                  ctx.n(200))),
+        "typed": summarize(timings(lambda: wrap_records(page, Question), ctx.n(200))),
+    }
+
+@benchmark
+def urltree(ctx):
+    """building the queries URLTree"""
+    return {"build": summarize(timings(lambda: URLTree(_queries, name="queries"),
+                                       ctx.n(50)))}
+
+# run in a fresh interpreter: time an import, and list the modules it loaded
+_import_script = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, sorted(set(sys.modules) - before)]))
+"""
+
+@benchmark
+def import_time(ctx):
+    """cold `import pyse`, and `import pyse` up to the first request"""
+    def run(statements):
+        seconds, modules = [], []
+        for _ in range(ctx.n(20)):
+            out = subprocess.run([sys.executable, "-c", _import_script % statements],
+                                 cwd=root, check=True, capture_output=True, text=True)
+            t, modules = json.loads(out.stdout)
+            seconds.append(t)
+        return dict(summarize(seconds), modules=len(modules),
+                    requests="requests" in modules)
+
+    def process(code):
+        return summarize(timings(lambda: subprocess.run([sys.executable, "-c", code],
+                                                        cwd=root, check=True), ctx.n(20)))
+
+    return {
+        "import_pyse": run("import pyse"),
+        "first_request": run("import pyse; pyse.query; pyse.get_transport()"),
+        # whole short-lived process, against an empty interpreter
+        "process": process("import pyse"),
+        "process_empty": process("pass"),
+    }
+
+@benchmark
+def build_url(ctx):
+    """building the URL of a 100-id lookup"""
+    ids = list(range(100))
+    return summarize(timings(
+        lambda: pyse.build_url(queries.questions.by_id.answers.ALL, ids=ids,
+                               site="stackoverflow", pagesize=100),
+        ctx.n(2000)))
+
+@benchmark
+def create_filter(ctx):
+    """create_filter() with an empty and a warm filter store"""
+    def cold():
+        pyse.set_filter_store(None)
+        pyse.create_filter(include=["question.body"], exclude=["question.title"])
+    def warm():
+        pyse.create_filter(include=["question.body"], exclude=["question.title"])
+    return {"cold": summarize(timings(cold, ctx.n(50))),
+            "warm": summarize(timings(warm, ctx.n(50)))}
+
+@benchmark
+def hooks_overhead(ctx):
+    """query() of a cached page with no hook, and with metrics enabled"""
+    pyse.set_cache(pyse.MemoryCache())
+    def call():
+        pyse.query(queries.questions.ALL, site="stackoverflow", pagesize=5, lazy=True)
+    call()
+    try:
+        off = summarize(timings(call, ctx.n(2000)))
+        pyse.enable_metrics()
+        on = summarize(timings(call, ctx.n(2000)))
+    finally:
+        pyse.disable_metrics()
+        pyse.set_cache(None)
+    return {"no_hooks": off, "metrics": on}
+
+class Context:
+    def __init__(self, quick, body_words):
+        self.quick = quick
+        self.body_words = body_words
+
+    def n(self, iterations):
+        return max(1, iterations // 10) if self.quick else iterations
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=root,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline):
+    """
+    Print how each mean/throughput changed relative to a baseline
+    """
+    def flatten(d, prefix=""):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                yield from flatten(v, prefix + k + ".")
+            else:
+                yield prefix + k, v
+
+    old = dict(flatten(baseline["results"]))
+    for key, value in flatten(results["results"]):
+        if not key.endswith(("mean_ms", "ops_per_s", "items_per_s")) or not old.get(key):
+            continue
+        ratio = value / old[key]
+        # lower is better for times, higher for rates
+        faster = ratio < 1 if key.endswith("_ms") else ratio > 1
+        print(f"{key:45} {old[key]:12.3f} -> {value:12.3f}  "
+              f"{'faster' if faster else 'slower'} x{max(ratio, 1 / ratio):.2f}",
+              file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="run fewer iterations")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="stub server latency per request, in seconds")
+    parser.add_argument("--body-words", type=int, default=300,
+                        help="words per question body, 0 for no bodies")
+    parser.add_argument("--total", type=int, default=2000,
+                        help="number of questions served by the stub")
+    parser.add_argument("--only", nargs="+", choices=benchmarks, help="benchmarks to run")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--compare", help="results file of a previous run to compare against")
+    args = parser.parse_args()
+
+    ctx = Context(args.quick, args.body_words)
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+
+    with StubServer(latency=args.latency, total=args.total,
+                    body_words=args.body_words) as server:
+        pyse.api.api_base_url = server.base_url
+        pyse.set_transport(pyse.SessionTransport(pool_maxsize=16))
+        # benchmark pyse, not the rate limiter
+        pyse.set_scheduler(pyse.Scheduler(pyse.TokenBucket(rate=10**9)))
+        pyse.set_cache(None)
+
+        for name in args.only or benchmarks:
+            pyse.set_filter_store(None)
+            results["results"][name] = benchmarks[name](ctx)
+            print(f"{name}: done", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
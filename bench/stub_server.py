@@ -0,0 +1,137 @@
+"""
+A local stand-in for api.stackexchange.com serving canned payloads.
+
+Every `questions` style endpoint serves generated question pages, honouring
+`page` and `pagesize`. `filters/create` returns a filter string derived from
+its parameters. Any other endpoint returns an empty page.
+
+Usage::
+
+    python bench/stub_server.py [--port 8000] [--latency 0.05] [--total 1000]
+                                [--body-words 300]
+
+Point pyse at it with::
+
+    pyse.api.api_base_url = "http://127.0.0.1:8000/2.2/"
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench.payloads import questions_page
+
+@functools.lru_cache(maxsize=4096)
+def _questions(page, pagesize, body_words, total):
+    # generating payloads is slower than serving them, build each page once
+    return questions_page(page, pagesize, body_words, total=total)
+
+@functools.lru_cache(maxsize=4096)
+def _gzip(content):
+    return gzip.compress(content, compresslevel=1)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, don't wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        config = self.server.config
+        if config["latency"]:
+            time.sleep(config["latency"])
+
+        url = urlsplit(self.path)
+        path = url.path.split("/2.2/", 1)[-1]
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        page = int(qs.get("page", 1))
+        pagesize = int(qs.get("pagesize", 30))
+
+        if path == "filters/create":
+            digest = hashlib.sha1(url.query.encode()).hexdigest()[:24]
+            body = {"items": [{"filter": "!" + digest, "filter_type": "safe"}],
+                    "has_more": False}
+        elif path.startswith("questions"):
+            body = _questions(page, pagesize, config["body_words"], config["total"])
+            if "/" in path:
+                # questions/{ids}
+                ids = [int(i) for i in path.split("/")[1].split(";") if i.isdigit()]
+                items = [dict(item, question_id=question_id)
+                         for item, question_id in zip(body["items"], ids)]
+                body = dict(body, items=items, has_more=False)
+        else:
+            body = {"items": [], "has_more": False}
+
+        with self.server.lock:
+            self.server.requests += 1
+
+        content = json.dumps(body).encode()
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            content = _gzip(content)
+            headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(len(content))
+
+        self.send_response(200)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    """
+    The stub API server. Use it as a context manager to serve from a
+    background thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, total=1000, body_words=0):
+        """
+        :param port:       port to listen on, 0 for any free port
+        :param latency:    seconds to wait before answering each request
+        :param total:      number of questions served across all pages
+        :param body_words: words per question body, 0 for no bodies
+        """
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.config = {"latency": latency, "total": total, "body_words": body_words}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:%d/2.2/" % self.server_port
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--total", type=int, default=1000)
+    parser.add_argument("--body-words", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency, args.total, args.body_words)
+    print(f"serving on {server.base_url}", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,136 @@
+"""
+pyse
+~~~~
+
+A Python wrapper for the Stack Exchange API.
+
+Submodules are imported on first use of one of their names, so that
+`import pyse` stays cheap for short-lived programs. `requests` is only
+imported once the first request is sent.
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import importlib
+
+# the URL tree is cheap to build, and has to be bound before any submodule
+# imports `pyse.queries`, which would bind the module over it
+from .queries import queries
+
 # TODO: Only expose API functions, not helper functions like `get_json()`
-from .api import *
-from .structures import *
-from .types import *
-from .utils import *
+# public name -> submodule defining it
+_exports = {
+    # api
+    "api_base_url": "api",
+    "vector_limits": "api",
+    "max_batch_workers": "api",
+    "build_url": "api",
+    "query": "api",
+    "query_stream": "api",
+    "query_iter": "api",
+    "create_filter": "api",
+    "projection_fields": "api",
+    "projection_filter": "api",
+    # client
+    "Client": "client",
+    "get_client": "client",
+    "set_client": "client",
+    # structures
+    "LookupDict": "structures",
+    "LazyLookupDict": "structures",
+    "LazyList": "structures",
+    "Endpoint": "structures",
+    "EndpointRegistry": "structures",
+    "URLTree": "structures",
+    # types
+    "filters": "types",
+    "default_parameters": "types",
+    "user_classes": "types",
+    # records
+    "Record": "records",
+    "Question": "records",
+    "Answer": "records",
+    "Comment": "records",
+    "User": "records",
+    "Tag": "records",
+    "ShallowUser": "records",
+    # utils
+    "json_loads": "utils",
+    "set_json_backend": "utils",
+    "get_response": "utils",
+    "get_json": "utils",
+    "raise_request_exception": "utils",
+    # transport
+    "Transport": "transport",
+    "SessionTransport": "transport",
+    "CassetteTransport": "transport",
+    "get_transport": "transport",
+    "set_transport": "transport",
+    # stream
+    "StreamedResponse": "stream",
+    # cache
+    "Cache": "cache",
+    "MemoryCache": "cache",
+    "SqliteCache": "cache",
+    "FilterStore": "cache",
+    "get_cache": "cache",
+    "set_cache": "cache",
+    "get_filter_store": "cache",
+    "set_filter_store": "cache",
+    # store
+    "ObjectStore": "store",
+    "get_object_store": "store",
+    "set_object_store": "store",
+    # scheduler
+    "TokenBucket": "scheduler",
+    "FileTokenBucket": "scheduler",
+    "Scheduler": "scheduler",
+    "get_scheduler": "scheduler",
+    "set_scheduler": "scheduler",
+    # hooks
+    "register_hook": "hooks",
+    "unregister_hook": "hooks",
+    "metrics": "hooks",
+    "enable_metrics": "hooks",
+    "disable_metrics": "hooks",
+    # coalesce
+    "SingleFlight": "coalesce",
+    "get_single_flight": "coalesce",
+    "set_single_flight": "coalesce",
+    # parallel
+    "query_sites": "parallel",
+    "query_sharded": "parallel",
+    "query_counts": "parallel",
+    "CountTable": "parallel",
+    # pipeline
+    "query_pipeline": "pipeline",
+    # crawler
+    "CrawlQueue": "crawler",
+    "JsonlSink": "crawler",
+    "crawl": "crawler",
+    # incremental
+    "SyncState": "incremental",
+    "sync": "incremental",
+}
+
+# no submodule may share a name with an export, importing the submodule
+# would bind it on the package over the export
+_submodules = {"aio", "api", "cache", "client", "coalesce", "crawler", "hooks", "incremental",
+               "parallel", "pipeline", "queries", "records", "scheduler", "store", "stream",
+               "structures", "transport", "types", "utils"}
+
+__all__ = ["queries"] + list(_exports)
+
+def __getattr__(name):
+    if name in _exports:
+        module = importlib.import_module("." + _exports[name], __name__)
+        value = globals()[name] = getattr(module, name)
+        return value
+    elif name in _submodules:
+        return importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | _submodules)
@@ -0,0 +1,374 @@
+"""
+pyse.aio
+~~~~~~~~
+
+This module implements an asyncio version of the Stack Exchange API wrapper.
+It requires the optional ``aiohttp`` package.
+
+Example::
+
+    >>> import asyncio
+    >>> from pyse import aio, queries
+    >>> async def main():
+    ...     return await asyncio.gather(*(
+    ...         aio.query(queries.tags.by_tag.INFO, tags=t, site="stackoverflow")
+    ...         for t in ("python", "rust", "go")))
+    >>> asyncio.run(main())
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .api import _wrap_response
+from .client import get_client
+from . import hooks
+from . import utils
+from .utils import raise_request_exception
+from .transport import default_timeout
+
+class AsyncTransport:
+    """
+    Base class for asyncio HTTP transports.
+
+    :meth:`get` returns a tuple (status_code, content) where content is the
+    raw response body as bytes.
+    """
+    async def get(self, url, timeout=None):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class AiohttpTransport(AsyncTransport):
+    """
+    A pooled, keep-alive transport backed by ``aiohttp.ClientSession``.
+
+    At most `max_in_flight` requests are sent at once, any further requests
+    wait for a free slot.
+    """
+    def __init__(self, max_in_flight=50, limit_per_host=None,
+                 timeout=default_timeout, headers=None):
+        """
+        Create a new AiohttpTransport
+
+        :param max_in_flight:  maximum number of concurrent requests
+        :param limit_per_host: maximum number of pooled connections per host,
+                               defaults to `max_in_flight`
+        :param timeout:        default timeout, seconds or (connect, read)
+        :param headers:        extra headers sent with every request
+        """
+        if aiohttp is None:
+            raise ImportError("pyse.aio requires the 'aiohttp' package")
+
+        self.max_in_flight = max_in_flight
+        self.limit_per_host = limit_per_host or max_in_flight
+        self.timeout = timeout
+        self.headers = {"Accept-Encoding": "gzip"}
+        if headers:
+            self.headers.update(headers)
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def _client_timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    def _ensure_session(self):
+        # an aiohttp session is bound to the event loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight,
+                                             limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self._client_timeout(self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return self._session
+
+    async def get(self, url, timeout=None):
+        session = self._ensure_session()
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = self._client_timeout(timeout)
+
+        async with self._semaphore:
+            async with session.get(url, **kwargs) as r:
+                # will manually handle bad requests (400) when needed
+                if r.status not in (200, 400):
+                    r.raise_for_status()
+                return r.status, await r.read()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+_transport = None
+
+def get_transport():
+    """
+    Get the transport used by :func:`pyse.aio.query`, creating a default
+    :class:`AiohttpTransport` on first use.
+    """
+    global _transport
+    if _transport is None:
+        _transport = AiohttpTransport()
+    return _transport
+
+def set_transport(transport):
+    """
+    Replace the transport used by :func:`pyse.aio.query`
+
+    :param transport: an :class:`AsyncTransport`, or None to restore the default
+
+    :returns: the previous transport
+    """
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+class AsyncSingleFlight:
+    """
+    Runs one coroutine at a time per key, sharing its outcome with every
+    task that asks for the same key while it runs. Asynchronous version of
+    :class:`pyse.coalesce.SingleFlight`.
+    """
+    def __init__(self):
+        # futures are bound to their event loop, so calls are keyed per loop
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """
+        Await `fn()`, or wait for the call already running for `key`
+
+        :param key: key of the call, e.g. the request URL
+        :param fn:  function taking no arguments and returning an awaitable
+
+        :returns: tuple (result, shared) where `shared` is whether the result
+            came from another task's call
+
+        :raises: the exception raised by `fn`, for every caller
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        while True:
+            future = self._calls.get(call_key)
+            if future is None:
+                break
+            try:
+                # a waiter being cancelled must not cancel the shared call
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the first caller was cancelled, try again
+                continue
+            except BaseException:
+                self.shared += 1
+                raise
+            self.shared += 1
+            return result, True
+
+        future = self._calls[call_key] = loop.create_future()
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception retrieved, no task may be waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[call_key]
+        return result, False
+
+_single_flight = AsyncSingleFlight()
+
+def get_single_flight():
+    """
+    Get the :class:`AsyncSingleFlight` coalescing requests of
+    :func:`pyse.aio.query`, or None if coalescing is off
+    """
+    return _single_flight
+
+def set_single_flight(single_flight):
+    """
+    Replace the :class:`AsyncSingleFlight` coalescing requests of
+    :func:`pyse.aio.query`
+
+    :param single_flight: an :class:`AsyncSingleFlight`, or None to turn
+                          coalescing off
+
+    :returns: the previous one
+    """
+    global _single_flight
+    previous, _single_flight = _single_flight, single_flight
+    return previous
+
+async def get_json(url, timeout=None, transport=None):
+    """
+    GET a URL and decode the JSON response
+
+    :param url:       full request URL
+    :param timeout:   per-request timeout, overrides the transport default
+    :param transport: transport to use instead of the default transport
+    """
+    if transport is None:
+        transport = get_transport()
+    status, content = await transport.get(url, timeout=timeout)
+    return utils.json_loads(content)
+
+async def _fetch_json(client, endpoint, url):
+    """
+    GET a query URL through the scheduler of `client`. The scheduler blocks,
+    so it waits in the default executor, off the event loop.
+
+    :returns: tuple (decoded response, status code, body size, timings)
+    """
+    scheduler = client.scheduler
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await loop.run_in_executor(None, scheduler.wait, endpoint)
+    sent = time.perf_counter()
+    status, content = await get_transport().get(url)
+    received = time.perf_counter()
+    j = utils.json_loads(content)
+    decoded = time.perf_counter()
+    scheduler.update(endpoint, j)
+
+    timings = {"wait": sent - start, "network": received - sent,
+               "decode": decoded - received}
+    return j, status, len(content), timings
+
+async def _get_json(client, endpoint, url, use_cache=True, refresh_cache=False, event=None):
+    """
+    GET a query URL through the response cache, scheduler and object store
+    of `client`. Asynchronous version of :meth:`pyse.Client._get_json`.
+    """
+    cache, j = client._cached_json(url, use_cache, refresh_cache, event)
+    if j is not None:
+        return j
+
+    # identical GETs in flight share one request
+    if _single_flight is not None:
+        fetched, shared = await _single_flight.do(
+            url, lambda: _fetch_json(client, endpoint, url))
+    else:
+        fetched, shared = await _fetch_json(client, endpoint, url), False
+    return client._keep_json(endpoint, url, cache, fetched, shared, event)
+
+async def _project_async(client, endpoint, fields, parameters):
+    # creating the filter is a blocking request the first time, keep it off
+    # the event loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, client._project, endpoint, fields, parameters)
+
+async def query(endpoint, use_cache=True, refresh_cache=False, lazy=False, typed=False,
+                fields=None, **parameters):
+    """
+    Query the Stack Exchange API. Asynchronous version of :func:`pyse.query`.
+
+    :param endpoint: URL endpoint of query
+    :param use_cache: whether to use the response cache, see :func:`pyse.query`
+    :param refresh_cache: ignore any cached response, but cache the response
+        of this call
+    :param lazy: return a :class:`pyse.LazyLookupDict` instead of a
+        :class:`pyse.LookupDict`
+    :param typed: make the items compact records, see :func:`pyse.query`
+    :param fields: list of item fields to fetch, see :func:`pyse.query`
+    :param parameters: keyword arguments for parameters in API request.
+
+    Requests are built and sent with the key, base URL, defaults, response
+    cache, request scheduler, object store and hooks of the default client,
+    like :func:`pyse.query`.
+    Identical GETs awaited concurrently share one request, see
+    :func:`set_single_flight`.
+
+    :raises ValueError: if the passed URL endpoint expects a specific keyword
+        argument, but did not get one.
+    """
+    client = get_client()
+    if fields is not None:
+        await _project_async(client, endpoint, fields, parameters)
+
+    method, url = client._build_query(endpoint, parameters)
+
+    if method == "GET":
+        event = hooks.new_event(endpoint, url, method) if hooks.active() else None
+        try:
+            j = await _get_json(client, endpoint, url, use_cache=use_cache,
+                                refresh_cache=refresh_cache, event=event)
+        except Exception as e:
+            if event is not None:
+                hooks.emit(event, error=e)
+            raise
+
+        if event is not None:
+            hooks.emit(event, j)
+        return _wrap_response(j, lazy, typed, endpoint)
+    elif method == "POST":
+        raise NotImplementedError("POST not implemented")
+
+async def query_iter(endpoint, max_items=None, max_pages=None, fields=None, **parameters):
+    """
+    Iterate over the items of a query, fetching pages as they are needed.
+    Asynchronous version of :func:`pyse.query_iter`.
+
+    :param endpoint:   URL endpoint of query
+    :param max_items:  stop after yielding this many items
+    :param max_pages:  stop after fetching this many pages
+    :param fields:     list of item fields to fetch, see :func:`pyse.query`
+    :param parameters: keyword arguments for parameters in API request.
+
+    :raises ValueError: if the API returns an error for any page
+    """
+    if fields is not None:
+        await _project_async(get_client(), endpoint, fields, parameters)
+
+    parameters.setdefault("pagesize", 100)
+    page = parameters.pop("page", 1)
+    items_seen = 0
+    pages_seen = 0
+
+    while ((max_pages is None or pages_seen < max_pages) and
+           (max_items is None or items_seen < max_items)):
+        response = await query(endpoint, page=page, **parameters)
+        if response["error_id"] is not None:
+            raise_request_exception(ValueError, response)
+        pages_seen += 1
+
+        items, has_more = response["items"] or [], response["has_more"]
+        response = None
+
+        for item in items:
+            yield item
+            items_seen += 1
+            if max_items is not None and items_seen >= max_items:
+                return
+
+        if not has_more:
+            return
+        items = None
+        page += 1
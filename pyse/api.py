@@ -4,41 +4,59 @@ pyse.api
 
 This module implements the Stack Exchange API wrapper.
 
+The functions of this module query the default client, see
+:mod:`pyse.client`.
+
 :copyright: (c) 2020 by Jake Grossman
 :license: MIT, see LICENSE for more details.
 """
-import requests
-import json
-from sys import maxsize
-from string import Formatter
-
-from .structures import LookupDict
+from .structures import LookupDict, LazyLookupDict
 from .types import filters, default_parameters
-from .utils import get_json, raise_request_exception
 from .queries import queries
+from .records import record_type, wrap_records, nested_types
+# pyse.client imports this module, its attributes are only used in calls
+from . import client as _client
 
 api_base_url = "https://api.stackexchange.com/2.2/"
 
-# FIXME: Needs tests
-def query(endpoint, **parameters):
+# maximum number of semicolon-joined values the API accepts per vectorized
+# format argument. longer lists are split into batches by `query()`
+vector_limits = {
+    "ids": 100,
+    "tags": 20,
+    "access_tokens": 20,
+}
+
+# number of batches of a split query sent concurrently
+max_batch_workers = 8
+
+# response wrapper fields kept by projection filters, so pagination, the
+# scheduler and error handling keep working
+projection_wrapper_fields = [".backoff", ".error_id", ".error_message", ".error_name",
+                             ".has_more", ".items", ".quota_max", ".quota_remaining"]
+
+def _build_query(endpoint, parameters, base_url=None):
     """
-    Query the Stack Exchange API.
+    Build the HTTP method and full request URL of a query.
 
-    :param site: Stack Exchange site to query
-    :param endpoint: URL endpoint of query
-    :param parameters: keyword arguments for parameters in API request.
+    :param endpoint:   URL endpoint of query
+    :param parameters: dictionary of parameters for the API request
+    :param base_url:   API base URL, defaults to `api_base_url`
+
+    :returns: tuple (method, url)
 
     :raises ValueError: if the passed URL endpoint expects a specific keyword
-        argument, but did not get one. e.g. queries.questions.by_id.ALL
-        expects an `ids` keyword argument.
+        argument, but did not get one.
     """
 
-    # get format arguments of endpoint. e.g. the `{ids}` in questions/`{ids}`
-    format_args = [tup[1] for tup in Formatter().parse(endpoint) if tup[1]]
+    # compiled endpoint. knows its format arguments, e.g. the `{ids}` in
+    # questions/`{ids}`, and its HTTP method
+    compiled = queries.registry[endpoint]
+    format_args = compiled.args
     format_dict = {}
 
     # if format arguments are missing, raise exception
-    missing_args = [f for f in format_args if f not in parameters.keys()]
+    missing_args = [f for f in format_args if f not in parameters]
     if len(missing_args) > 0:
         if len(missing_args) > 1:
             quoted_arg_names = ', '.join("'" + a + "'" for a in missing_args)
@@ -51,49 +69,160 @@ def query(endpoint, **parameters):
         if isinstance(parameters[f], list):
             format_dict[f] = ";".join([str(x) for x in parameters[f]])
         else:
-            format_dict[f] = parameters[f]
-
-
-    # format endpoint
-    method = queries.methods[endpoint]
-    endpoint = endpoint.format(**format_dict)
+            format_dict[f] = str(parameters[f])
 
     # build query URL with no parameters
-    url = api_base_url + endpoint
+    url = (base_url or api_base_url) + compiled.format(format_dict)
 
     # add parameters
     if len(parameters) > 0:
         # key, value tuples of non-default parameters
         param_components = []
-        for p,v in {p: v for (p,v) in parameters.items() if
-                    v != default_parameters[p]}.items():
+        for p, v in parameters.items():
+            if p in format_args:
+                continue
+            # the API's default sort depends on the endpoint, always send it
+            if p != "sort" and v == default_parameters[p]:
+                continue
             # join lists with semicolons for API use
             if isinstance(v, list):
-                param_components.append((p, ";".join(v)))
+                param_components.append((p, ";".join(str(x) for x in v)))
             else:
-                param_components.append((p, v))
+                param_components.append((p, str(v)))
 
         # construct parameter portion of URL.
         param_string = "?" + "&".join(p+"="+v for p,v in param_components)
         url += param_string
 
-    if method == "GET":
-        j = get_json(url)
-        j_lookup = LookupDict(data=j, name="response_wrapper")
-        return j_lookup
-    elif method == "POST":
-        raise NotImplementedError("POST not implemented")
+    return compiled.method, url
 
-    if "error_id" in j:
-        raise_request_exception(ValueError, j)
+def build_url(endpoint, **parameters):
+    """
+    Build the full request URL of a query without sending it. This is the
+    key the response cache uses.
 
-    return j
+    :param endpoint: URL endpoint of query
+    :param parameters: keyword arguments for parameters in API request.
+    """
+    return _client.get_client().build_url(endpoint, **parameters)
+
+def _wrap_response(j, lazy=False, typed=False, endpoint=None):
+    """
+    Wrap a decoded response in a :class:`LookupDict`, or in a
+    :class:`LazyLookupDict` if `lazy` is set.
+
+    If `typed` is set and the items of `endpoint` have a record type (see
+    :mod:`pyse.records`), the items are records instead.
+    """
+    if typed:
+        cls = record_type(endpoint)
+        if cls is not None:
+            return wrap_records(j, cls)
+    if lazy:
+        return LazyLookupDict(data=j, name="response_wrapper")
+    return LookupDict(data=j, name="response_wrapper")
+
+def _split_vectors(endpoint, parameters):
+    """
+    Find a vectorized format argument holding more values than the API
+    accepts in one request.
+
+    :returns: tuple (argument name, list of batches), or None if the query
+        fits in a single request
+    """
+    for arg, limit in vector_limits.items():
+        values = parameters.get(arg)
+        if (arg in queries.registry[endpoint].args and isinstance(values, list)
+                and len(values) > limit):
+            return arg, [values[i:i+limit] for i in range(0, len(values), limit)]
+    return None
+
+# FIXME: Needs tests
+def query(endpoint, use_cache=True, refresh_cache=False, lazy=False, typed=False,
+          fields=None, **parameters):
+    """
+    Query the Stack Exchange API.
+
+    :param site: Stack Exchange site to query
+    :param endpoint: URL endpoint of query
+    :param use_cache: whether to use the response cache (see
+        :func:`pyse.set_cache`) for this call
+    :param refresh_cache: ignore any cached response, but cache the response
+        of this call
+    :param lazy: return a :class:`LazyLookupDict` which wraps nested objects
+        only when they are accessed, instead of copying the whole response
+        into a :class:`LookupDict` up front
+    :param typed: make the items compact records (see :mod:`pyse.records`)
+        if the endpoint returns questions, answers, comments, users or tags.
+        items of other endpoints are wrapped as usual
+    :param fields: list of item fields to fetch, e.g. ['title', 'score',
+        'owner.display_name']. a filter returning only these fields is
+        created (see :func:`projection_filter`) and used for the request.
+        can't be combined with `filter`
+    :param parameters: keyword arguments for parameters in API request.
+
+    Vectorized arguments such as `ids` that hold more values than the API
+    accepts in one request are split into batches which are sent
+    concurrently. The merged response lists failed batches in `batch_errors`.
+
+    :raises ValueError: if the passed URL endpoint expects a specific keyword
+        argument, but did not get one. e.g. queries.questions.by_id.ALL
+        expects an `ids` keyword argument.
+    """
+    return _client.get_client().query(endpoint, use_cache=use_cache,
+                                      refresh_cache=refresh_cache, lazy=lazy,
+                                      typed=typed, fields=fields, **parameters)
+
+def query_stream(endpoint, lazy=False, chunk_size=65536, fields=None, **parameters):
+    """
+    Query the Stack Exchange API, decoding the response while it is read.
+
+    The response cache is not used. Read the returned response to the end,
+    or close it, to release its connection.
+
+    :param endpoint:   URL endpoint of query
+    :param lazy:       wrap items in :class:`LazyLookupDict` instead of
+                       :class:`LookupDict`
+    :param chunk_size: number of bytes read from the connection at a time
+    :param fields:     list of item fields to fetch, see :func:`query`
+    :param parameters: keyword arguments for parameters in API request.
+
+    :returns: a :class:`pyse.stream.StreamedResponse`, yielding each item as
+        soon as it has been read
+
+    :raises ValueError: if the API returns an error
+    """
+    return _client.get_client().query_stream(endpoint, lazy=lazy, chunk_size=chunk_size,
+                                             fields=fields, **parameters)
+
+def query_iter(endpoint, max_items=None, max_pages=None, fields=None, **parameters):
+    """
+    Iterate over the items of a query, fetching pages as they are needed.
+
+    Only the page currently being iterated over is held in memory.
+
+    :param endpoint:   URL endpoint of query
+    :param max_items:  stop after yielding this many items
+    :param max_pages:  stop after fetching this many pages
+    :param fields:     list of item fields to fetch, see :func:`query`
+    :param parameters: keyword arguments for parameters in API request.
+        `pagesize` defaults to 100, the largest page the API allows. `page`
+        is the page to start from.
+
+    :raises ValueError: if the API returns an error for any page
+    """
+    return _client.get_client().query_iter(endpoint, max_items=max_items,
+                                           max_pages=max_pages, fields=fields,
+                                           **parameters)
 
 # FIXME: Needs tests
 def create_filter(base=filters.DEFAULT, include=[], exclude=[], unsafe=False):
     """
     Creates a filter string
 
+    Filters are memoized in the filter store (see :func:`pyse.set_filter_store`),
+    so the API is only asked once for any combination of arguments.
+
     :param base:     base filter
     :param include: list of fields to include, in addition to the base filter
     :param exclude: list of fields to exclude from the base filter
@@ -104,11 +233,59 @@ def create_filter(base=filters.DEFAULT, include=[], exclude=[], unsafe=False):
 
     :raises ValueError: If `base` is not a valid base filter
     """
-    unsafe_string  = "true" if unsafe else "false"
-    filter_json = query(queries.filters.CREATE, base=base, include=include,
-                        exclude=exclude, unsafe=unsafe_string)
+    return _client.get_client().create_filter(base, include, exclude, unsafe)
+
+def projection_fields(endpoint, fields):
+    """
+    Get the filter fields of a projection
+
+    :param endpoint: URL endpoint of query
+    :param fields:   list of item fields. nested fields are joined with
+                     dots, e.g. 'owner.display_name'. fields already
+                     qualified with an API type, e.g. 'question.title',
+                     are kept as they are
+
+    :returns: sorted list of filter fields, e.g. ['.has_more', ...,
+        'question.owner', 'question.title', 'shallow_user.display_name']
+
+    :raises ValueError: if a field can't be qualified because the type of
+        the endpoint's items is unknown
+    """
+    cls = record_type(endpoint)
+    include = set(projection_wrapper_fields)
+    for field in fields:
+        parts = field.split(".")
+        if len(parts) > 1 and parts[0] not in nested_types:
+            # already qualified
+            include.add(field)
+            continue
+        if cls is None:
+            raise ValueError(f"unknown item type for API endpoint '{endpoint}', "
+                             f"qualify field '{field}' with its type")
+        parent = cls._type
+        for part in parts:
+            include.add(f"{parent}.{part}")
+            parent = nested_types.get(part)
+            if parent is None:
+                break
+    return sorted(include)
 
-    if "error_id" in filter_json:
-        raise_request_exception(ValueError, filter_json)
+def projection_filter(endpoint, fields):
+    """
+    Create a filter returning only some fields of the items of an endpoint
+
+    The filter is created with :func:`create_filter`, so it is memoized in
+    the filter store.
 
-    return filter_json["items"][0]["filter"]
+    :param endpoint: URL endpoint of query
+    :param fields:   list of item fields, see :func:`projection_fields`
+
+    :returns string: a filter to pass to other API queries
+    """
+    return _client.get_client().projection_filter(endpoint, fields)
+
+def _project(endpoint, fields, parameters):
+    """
+    Replace the `fields` of a query with its projection filter
+    """
+    _client.get_client()._project(endpoint, fields, parameters)
@@ -0,0 +1,342 @@
+"""
+pyse.cache
+~~~~~~~~~~
+
+This module contains response caches for the Stack Exchange API wrapper.
+
+Caches map a full request URL to the decoded JSON response. Only successful
+GET responses are cached.
+
+Example::
+
+    >>> import pyse
+    >>> pyse.set_cache(pyse.MemoryCache(ttl=60, ttls={pyse.queries.badges.ALL: 3600}))
+    >>> pyse.query(pyse.queries.tags.ALL, site="stackoverflow")  # network
+    >>> pyse.query(pyse.queries.tags.ALL, site="stackoverflow")  # cached
+    >>> pyse.get_cache().stats()
+    {'hits': 1, 'misses': 1, 'sets': 1, 'evictions': 0}
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .utils import sqlite_connection
+
+class Cache:
+    """
+    Base class for response caches.
+
+    Subclasses implement :meth:`_get`, :meth:`_set`, :meth:`invalidate` and
+    :meth:`clear`.
+    """
+    def __init__(self, ttl=60, ttls=None):
+        """
+        :param ttl:  default time to live of an entry, in seconds
+        :param ttls: dictionary of URL endpoint to time to live, overrides
+                     `ttl` for responses of that endpoint. e.g.
+                     ``{queries.tags.ALL: 3600}``
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls) if ttls else {}
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def ttl_for(self, endpoint):
+        """
+        Get the time to live of responses for an URL endpoint
+        """
+        return self.ttls.get(endpoint, self.ttl)
+
+    def get(self, url):
+        """
+        Get a cached response
+
+        :param url: full request URL
+
+        :returns: the decoded response, or None if missing or expired
+        """
+        value = self._get(url, time.time())
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, url, value, endpoint=None):
+        """
+        Cache a response
+
+        :param url:      full request URL
+        :param value:    decoded response
+        :param endpoint: URL endpoint of the request, used to pick the TTL
+        """
+        ttl = self.ttl_for(endpoint)
+        if ttl is not None and ttl <= 0:
+            return
+        expires = time.time() + ttl if ttl is not None else None
+        self.sets += 1
+        self._set(url, value, expires)
+
+    def stats(self):
+        """
+        Get hit/miss statistics of this cache
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, url, now):
+        raise NotImplementedError
+
+    def _set(self, url, value, expires):
+        raise NotImplementedError
+
+    def invalidate(self, url):
+        """
+        Remove a cached response
+
+        :param url: full request URL, see :func:`pyse.build_url`
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every cached response
+        """
+        raise NotImplementedError
+
+class MemoryCache(Cache):
+    """
+    A size-bounded, in-process LRU cache.
+    """
+    def __init__(self, maxsize=1024, ttl=60, ttls=None):
+        """
+        :param maxsize: maximum number of cached responses
+        :param ttl:     default time to live of an entry, in seconds
+        :param ttls:    dictionary of URL endpoint to time to live
+        """
+        super(MemoryCache, self).__init__(ttl=ttl, ttls=ttls)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, url, now):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= now:
+                del self._entries[url]
+                return None
+            self._entries.move_to_end(url)
+            return value
+
+    def _set(self, url, value, expires):
+        with self._lock:
+            self._entries[url] = (value, expires)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SqliteCache(Cache):
+    """
+    An on-disk cache backed by sqlite, which can be shared by several
+    processes pointed at the same file.
+    """
+    def __init__(self, path, maxsize=None, ttl=60, ttls=None):
+        """
+        :param path:    path of the sqlite database file
+        :param maxsize: maximum number of cached responses, None for no limit
+        :param ttl:     default time to live of an entry, in seconds
+        :param ttls:    dictionary of URL endpoint to time to live
+        """
+        super(SqliteCache, self).__init__(ttl=ttl, ttls=ttls)
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+        db = self._db
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                       "url TEXT PRIMARY KEY, expires REAL, used REAL, value TEXT)")
+
+    @property
+    def _db(self):
+        return sqlite_connection(self._local, self.path)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _get(self, url, now):
+        db = self._db
+        row = db.execute("SELECT expires, value FROM responses WHERE url = ?",
+                         (url,)).fetchone()
+        if row is None:
+            return None
+        expires, value = row
+        with db:
+            if expires is not None and expires <= now:
+                db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                return None
+            if self.maxsize is not None:
+                db.execute("UPDATE responses SET used = ? WHERE url = ?", (now, url))
+        return json.loads(value)
+
+    def _set(self, url, value, expires):
+        db = self._db
+        with db:
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                       (url, expires, time.time(), json.dumps(value)))
+            if self.maxsize is not None:
+                evicted = db.execute(
+                    "DELETE FROM responses WHERE url IN (SELECT url FROM responses "
+                    "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.maxsize,)).rowcount
+                self.evictions += evicted
+
+    def invalidate(self, url):
+        with self._db as db:
+            db.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def clear(self):
+        with self._db as db:
+            db.execute("DELETE FROM responses")
+
+class FilterStore:
+    """
+    A memo of filters built by :func:`pyse.create_filter`, optionally kept in
+    a JSON file.
+
+    A filter is a pure function of its base, included fields, excluded fields
+    and unsafe flag, so it never has to be created twice. The file can be
+    shipped with a deployment to pre-warm every process.
+    """
+    def __init__(self, path=None):
+        """
+        Create a new FilterStore
+
+        :param path: JSON file to load filters from and save new filters
+                     to, None to keep filters in memory only
+        """
+        self.path = path
+        self._filters = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._filters)
+
+    @staticmethod
+    def key(base, include, exclude, unsafe):
+        """
+        Get the key of a filter. Field order doesn't matter.
+        """
+        return json.dumps([base, sorted(set(include)), sorted(set(exclude)),
+                           bool(unsafe)], separators=(",", ":"))
+
+    def get(self, key):
+        """
+        Get a memoized filter, or None
+        """
+        return self._filters.get(key)
+
+    def set(self, key, filter):
+        """
+        Memoize a filter, writing it to the store's file if it has one
+        """
+        with self._lock:
+            self._filters[key] = filter
+            if self.path is not None:
+                self.save(self.path)
+
+    def load(self, path):
+        """
+        Add the filters of a JSON file written by :meth:`save`
+
+        :param path: path of the file
+        """
+        with open(path) as f:
+            filters = json.load(f)
+        self._filters.update(filters)
+
+    def save(self, path):
+        """
+        Write every memoized filter to a JSON file. Filters another process
+        already wrote to the file are kept.
+
+        :param path: path of the file
+        """
+        filters = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                filters = json.load(f)
+        filters.update(self._filters)
+
+        # write and rename, so readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(filters, f, indent=0, sort_keys=True)
+        os.replace(tmp, path)
+
+_cache = None
+_filter_store = FilterStore()
+
+def get_cache():
+    """
+    Get the cache used by :func:`pyse.query`, or None if caching is disabled
+    """
+    return _cache
+
+def set_cache(cache):
+    """
+    Replace the cache used by :func:`pyse.query`
+
+    :param cache: a :class:`Cache`, or None to disable caching
+
+    :returns: the previous cache
+    """
+    global _cache
+    previous, _cache = _cache, cache
+    return previous
+
+def get_filter_store():
+    """
+    Get the filter store used by :func:`pyse.create_filter`
+    """
+    return _filter_store
+
+def set_filter_store(store):
+    """
+    Replace the filter store used by :func:`pyse.create_filter`
+
+    :param store: a :class:`FilterStore`, or None for a new in-memory store
+
+    :returns: the previous store
+    """
+    global _filter_store
+    previous, _filter_store = _filter_store, store if store is not None else FilterStore()
+    return previous
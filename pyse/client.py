@@ -0,0 +1,554 @@
+"""
+pyse.client
+~~~~~~~~~~~
+
+This module implements the Stack Exchange API client.
+
+A :class:`Client` owns everything a query depends on: the app key and access
+token, the base URL, default parameters, the transport, the response cache,
+the scheduler's rate limit and quota, request coalescing and the object
+store. Clients don't share any of it, so several of them, e.g. one per app
+key, can run side by side::
+
+    >>> so = pyse.Client(key="...", defaults={"site": "stackoverflow"})
+    >>> so.query(pyse.queries.questions.ALL, sort="votes")
+    >>> so.questions.ALL(sort="votes")
+    >>> so.scheduler.quota_remaining
+    9999
+
+Every endpoint of :data:`pyse.queries` can be called from a client, by the
+same path as in the tree.
+
+The module-level functions such as :func:`pyse.query` use the default client
+(see :func:`set_client`), which reads the module-level settings:
+:func:`pyse.set_transport`, :func:`pyse.set_cache`,
+:func:`pyse.set_scheduler`, and so on. Hooks (see :mod:`pyse.hooks`) see the
+requests of every client.
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+import time
+from http import HTTPStatus
+
+from . import api
+from . import hooks
+from . import utils
+from .cache import get_cache, get_filter_store
+from .coalesce import SingleFlight, get_single_flight
+from .queries import queries
+from .scheduler import Scheduler, get_scheduler
+from .store import get_object_store
+from .stream import StreamedResponse
+from .transport import SessionTransport, get_transport
+from .types import filters
+from .utils import get_response, raise_request_exception
+from .structures import URLTree
+
+class Client:
+    """
+    A Stack Exchange API client with its own settings and request state.
+    """
+    def __init__(self, key=None, access_token=None, base_url=None, defaults=None,
+                 transport=None, cache=None, scheduler=None, single_flight=None,
+                 filter_store=None, object_store=None):
+        """
+        Create a new Client
+
+        :param key:          app key, sent with every request. raises the
+                             daily quota from 300 to 10,000 requests
+        :param access_token: access token, sent with every request
+        :param base_url:     API base URL, defaults to :data:`pyse.api_base_url`
+        :param defaults:     dictionary of parameters sent with every request
+                             unless the query passes them, e.g.
+                             {'site': 'stackoverflow', 'pagesize': 100}
+        :param transport:    :class:`pyse.Transport` sending the requests.
+                             defaults to a new :class:`pyse.SessionTransport`
+        :param cache:        response cache, see :mod:`pyse.cache`. defaults
+                             to no cache
+        :param scheduler:    :class:`pyse.Scheduler` holding the rate limit,
+                             backoffs and quota. defaults to a new scheduler.
+                             pass the same scheduler to clients sharing a key
+        :param single_flight: :class:`pyse.SingleFlight` coalescing identical
+                             requests. defaults to a new one. set the
+                             attribute to None to turn coalescing off
+        :param filter_store: :class:`pyse.FilterStore` memoizing filters.
+                             defaults to the module-level filter store, since
+                             filters don't depend on the key
+        :param object_store: :class:`pyse.ObjectStore` items are written to.
+                             defaults to none
+        """
+        self.key = key
+        self.access_token = access_token
+        self.base_url = base_url if base_url is not None else api.api_base_url
+        self.defaults = dict(defaults or {})
+        self.transport = transport if transport is not None else SessionTransport()
+        self.cache = cache
+        self.scheduler = scheduler if scheduler is not None else Scheduler()
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.filter_store = filter_store if filter_store is not None else get_filter_store()
+        self.object_store = object_store
+
+    def __repr__(self):
+        return f"<client '{self.base_url}'>"
+
+    def __getattr__(self, name):
+        # only called for names that aren't attributes: endpoints of the
+        # queries tree
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _bind(self, queries, name)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(_endpoint_names(queries)))
+
+    def _parameters(self, parameters):
+        """
+        Add the client's default parameters, key and access token to the
+        parameters of a query. passed parameters take precedence
+        """
+        merged = dict(self.defaults)
+        if self.key is not None:
+            merged["key"] = self.key
+        if self.access_token is not None:
+            merged["access_token"] = self.access_token
+        merged.update(parameters)
+        return merged
+
+    def _build_query(self, endpoint, parameters):
+        """
+        Build the HTTP method and full request URL of a query, see
+        :func:`pyse.api._build_query`
+        """
+        return api._build_query(endpoint, self._parameters(parameters), self.base_url)
+
+    def _project(self, endpoint, fields, parameters):
+        """
+        Replace the `fields` of a query with its projection filter
+        """
+        if "filter" in parameters:
+            raise ValueError("pass either `fields` or `filter`, not both")
+        parameters["filter"] = self.projection_filter(endpoint, fields)
+
+    def build_url(self, endpoint, **parameters):
+        """
+        Build the full request URL of a query without sending it. This is the
+        key the response cache uses.
+
+        :param endpoint: URL endpoint of query
+        :param parameters: keyword arguments for parameters in API request.
+        """
+        return self._build_query(endpoint, parameters)[1]
+
+    def _get_json(self, endpoint, url, use_cache=True, refresh_cache=False, event=None):
+        """
+        GET a query URL, going through the response cache if one is set and
+        through the request scheduler otherwise. Identical GETs sent from
+        other threads at the same time share one request, see
+        :mod:`pyse.coalesce`.
+
+        :param endpoint:      URL endpoint of query, used to pick the cache TTL
+        :param url:           full request URL
+        :param use_cache:     whether to read from and write to the cache
+        :param refresh_cache: skip the cached response, but cache the new one
+        :param event:         hook event to record the request in, see
+                              :mod:`pyse.hooks`
+        """
+        cache, j = self._cached_json(url, use_cache, refresh_cache, event)
+        if j is not None:
+            return j
+
+        # identical GETs in flight share one request. never share POSTs
+        single_flight = self.single_flight
+        if single_flight is not None and queries.registry[endpoint].method == "GET":
+            fetched, shared = single_flight.do(url, lambda: self._fetch_json(endpoint, url))
+        else:
+            fetched, shared = self._fetch_json(endpoint, url), False
+        return self._keep_json(endpoint, url, cache, fetched, shared, event)
+
+    def _cached_json(self, url, use_cache=True, refresh_cache=False, event=None):
+        """
+        Look a query URL up in the response cache
+
+        :returns: tuple (cache to store the fetched response in, or None;
+            cached response, or None if it has to be fetched)
+        """
+        cache = self.cache
+        if event is not None and cache is not None:
+            event["cache"] = "bypass" if refresh_cache or not use_cache else "miss"
+        if not use_cache or cache is None:
+            return None, None
+
+        if not refresh_cache:
+            j = cache.get(url)
+            if j is not None:
+                if event is not None:
+                    event["cache"] = "hit"
+                return cache, j
+        return cache, None
+
+    def _keep_json(self, endpoint, url, cache, fetched, shared, event=None):
+        """
+        Record a fetched response in its hook event, the response cache and
+        the object store
+
+        :param cache:   cache returned by :meth:`_cached_json`
+        :param fetched: tuple returned by :meth:`_fetch_json`
+        :param shared:  whether the response came from another caller's
+                        request
+
+        :returns: the decoded response
+        """
+        j, status, size, timings = fetched
+        if event is not None:
+            event["coalesced"] = shared
+            # the request, its quota and its timings belong to the first caller
+            if not shared:
+                event["status"] = status
+                event["bytes"] = size
+                event["timings"].update(timings)
+
+        # never cache errors
+        if cache is not None and "error_id" not in j:
+            cache.set(url, j, endpoint=endpoint)
+
+        store = self.object_store
+        if store is not None and not shared and "error_id" not in j:
+            store.put_response(endpoint, url, j)
+        return j
+
+    def _fetch_json(self, endpoint, url):
+        """
+        GET a query URL through the request scheduler
+
+        :returns: tuple (decoded response, status code, body size, timings)
+        """
+        scheduler = self.scheduler
+        start = time.perf_counter()
+        scheduler.wait(endpoint)
+        sent = time.perf_counter()
+        r = get_response(url, transport=self.transport)
+        received = time.perf_counter()
+        j = utils.json_loads(r.content)
+        decoded = time.perf_counter()
+        scheduler.update(endpoint, j)
+
+        timings = {"wait": sent - start, "network": received - sent,
+                   "decode": decoded - received}
+        return j, r.status_code, len(r.content), timings
+
+    def _query_batched(self, endpoint, parameters, arg, batches, lazy=False, typed=False,
+                       **cache_options):
+        """
+        Send one request per batch of a vectorized argument concurrently and
+        merge the responses into a single response wrapper.
+
+        Unless `parameters` sets `pagesize`, each batch asks for a page as
+        large as the batch. `items` holds the items of every successful
+        batch, in batch order.
+        `batch_errors` holds one entry per failed batch with the values of the
+        batch and either the API error fields or the message of the exception
+        that was raised. If every batch failed, the error fields of the first
+        failure are also set on the wrapper itself.
+        """
+        # imported here, only batched queries need a thread pool
+        from concurrent.futures import ThreadPoolExecutor
+
+        if queries.registry[endpoint].method != "GET":
+            raise NotImplementedError("POST not implemented")
+
+        def fetch(batch):
+            # one page per batch holds every object of the batch
+            batch_parameters = {"pagesize": len(batch), **parameters, arg: batch}
+            url = self._build_query(endpoint, batch_parameters)[1]
+            event = hooks.new_event(endpoint, url, "GET") if hooks.active() else None
+            try:
+                j = self._get_json(endpoint, url, event=event, **cache_options)
+            except Exception as e:
+                if event is not None:
+                    hooks.emit(event, error=e)
+                return batch, {"error_id": None, "error_name": type(e).__name__,
+                               "error_message": str(e)}
+            if event is not None:
+                hooks.emit(event, j)
+            return batch, j
+
+        merged = {"items": [], "has_more": False, "batch_errors": []}
+        workers = min(api.max_batch_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch, j in pool.map(fetch, batches):
+                if "error_name" in j:
+                    merged["batch_errors"].append({arg: batch, **j})
+                    continue
+
+                merged["items"].extend(j.get("items", []))
+                merged["has_more"] = merged["has_more"] or j.get("has_more", False)
+                for key, pick in (("quota_remaining", min), ("quota_max", min),
+                                  ("backoff", max)):
+                    if key in j:
+                        merged[key] = pick(merged[key], j[key]) if key in merged else j[key]
+
+        if len(merged["batch_errors"]) == len(batches):
+            first = merged["batch_errors"][0]
+            for key in ("error_id", "error_name", "error_message"):
+                merged[key] = first[key]
+
+        return api._wrap_response(merged, lazy, typed, endpoint)
+
+    def query(self, endpoint, use_cache=True, refresh_cache=False, lazy=False, typed=False,
+              fields=None, **parameters):
+        """
+        Query the Stack Exchange API. See :func:`pyse.query`
+        """
+        if fields is not None:
+            self._project(endpoint, fields, parameters)
+
+        batches = api._split_vectors(endpoint, parameters)
+        if batches is not None:
+            return self._query_batched(endpoint, parameters, *batches, lazy=lazy,
+                                       typed=typed, use_cache=use_cache,
+                                       refresh_cache=refresh_cache)
+
+        method, url = self._build_query(endpoint, parameters)
+
+        if method == "GET":
+            # hook events are only built while a hook is registered
+            event = hooks.new_event(endpoint, url, method) if hooks.active() else None
+            try:
+                j = self._get_json(endpoint, url, use_cache=use_cache,
+                                   refresh_cache=refresh_cache, event=event)
+            except Exception as e:
+                if event is not None:
+                    hooks.emit(event, error=e)
+                raise
+
+            if event is None:
+                return api._wrap_response(j, lazy, typed, endpoint)
+
+            start = time.perf_counter()
+            response = api._wrap_response(j, lazy, typed, endpoint)
+            event["timings"]["wrap"] = time.perf_counter() - start
+            hooks.emit(event, j)
+            return response
+        elif method == "POST":
+            raise NotImplementedError("POST not implemented")
+
+    def query_stream(self, endpoint, lazy=False, chunk_size=65536, fields=None,
+                     **parameters):
+        """
+        Query the Stack Exchange API, decoding the response while it is read.
+        See :func:`pyse.query_stream`
+        """
+        if fields is not None:
+            self._project(endpoint, fields, parameters)
+
+        method, url = self._build_query(endpoint, parameters)
+        if method != "GET":
+            raise NotImplementedError("POST not implemented")
+
+        scheduler = self.scheduler
+        scheduler.wait(endpoint)
+        r = self.transport.get(url, stream=True)
+
+        if r.status_code == HTTPStatus.BAD_REQUEST:
+            j = utils.json_loads(r.content)
+            scheduler.update(endpoint, j)
+            raise_request_exception(ValueError, j)
+        elif r.status_code != HTTPStatus.OK:
+            r.raise_for_status()
+
+        return StreamedResponse(r.iter_content(chunk_size), lazy=lazy,
+                                on_wrapper=lambda j: scheduler.update(endpoint, j),
+                                close=r.close)
+
+    def query_iter(self, endpoint, max_items=None, max_pages=None, fields=None,
+                   **parameters):
+        """
+        Iterate over the items of a query, fetching pages as they are needed.
+        See :func:`pyse.query_iter`
+        """
+        # create the filter once, not once per page
+        if fields is not None:
+            self._project(endpoint, fields, parameters)
+
+        parameters.setdefault("pagesize", 100)
+        page = parameters.pop("page", 1)
+        items_seen = 0
+        pages_seen = 0
+
+        while ((max_pages is None or pages_seen < max_pages) and
+               (max_items is None or items_seen < max_items)):
+            response = self.query(endpoint, page=page, **parameters)
+            if response["error_id"] is not None:
+                raise_request_exception(ValueError, response)
+            pages_seen += 1
+
+            items, has_more = response["items"] or [], response["has_more"]
+            # drop the wrapper so only the items of this page stay alive
+            response = None
+
+            for item in items:
+                yield item
+                items_seen += 1
+                if max_items is not None and items_seen >= max_items:
+                    return
+
+            if not has_more:
+                return
+            items = None
+            page += 1
+
+    def create_filter(self, base=filters.DEFAULT, include=[], exclude=[], unsafe=False):
+        """
+        Creates a filter string. See :func:`pyse.create_filter`
+        """
+        store = self.filter_store
+        key = store.key(base, include, exclude, unsafe)
+        memoized = store.get(key)
+        if memoized is not None:
+            return memoized
+
+        unsafe_string  = "true" if unsafe else "false"
+        filter_json = self.query(queries.filters.CREATE, base=base,
+                                 include=sorted(set(include)), exclude=sorted(set(exclude)),
+                                 unsafe=unsafe_string, use_cache=False)
+
+        if filter_json["error_id"] is not None:
+            raise_request_exception(ValueError, filter_json)
+
+        filter = filter_json["items"][0]["filter"]
+        store.set(key, filter)
+        return filter
+
+    def projection_filter(self, endpoint, fields):
+        """
+        Create a filter returning only some fields of the items of an
+        endpoint. See :func:`pyse.projection_filter`
+        """
+        return self.create_filter(base=filters.NONE,
+                                  include=api.projection_fields(endpoint, fields))
+
+class _DefaultClient(Client):
+    """
+    The client of the module-level functions. Reads the module-level
+    settings every time they are used, so :func:`pyse.set_cache` and the
+    like keep working
+    """
+    def __init__(self):
+        self.key = None
+        self.access_token = None
+        self.defaults = {}
+
+    def __repr__(self):
+        return "<client 'default'>"
+
+    @property
+    def base_url(self):
+        return api.api_base_url
+
+    @property
+    def transport(self):
+        return get_transport()
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    @property
+    def scheduler(self):
+        return get_scheduler()
+
+    @property
+    def single_flight(self):
+        return get_single_flight()
+
+    @property
+    def filter_store(self):
+        return get_filter_store()
+
+    @property
+    def object_store(self):
+        return get_object_store()
+
+class _BoundTree:
+    """
+    A subtree of :data:`pyse.queries` whose endpoints query a client
+    """
+    __slots__ = ("_client", "_tree")
+
+    def __init__(self, client, tree):
+        self._client = client
+        self._tree = tree
+
+    def __getattr__(self, name):
+        return _bind(self._client, self._tree, name)
+
+    def __dir__(self):
+        return _endpoint_names(self._tree)
+
+    def __repr__(self):
+        return f"<bound url_tree '{self._tree._name}'>"
+
+class _BoundEndpoint:
+    """
+    An endpoint of :data:`pyse.queries`, calling :meth:`Client.query` of a
+    client when called
+    """
+    __slots__ = ("_client", "endpoint")
+
+    def __init__(self, client, endpoint):
+        self._client = client
+        self.endpoint = endpoint
+
+    def __call__(self, **parameters):
+        return self._client.query(self.endpoint, **parameters)
+
+    def iter(self, **parameters):
+        """
+        Iterate over the items of the endpoint, see :meth:`Client.query_iter`
+        """
+        return self._client.query_iter(self.endpoint, **parameters)
+
+    def __repr__(self):
+        return f"<bound endpoint '{self.endpoint}'>"
+
+def _bind(client, tree, name):
+    """
+    Bind the subtree or endpoint `name` of a subtree of :data:`pyse.queries`
+    to a client
+    """
+    value = getattr(tree, name)
+    if isinstance(value, URLTree):
+        return _BoundTree(client, value)
+    if isinstance(value, str):
+        return _BoundEndpoint(client, value)
+    raise AttributeError(f"'{name}' is not an endpoint or a subtree of endpoints")
+
+def _endpoint_names(tree):
+    """
+    Names of the subtrees and endpoints of a subtree of :data:`pyse.queries`
+    """
+    return sorted(k for k, v in vars(tree).items()
+                  if not k.startswith("_") and isinstance(v, (URLTree, str)))
+
+_default_client = _DefaultClient()
+_client = _default_client
+
+def get_client():
+    """
+    Get the client the module-level functions such as :func:`pyse.query` use
+    """
+    return _client
+
+def set_client(client):
+    """
+    Set the client the module-level functions such as :func:`pyse.query` use
+
+    :param client: a :class:`Client`, or None to restore the default client,
+                   which uses the module-level settings
+
+    :returns: the previous client
+    """
+    global _client
+    previous, _client = _client, client if client is not None else _default_client
+    return previous
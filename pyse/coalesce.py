@@ -0,0 +1,109 @@
+"""
+pyse.coalesce
+~~~~~~~~~~~~~
+
+This module implements request coalescing, or "single-flight".
+
+While a GET request for a URL is in flight, identical requests from other
+threads don't go to the API. They wait for the first request and all receive
+its response, or the exception it raised, so a hot resource asked for by many
+threads at once costs one request and one quota.
+
+Coalescing is on by default. Turn it off with::
+
+    >>> pyse.set_single_flight(None)
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import threading
+
+class _Call:
+    """
+    A request in flight, and its outcome once it is done
+    """
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Runs one call at a time per key, sharing its outcome with every caller
+    that asks for the same key while it runs.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Call `fn`, or wait for the call already running for `key`
+
+        :param key: key of the call, e.g. the request URL
+        :param fn:  function taking no arguments
+
+        :returns: tuple (result, shared) where `shared` is whether the result
+            came from another caller's call
+
+        :raises: the exception raised by `fn`, for every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """
+        Get the number of calls running
+        """
+        with self._lock:
+            return len(self._calls)
+
+_single_flight = SingleFlight()
+
+def get_single_flight():
+    """
+    Get the :class:`SingleFlight` coalescing requests of :func:`pyse.query`,
+    or None if coalescing is off
+    """
+    return _single_flight
+
+def set_single_flight(single_flight):
+    """
+    Replace the :class:`SingleFlight` coalescing requests of :func:`pyse.query`
+
+    :param single_flight: a :class:`SingleFlight`, or None to turn
+                          coalescing off
+
+    :returns: the previous one
+    """
+    global _single_flight
+    previous, _single_flight = _single_flight, single_flight
+    return previous
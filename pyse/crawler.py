@@ -0,0 +1,433 @@
+"""
+pyse.crawler
+~~~~~~~~~~~~
+
+This module implements a resumable crawler for exporting whole sites.
+
+The work of a crawl is kept in a :class:`CrawlQueue`, a sqlite database of
+tasks, each one page of one query. :func:`crawl` claims tasks, fetches and
+decodes their pages in worker processes, writes the items to a sink such as
+:class:`JsonlSink`, and then checkpoints each finished task in the queue
+together with its follow-ups:
+
+    the next page     if the page has more results
+    expansions        requests for objects the items refer to, e.g. the
+                      answers of fetched questions through
+                      'questions/{ids}/answers'. ids are collected across
+                      pages, each id once, and requested in batches of 100
+                      (see `default_expansions`)
+
+An interrupted crawl resumes from its queue. Items of pages that were
+fetched but not checkpointed are written again, so a sink gets every item
+at least once.
+
+Example::
+
+    >>> queue = pyse.CrawlQueue("export.db")
+    >>> queue.add(pyse.queries.questions.ALL, site="stackoverflow", filter="withbody")
+    >>> with pyse.JsonlSink("export") as sink:
+    ...     pyse.crawl(queue, sink, workers=4, rate=25, key="...")
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED,
+                                wait)
+
+from .client import Client
+from .queries import queries
+from .records import record_type
+from .scheduler import Scheduler, TokenBucket, FileTokenBucket
+from .utils import sqlite_connection
+
+# follow-up requests for the items of an endpoint: tuples (endpoint taking
+# `ids`, field of the items holding the ids). nested fields are joined with
+# dots
+default_expansions = {
+    queries.questions.ALL: [
+        (queries.questions.by_id.answers.ALL, "question_id"),
+        (queries.questions.by_id.comments, "question_id"),
+        (queries.users.by_id.ALL, "owner.user_id"),
+    ],
+    queries.questions.by_id.answers.ALL: [
+        (queries.answers.by_id.comments, "answer_id"),
+        (queries.users.by_id.ALL, "owner.user_id"),
+    ],
+    queries.questions.by_id.comments: [
+        (queries.users.by_id.ALL, "owner.user_id"),
+    ],
+    queries.answers.by_id.comments: [
+        (queries.users.by_id.ALL, "owner.user_id"),
+    ],
+}
+
+# number of ids per follow-up request, the most the API accepts
+default_batch_size = 100
+
+CrawlTask = namedtuple("CrawlTask", ["id", "endpoint", "parameters", "page"])
+
+def _dumps(parameters):
+    return json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+
+class CrawlQueue:
+    """
+    The tasks of a crawl, kept in a sqlite database.
+
+    A task is (endpoint, parameters, page) and is pending, claimed, done or
+    failed. Adding a task that exists already does nothing, so a crawl can
+    be seeded again safely.
+    """
+    def __init__(self, path):
+        """
+        Create a new CrawlQueue
+
+        :param path: path of the sqlite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._db as db:
+            db.execute("CREATE TABLE IF NOT EXISTS tasks ("
+                       "id INTEGER PRIMARY KEY, endpoint TEXT, parameters TEXT, "
+                       "page INTEGER, state TEXT, attempts INTEGER, error TEXT, "
+                       "updated REAL, UNIQUE (endpoint, parameters, page))")
+            db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id)")
+            # ids waiting to be requested by a follow-up task
+            db.execute("CREATE TABLE IF NOT EXISTS follow_ups ("
+                       "endpoint TEXT, parameters TEXT, id, batched INTEGER, "
+                       "PRIMARY KEY (endpoint, parameters, id))")
+            db.execute("CREATE INDEX IF NOT EXISTS follow_ups_batched "
+                       "ON follow_ups (batched, endpoint, parameters)")
+
+    @property
+    def _db(self):
+        return sqlite_connection(self._local, self.path)
+
+    def _insert(self, db, endpoint, parameters, page=1):
+        cursor = db.execute("INSERT OR IGNORE INTO tasks (endpoint, parameters, page, state, "
+                            "attempts, updated) VALUES (?, ?, ?, 'pending', 0, ?)",
+                            (endpoint, parameters, page, time.time()))
+        return cursor.rowcount > 0
+
+    def add(self, endpoint, **parameters):
+        """
+        Add a task
+
+        :param endpoint:   URL endpoint of query
+        :param parameters: keyword arguments for parameters in API request.
+            `page` is the page to start from. `pagesize` defaults to 100
+
+        :returns: whether the task was added
+        """
+        page = parameters.pop("page", 1)
+        parameters.setdefault("pagesize", 100)
+        with self._db as db:
+            return self._insert(db, endpoint, _dumps(parameters), page)
+
+    def claim(self, limit=1):
+        """
+        Claim pending tasks, oldest first
+
+        :returns: list of :class:`CrawlTask`
+        """
+        with self._db as db:
+            rows = db.execute("SELECT id, endpoint, parameters, page FROM tasks "
+                              "WHERE state = 'pending' ORDER BY id LIMIT ?",
+                              (limit,)).fetchall()
+            db.executemany("UPDATE tasks SET state = 'claimed', updated = ? WHERE id = ?",
+                           [(time.time(), row[0]) for row in rows])
+        return [CrawlTask(i, endpoint, json.loads(parameters), page)
+                for i, endpoint, parameters, page in rows]
+
+    def complete(self, task, has_more=False, follow_ups=None, batch_size=default_batch_size):
+        """
+        Mark a task done, and add its follow-ups in the same transaction
+
+        :param task:       the finished :class:`CrawlTask`
+        :param has_more:   whether to add the task's next page
+        :param follow_ups: list of tuples (endpoint, parameters, ids) of ids
+                           to request from an endpoint. ids that were
+                           requested before are skipped
+        :param batch_size: number of ids per follow-up task
+        """
+        with self._db as db:
+            db.execute("UPDATE tasks SET state = 'done', error = NULL, updated = ? "
+                       "WHERE id = ?", (time.time(), task.id))
+            if has_more:
+                self._insert(db, task.endpoint, _dumps(task.parameters), task.page + 1)
+            for endpoint, parameters, ids in follow_ups or ():
+                parameters = _dumps(parameters)
+                db.executemany("INSERT OR IGNORE INTO follow_ups VALUES (?, ?, ?, 0)",
+                               [(endpoint, parameters, i) for i in ids])
+                while self._batch(db, endpoint, parameters, batch_size, full=True):
+                    pass
+
+    def _batch(self, db, endpoint, parameters, batch_size, full):
+        """
+        Turn waiting ids of a follow-up into a task
+
+        :param full: only if there are `batch_size` of them
+
+        :returns: whether a task was added
+        """
+        rows = db.execute("SELECT rowid, id FROM follow_ups WHERE batched = 0 "
+                          "AND endpoint = ? AND parameters = ? ORDER BY rowid LIMIT ?",
+                          (endpoint, parameters, batch_size)).fetchall()
+        if not rows or (full and len(rows) < batch_size):
+            return False
+        db.executemany("UPDATE follow_ups SET batched = 1 WHERE rowid = ?",
+                       [(rowid,) for rowid, _ in rows])
+        ids = [i for _, i in rows]
+        self._insert(db, endpoint, _dumps(dict(json.loads(parameters), ids=ids)))
+        return True
+
+    def flush(self, batch_size=default_batch_size):
+        """
+        Turn every waiting id into follow-up tasks, including partial batches
+
+        :returns: number of tasks added
+        """
+        added = 0
+        with self._db as db:
+            waiting = db.execute("SELECT DISTINCT endpoint, parameters FROM follow_ups "
+                                 "WHERE batched = 0").fetchall()
+            for endpoint, parameters in waiting:
+                while self._batch(db, endpoint, parameters, batch_size, full=False):
+                    added += 1
+        return added
+
+    def fail(self, task, error, max_attempts=3):
+        """
+        Record a failed attempt at a task. It is retried until it failed
+        `max_attempts` times
+        """
+        with self._db as db:
+            db.execute("UPDATE tasks SET attempts = attempts + 1, error = ?, updated = ?, "
+                       "state = CASE WHEN attempts + 1 >= ? THEN 'failed' "
+                       "ELSE 'pending' END WHERE id = ?",
+                       (str(error), time.time(), max_attempts, task.id))
+
+    def release(self):
+        """
+        Make the tasks claimed by an interrupted crawl pending again
+
+        :returns: number of tasks released
+        """
+        with self._db as db:
+            return db.execute("UPDATE tasks SET state = 'pending' "
+                              "WHERE state = 'claimed'").rowcount
+
+    def retry_failed(self):
+        """
+        Make failed tasks pending again, with no attempts
+
+        :returns: number of tasks retried
+        """
+        with self._db as db:
+            return db.execute("UPDATE tasks SET state = 'pending', attempts = 0 "
+                              "WHERE state = 'failed'").rowcount
+
+    def counts(self):
+        """
+        Get the number of tasks in each state, and of ids waiting for a
+        follow-up task under 'waiting_ids'
+        """
+        counts = {"pending": 0, "claimed": 0, "done": 0, "failed": 0}
+        counts.update(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"))
+        counts["waiting_ids"] = self._db.execute(
+            "SELECT COUNT(*) FROM follow_ups WHERE batched = 0").fetchone()[0]
+        return counts
+
+class JsonlSink:
+    """
+    Writes crawled items to JSON lines files, one per site and item type,
+    e.g. stackoverflow/question.jsonl
+    """
+    def __init__(self, directory):
+        """
+        Create a new JsonlSink
+
+        :param directory: directory of the files. files that exist already
+                          are appended to
+        """
+        self.directory = directory
+        self._files = {}
+
+    def write(self, site, type, items):
+        """
+        Write items
+
+        :param site:  site of the items, or None
+        :param type:  API type of the items, e.g. 'question'
+        :param items: list of decoded items
+        """
+        f = self._files.get((site, type))
+        if f is None:
+            directory = os.path.join(self.directory, site) if site else self.directory
+            os.makedirs(directory, exist_ok=True)
+            f = self._files[(site, type)] = open(os.path.join(directory, type + ".jsonl"),
+                                                 "a", encoding="utf-8")
+        f.write("".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items))
+
+    def flush(self):
+        """
+        Flush written items to disk. Called before a task is checkpointed
+        """
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# client of a worker process, see _init_worker
+_worker_client = None
+
+def _init_worker(bucket_path, rate, client_options):
+    """
+    Create the client of a worker process. The processes of a crawl share
+    one token bucket file, which keeps them within the crawl's rate
+    """
+    global _worker_client
+    bucket = FileTokenBucket(bucket_path, rate=rate)
+    _worker_client = Client(scheduler=Scheduler(bucket), **client_options)
+
+def _fetch_task(endpoint, parameters, page, client=None):
+    """
+    Fetch and decode the page of a task. Runs in a worker
+    """
+    client = client or _worker_client
+    _, url = client._build_query(endpoint, dict(parameters, page=page))
+    return client._get_json(endpoint, url, use_cache=False)
+
+def _field(item, path):
+    for part in path.split("."):
+        if not isinstance(item, dict):
+            return None
+        item = item.get(part)
+    return item
+
+def _item_type(endpoint):
+    cls = record_type(endpoint)
+    return cls._type if cls is not None else endpoint.split("/", 1)[0]
+
+def crawl(queue, sink, expansions=None, follow_up_parameters=None, workers=4,
+          processes=True, rate=30, max_tasks=None, max_attempts=3,
+          batch_size=default_batch_size, **client_options):
+    """
+    Work through the tasks of a crawl queue until none are left.
+
+    Up to `workers` pages are fetched at the same time. Each finished page
+    is written to the sink, flushed, and then checkpointed in the queue with
+    its follow-ups. Tasks claimed by an interrupted crawl are released
+    first, so only one crawl should work on a queue at a time. The crawl
+    also stops once the API reports no quota left.
+
+    :param queue:                :class:`CrawlQueue` to work through
+    :param sink:                 object with ``write(site, type, items)``
+                                 and ``flush()``, e.g. :class:`JsonlSink`
+    :param expansions:           follow-up requests per endpoint, defaults
+                                 to `default_expansions`. pass {} for none
+    :param follow_up_parameters: parameters of follow-up requests other than
+                                 `site` and `ids`, e.g. {'filter': 'withbody'}
+    :param workers:              number of worker processes, or threads
+    :param processes:            fetch and decode in worker processes. if
+                                 False, threads of this process are used
+    :param rate:                 requests per second of the whole crawl
+    :param max_tasks:            stop after claiming this many tasks
+    :param max_attempts:         number of times a task is tried
+    :param batch_size:           number of ids per follow-up request
+    :param client_options:       keyword arguments of :class:`pyse.Client`
+                                 for the workers' clients, e.g. `key`
+
+    :returns: dictionary with the numbers of `tasks` done, `items` written
+        and `failures` during this crawl, and the queue's `counts`
+    """
+    if expansions is None:
+        expansions = default_expansions
+    follow_up_parameters = dict(follow_up_parameters or {}, pagesize=100)
+
+    queue.release()
+    client = None
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(queue.path + ".bucket", rate,
+                                                 client_options))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        client = Client(scheduler=Scheduler(TokenBucket(rate=rate)), **client_options)
+
+    stats = {"tasks": 0, "items": 0, "failures": 0}
+    in_flight = {}
+    claimed = 0
+    stopping = False
+    try:
+        while True:
+            room = 2 * workers - len(in_flight)
+            if max_tasks is not None:
+                room = min(room, max_tasks - claimed)
+            if not stopping and room > 0:
+                tasks = queue.claim(room)
+                if not tasks and not in_flight and queue.flush(batch_size):
+                    continue
+                claimed += len(tasks)
+                for task in tasks:
+                    future = executor.submit(_fetch_task, task.endpoint, task.parameters,
+                                             task.page, client)
+                    in_flight[future] = task
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                try:
+                    j = future.result()
+                except Exception as e:
+                    queue.fail(task, f"{type(e).__name__}: {e}", max_attempts)
+                    stats["failures"] += 1
+                    continue
+                if "error_id" in j:
+                    queue.fail(task, f"{j.get('error_name')} {j['error_id']}: "
+                                     f"{j.get('error_message')}", max_attempts)
+                    stats["failures"] += 1
+                    continue
+
+                items = j.get("items") or []
+                site = task.parameters.get("site")
+                sink.write(site, _item_type(task.endpoint), items)
+                sink.flush()
+
+                follow_ups = []
+                for endpoint, field in expansions.get(task.endpoint, ()):
+                    ids = [i for i in (_field(item, field) for item in items) if i is not None]
+                    if ids:
+                        follow_ups.append((endpoint, dict(follow_up_parameters, site=site),
+                                           ids))
+                queue.complete(task, j.get("has_more", False), follow_ups, batch_size)
+                stats["tasks"] += 1
+                stats["items"] += len(items)
+
+                if j.get("quota_remaining") == 0:
+                    stopping = True
+    finally:
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown()
+        # tasks that didn't finish are claimed again by the next crawl
+        queue.release()
+
+    stats["counts"] = queue.counts()
+    return stats
@@ -0,0 +1,206 @@
+"""
+pyse.hooks
+~~~~~~~~~~
+
+This module contains the request hooks and the built-in request metrics.
+
+A hook is a function called with one event dictionary per request sent by
+:func:`pyse.query`. Events are only built while at least one hook is
+registered. An event has the keys:
+
+    endpoint         URL endpoint of the request, e.g. 'questions/{ids}'
+    url              full request URL
+    method           HTTP method
+    status           HTTP status code, None if no request was sent
+    cache            'hit', 'miss' or 'bypass', None if no cache is set
+    bytes            size of the response body, 0 for cache hits
+    timings          seconds spent per phase: 'wait' (scheduler), 'network',
+                     'decode' (JSON), 'wrap' (LookupDict) and 'total'
+    quota_remaining  `quota_remaining` of the response
+    backoff          `backoff` of the response
+    error            error name of an API error or exception, or None
+    coalesced        whether the response was shared from an identical
+                     request in flight, see :mod:`pyse.coalesce`. such events
+                     have no status, bytes or request timings
+
+Example::
+
+    >>> import pyse
+    >>> pyse.register_hook(print)
+    >>> pyse.enable_metrics()
+    >>> pyse.query(pyse.queries.questions.ALL, site="stackoverflow")
+    >>> print(pyse.metrics.prometheus())
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import bisect
+import threading
+import time
+
+_hooks = []
+
+def register_hook(hook):
+    """
+    Register a function to be called with the event of every request
+
+    :param hook: function taking one event dictionary
+    """
+    _hooks.append(hook)
+    return hook
+
+def unregister_hook(hook):
+    """
+    Unregister a hook added with :func:`register_hook`
+    """
+    _hooks.remove(hook)
+
+def active():
+    """
+    Whether any hook is registered, i.e. whether events should be built
+    """
+    return bool(_hooks)
+
+def new_event(endpoint, url, method):
+    """
+    Start the event of a request
+    """
+    return {
+        "endpoint": endpoint,
+        "url": url,
+        "method": method,
+        "status": None,
+        "cache": None,
+        "bytes": 0,
+        "timings": {},
+        "quota_remaining": None,
+        "backoff": None,
+        "error": None,
+        "coalesced": False,
+        "_start": time.perf_counter(),
+    }
+
+def emit(event, response=None, error=None):
+    """
+    Finish an event and call every hook with it
+
+    :param event:    event started with :func:`new_event`
+    :param response: decoded response wrapper, if any
+    :param error:    exception raised by the request, if any
+    """
+    event["timings"]["total"] = time.perf_counter() - event.pop("_start")
+    if response is not None:
+        event["quota_remaining"] = response.get("quota_remaining")
+        event["backoff"] = response.get("backoff")
+        event["error"] = response.get("error_name")
+    if error is not None:
+        event["error"] = type(error).__name__
+
+    for hook in list(_hooks):
+        hook(event)
+
+class Metrics:
+    """
+    Per-endpoint request counters and latency histograms, fed by events.
+
+    Register it as a hook with :func:`enable_metrics`.
+    """
+    # upper bounds of the latency histogram buckets, in seconds
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            stats = self._endpoints.get(event["endpoint"])
+            if stats is None:
+                stats = self._endpoints[event["endpoint"]] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "cache_hits": 0,
+                    "coalesced": 0,
+                    "bytes": 0,
+                    "quota_used": 0,
+                    "quota_remaining": None,
+                    "seconds": {},
+                    "latency_buckets": [0] * len(self.buckets),
+                }
+
+            stats["requests"] += 1
+            stats["bytes"] += event["bytes"]
+            if event["error"]:
+                stats["errors"] += 1
+            if event["cache"] == "hit":
+                stats["cache_hits"] += 1
+            elif event["coalesced"]:
+                stats["coalesced"] += 1
+            elif event["status"] is not None:
+                # every request that reaches the API costs one quota
+                stats["quota_used"] += 1
+            if event["quota_remaining"] is not None:
+                stats["quota_remaining"] = event["quota_remaining"]
+
+            for phase, seconds in event["timings"].items():
+                stats["seconds"][phase] = stats["seconds"].get(phase, 0) + seconds
+            total = event["timings"]["total"]
+            stats["latency_buckets"][bisect.bisect_left(self.buckets, total)] += 1
+
+    def snapshot(self):
+        """
+        Get a copy of the per-endpoint counters
+        """
+        with self._lock:
+            return {endpoint: {k: (dict(v) if isinstance(v, dict) else
+                                   list(v) if isinstance(v, list) else v)
+                               for k, v in stats.items()}
+                    for endpoint, stats in self._endpoints.items()}
+
+    def reset(self):
+        """
+        Clear every counter
+        """
+        with self._lock:
+            self._endpoints.clear()
+
+    def prometheus(self, prefix="pyse"):
+        """
+        Render the counters in the Prometheus text exposition format
+        """
+        lines = []
+        for endpoint, stats in sorted(self.snapshot().items()):
+            label = 'endpoint="%s"' % endpoint
+            for counter in ("requests", "errors", "cache_hits", "coalesced", "bytes",
+                            "quota_used"):
+                lines.append(f"{prefix}_{counter}_total{{{label}}} {stats[counter]}")
+            for phase, seconds in sorted(stats["seconds"].items()):
+                lines.append(f'{prefix}_phase_seconds_total{{{label},phase="{phase}"}} {seconds}')
+            cumulative = 0
+            for bound, count in zip(self.buckets, stats["latency_buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'{prefix}_request_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_request_seconds_sum{{{label}}} {stats['seconds']['total']}")
+            lines.append(f"{prefix}_request_seconds_count{{{label}}} {stats['requests']}")
+        return "\n".join(lines) + "\n"
+
+"""
+The built-in metrics, collected while enabled with :func:`enable_metrics`
+"""
+metrics = Metrics()
+
+def enable_metrics():
+    """
+    Start collecting the built-in :data:`metrics`
+    """
+    if metrics not in _hooks:
+        register_hook(metrics)
+
+def disable_metrics():
+    """
+    Stop collecting the built-in :data:`metrics`
+    """
+    if metrics in _hooks:
+        unregister_hook(metrics)
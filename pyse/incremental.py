@@ -0,0 +1,190 @@
+"""
+pyse.incremental
+~~~~~~~~~~~~~~~~
+
+This module implements incremental syncing of API objects.
+
+A sync remembers, per (site, endpoint, parameters), a high-water mark: the
+newest activity (or creation) date it has delivered, and the ids of the
+objects at exactly that date. The next sync only asks the API for objects at
+or after the mark, and skips the ones it already delivered.
+
+The mark is passed to the API as `min`, with `sort` set to the date field and
+`order` ascending. The API's `fromdate`/`todate` parameters always filter on
+creation date, so they can't find objects that were edited since the last
+sync; they can still be passed to limit a sync to objects created in a given
+window.
+
+Example::
+
+    >>> state = pyse.SyncState("sync.db")
+    >>> for question in pyse.sync(pyse.queries.questions.ALL, state,
+    ...                           site="stackoverflow", tagged=["python"]):
+    ...     store(question)
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import json
+import threading
+import time
+
+from .client import get_client
+from .records import record_type
+from .utils import raise_request_exception, sqlite_connection
+
+# date field each `sort` orders by
+date_fields = {
+    "activity": "last_activity_date",
+    "creation": "creation_date",
+}
+
+class SyncState:
+    """
+    High-water marks of syncs, kept in a sqlite database.
+
+    Marks are committed after every page, so a sync that is interrupted
+    resumes after the last page it finished. Objects of an unfinished page
+    are delivered again.
+    """
+    def __init__(self, path):
+        """
+        Create a new SyncState
+
+        :param path: path of the sqlite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._db as db:
+            db.execute("CREATE TABLE IF NOT EXISTS watermarks ("
+                       "key TEXT PRIMARY KEY, watermark INTEGER, "
+                       "boundary_ids TEXT, updated REAL)")
+
+    @property
+    def _db(self):
+        return sqlite_connection(self._local, self.path)
+
+    @staticmethod
+    def key(site, endpoint, parameters):
+        """
+        Get the key of a sync
+        """
+        return json.dumps([site, endpoint, sorted(parameters.items())],
+                          separators=(",", ":"), default=str)
+
+    def get(self, key):
+        """
+        Get the high-water mark of a sync
+
+        :returns: tuple (watermark, set of ids at the watermark), or
+            (None, empty set) if the sync never ran
+        """
+        row = self._db.execute("SELECT watermark, boundary_ids FROM watermarks "
+                               "WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, set()
+        return row[0], set(json.loads(row[1]))
+
+    def put(self, key, watermark, boundary_ids):
+        """
+        Store the high-water mark of a sync
+        """
+        with self._db as db:
+            db.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                       (key, watermark, json.dumps(sorted(boundary_ids)), time.time()))
+
+    def reset(self, key=None):
+        """
+        Forget the high-water mark of one sync, or of every sync
+        """
+        with self._db as db:
+            if key is None:
+                db.execute("DELETE FROM watermarks")
+            else:
+                db.execute("DELETE FROM watermarks WHERE key = ?", (key,))
+
+def sync(endpoint, state, site, since=None, id_field=None, client=None, **parameters):
+    """
+    Iterate over the objects that were created or changed since the last
+    sync of the same query.
+
+    Objects are delivered oldest first. The high-water mark is advanced as
+    they are consumed and committed after every page.
+
+    :param endpoint:   URL endpoint of query
+    :param state:      :class:`SyncState` holding the high-water marks
+    :param site:       Stack Exchange site to query
+    :param since:      date to start from on the first sync, as a unix
+                       timestamp. defaults to the beginning of time
+    :param id_field:   id field of the objects. defaults to the id field of
+                       the endpoint's record type, see :mod:`pyse.records`
+    :param client:     :class:`pyse.Client` to query, defaults to the
+                       default client
+    :param parameters: keyword arguments for parameters in API request.
+        `sort` defaults to 'activity', or 'creation' for objects without an
+        activity date, such as comments and users (see :mod:`pyse.records`).
+        `min`, `order` and `page` are set by the sync.
+        `fields` (see :func:`pyse.query`) always include the date and id
+        fields.
+
+    :raises ValueError: if the id field is unknown, the objects have no
+        date field for `sort`, or the API returns an error
+    """
+    cls = record_type(endpoint)
+    if "sort" not in parameters:
+        # comments and users have no activity date
+        parameters["sort"] = ("creation" if cls is not None and
+                              "last_activity_date" not in cls._fields else "activity")
+    date_field = date_fields.get(parameters["sort"])
+    if date_field is None:
+        raise ValueError(f"can't sync on sort '{parameters['sort']}'")
+    if cls is not None and date_field not in cls._fields:
+        raise ValueError(f"objects of API endpoint '{endpoint}' have no {date_field}")
+    if id_field is None:
+        id_field = cls._id_field if cls is not None else None
+        if id_field is None:
+            raise ValueError(f"unknown id field for API endpoint '{endpoint}'")
+    if parameters.get("fields") is not None:
+        # the sync needs the date and id of every object
+        parameters["fields"] = sorted(set(parameters["fields"]) | {date_field, id_field})
+    parameters.setdefault("pagesize", 100)
+    for p in ("min", "order", "page"):
+        parameters.pop(p, None)
+
+    if client is None:
+        client = get_client()
+
+    key = state.key(site, endpoint, parameters)
+    watermark, boundary = state.get(key)
+    if watermark is None:
+        watermark = since or 0
+
+    page = 1
+    while True:
+        response = client.query(endpoint, site=site, order="asc", min=watermark,
+                                page=page, use_cache=False, **parameters)
+        if response["error_id"] is not None:
+            raise_request_exception(ValueError, response)
+
+        start = watermark
+        for item in response["items"] or []:
+            date, item_id = item[date_field], item[id_field]
+            # at the watermark, skip what the last page or sync delivered
+            if date < watermark or (date == watermark and item_id in boundary):
+                continue
+
+            yield item
+
+            if date > watermark:
+                watermark, boundary = date, {item_id}
+            else:
+                boundary.add(item_id)
+
+        state.put(key, watermark, boundary)
+
+        if not response["has_more"]:
+            return
+        # start over from the new watermark. if a full page shared one date,
+        # the watermark didn't move and the next page is needed instead
+        page = 1 if watermark != start else page + 1
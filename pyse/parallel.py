@@ -0,0 +1,368 @@
+"""
+pyse.parallel
+~~~~~~~~~~~~~
+
+This module implements queries that are split into many API requests sent
+concurrently.
+
+Every request still goes through :meth:`pyse.Client.query` of one client, so
+all of them share the transport's connection pool, the response cache and
+the scheduler's rate limit, backoffs and quota.
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import hooks
+from .client import get_client
+from .records import record_type
+from .types import filters, default_parameters
+from .utils import raise_request_exception
+
+# default number of requests sent concurrently
+default_max_workers = 8
+
+def query_sites(endpoint, sites, max_workers=None, quota_reserve=None, client=None,
+                **parameters):
+    """
+    Run the same query against several sites concurrently.
+
+    A failure on one site doesn't stop the others.
+
+    Example::
+
+        >>> for site, response, error in pyse.query_sites(
+        ...         pyse.queries.tags.ALL, ["stackoverflow", "serverfault"]):
+        ...     print(site, error or len(response.items))
+
+    :param endpoint:      URL endpoint of query
+    :param sites:         list of sites to query
+    :param max_workers:   maximum number of sites queried at once
+    :param quota_reserve: don't start querying a site once the scheduler's
+                          `quota_remaining` is below this. such sites fail
+                          with a ``ValueError``
+    :param client:        :class:`pyse.Client` to query, defaults to the
+                          default client
+    :param parameters:    keyword arguments for parameters in API request,
+                          other than `site`. see :func:`pyse.query`
+
+    :returns: a generator of tuples (site, response, error) in the order the
+        sites finish. `error` is the exception raised for the site, and
+        `response` is None if it is set. API errors are raised as
+        ``ValueError``.
+    """
+    if client is None:
+        client = get_client()
+    scheduler = client.scheduler
+
+    def run(site):
+        remaining = scheduler.quota_remaining
+        if quota_reserve is not None and remaining is not None and remaining < quota_reserve:
+            raise ValueError(f"quota_remaining {remaining} is below the reserve of {quota_reserve}")
+
+        response = client.query(endpoint, site=site, **parameters)
+        if response["error_id"] is not None:
+            raise_request_exception(ValueError, response)
+        return response
+
+    workers = min(max_workers or default_max_workers, len(sites)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, site): site for site in sites}
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = (futures[future], future.result(), None)
+                except Exception as e:
+                    result = (futures[future], None, e)
+                yield result
+        finally:
+            # the caller stopped early, don't start the remaining sites
+            for future in futures:
+                future.cancel()
+
+# fields of the items each `sort` orders by, for merging windows
+sort_fields = {
+    "creation": "creation_date",
+    "activity": "last_activity_date",
+    "votes": "score",
+}
+
+# default number of items a window of :func:`query_sharded` is sized to
+default_window_items = 2500
+
+def _count(client, endpoint, start, stop, parameters):
+    """
+    Count the items of a query created in [start, stop) with the `total`
+    filter
+    """
+    response = client.query(endpoint, filter=filters.TOTAL, fromdate=start, todate=stop - 1,
+                            **parameters)
+    if response["error_id"] is not None:
+        raise_request_exception(ValueError, response)
+    return response["total"]
+
+def _plan_windows(count, pool, start, stop, window_items):
+    """
+    Split [start, stop) into windows holding at most `window_items` items,
+    or a single second. windows are split evenly in time and the parts
+    counted again, so dense periods end up in narrower windows
+
+    :param count: function counting the items of a window (start, stop)
+
+    :returns: list of tuples (start, stop) of the windows holding items, in
+        time order
+    """
+    windows = []
+    pending = [(start, stop, count(start, stop))]
+    while pending:
+        split = []
+        for a, b, total in pending:
+            if total <= window_items or b - a <= 1:
+                if total:
+                    windows.append((a, b))
+                continue
+            parts = min(max(2, -(-total // window_items)), b - a)
+            edges = [a + (b - a) * i // parts for i in range(parts + 1)]
+            split.extend(zip(edges, edges[1:]))
+        totals = pool.map(lambda w: count(*w), split)
+        pending = [(a, b, total) for (a, b), total in zip(split, totals)]
+    return sorted(windows)
+
+def query_sharded(endpoint, window_items=None, max_workers=None, id_field=None, client=None,
+                  **parameters):
+    """
+    Fetch a large result set as time windows fetched concurrently.
+
+    The `fromdate`/`todate` range of the query is split into windows of
+    creation dates, sized with `filter=total` count probes so each window
+    holds about `window_items` items. Windows are fetched concurrently,
+    each paging from its first page, and merged into one stream in the
+    order of `sort`. Deep page numbers are never requested.
+
+    Example::
+
+        >>> for question in pyse.query_sharded(pyse.queries.questions.ALL,
+        ...                                    site="stackoverflow",
+        ...                                    fromdate=1546300800, todate=1577836799):
+        ...     ingest(question)
+
+    :param endpoint:     URL endpoint of query, taking `fromdate`/`todate`
+    :param window_items: number of items a window is sized to, defaults to
+                         `default_window_items`
+    :param max_workers:  maximum number of requests sent at once
+    :param id_field:     id field of the items, guessed from the endpoint if
+                         not given. items seen twice in a window, because
+                         pages shifted while it was fetched, are skipped
+    :param client:       :class:`pyse.Client` to query, defaults to the
+                         default client
+    :param parameters:   keyword arguments for parameters in API request.
+        `fromdate` and `todate` default to the API defaults, `todate` to
+        now at the latest. `sort` defaults to 'creation', which is streamed
+        window by window. 'activity' and 'votes' are merged once every
+        window has been fetched. `page` can't be passed.
+
+    :returns: a generator of items
+
+    :raises ValueError: if the sort can't be merged, the id field is
+        unknown, or the API returns an error
+    """
+    if client is None:
+        client = get_client()
+    if "page" in parameters:
+        raise ValueError("sharded queries always start from the first page")
+    sort = parameters.setdefault("sort", "creation")
+    if sort not in sort_fields:
+        raise ValueError(f"can't merge windows sorted by '{sort}'")
+    descending = parameters.get("order", default_parameters["order"]) == "desc"
+    if id_field is None:
+        cls = record_type(endpoint)
+        if cls is None or cls._id_field is None:
+            raise ValueError(f"unknown id field for API endpoint '{endpoint}'")
+        id_field = cls._id_field
+
+    start = parameters.pop("fromdate", default_parameters["fromdate"])
+    stop = min(parameters.pop("todate", default_parameters["todate"]), int(time.time())) + 1
+    # items to fetch, and the parameters that select them
+    fields = parameters.pop("fields", None)
+    if fields is not None:
+        # merging needs the id and sort field of every item
+        fields = sorted(set(fields) | {id_field, sort_fields[sort]})
+    probe = {k: v for k, v in parameters.items()
+             if k not in ("filter", "pagesize", "sort", "order", "lazy", "typed")}
+
+    def fetch(window):
+        seen = set()
+        items = []
+        for item in client.query_iter(endpoint, fromdate=window[0], todate=window[1] - 1,
+                                      fields=fields, **parameters):
+            if item[id_field] not in seen:
+                seen.add(item[id_field])
+                items.append(item)
+        return items
+
+    workers = max_workers or default_max_workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        windows = _plan_windows(lambda a, b: _count(client, endpoint, a, b, probe), pool,
+                                start, stop, window_items or default_window_items)
+        if descending:
+            windows.reverse()
+
+        if sort != "creation":
+            # every window holds items from the whole range of the sort field
+            field = sort_fields[sort]
+            yield from heapq.merge(*pool.map(fetch, windows), reverse=descending,
+                                   key=lambda item: item[field])
+            return
+
+        # windows are in creation order already. fetch a few ahead of the
+        # caller
+        pending = deque()
+        windows = iter(windows)
+        try:
+            while True:
+                for window in itertools.islice(windows, 2 * workers - len(pending)):
+                    pending.append(pool.submit(fetch, window))
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+        finally:
+            # the caller stopped early, don't start the remaining windows
+            for future in pending:
+                future.cancel()
+
+def _cell_key(cell):
+    """
+    Hashable form of a cell, with list values as tuples
+    """
+    return tuple(_cell_key(v) if isinstance(v, (list, tuple)) else v for v in cell)
+
+class CountTable:
+    """
+    Counts of a parameter matrix, see :func:`query_counts`.
+
+    `names` are the keys of the matrix, `cells` the combinations of their
+    values in matrix order, and `counts` the count of each cell, or None if
+    its request failed. `errors` maps failed cells to their exception,
+    with list values of a cell turned into tuples.
+    """
+    __slots__ = ("names", "cells", "counts", "errors", "_index")
+
+    def __init__(self, names, cells, counts, errors):
+        self.names = names
+        self.cells = cells
+        self.counts = counts
+        self.errors = errors
+        # position of each cell. identical cells have identical counts
+        self._index = {_cell_key(cell): i for i, cell in enumerate(cells)}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        """
+        Iterate over tuples (cell, count)
+        """
+        return zip(self.cells, self.counts)
+
+    def __getitem__(self, cell):
+        """
+        Get the count of a cell, a tuple of values in the order of `names`
+        """
+        return self.counts[self._index[_cell_key(cell)]]
+
+    def get(self, **values):
+        """
+        Get the count of the cell with the given value for every name, e.g.
+        table.get(site='stackoverflow', tagged='python')
+        """
+        return self[tuple(values[name] for name in self.names)]
+
+    def __repr__(self):
+        return f"<count_table {' x '.join(map(str, self.names))}: {len(self.cells)} cells>"
+
+def query_counts(endpoint, matrix, max_workers=None, use_cache=True, client=None,
+                 **parameters):
+    """
+    Count the results of a query for every combination of parameter values.
+
+    Each combination is one request with the `total` filter. Requests are
+    sent concurrently, and combinations building the same request share it.
+    Responses are read without building response wrappers.
+
+    Example::
+
+        >>> months = [(1577836800, 1580515199), (1580515200, 1583020799)]
+        >>> table = pyse.query_counts(pyse.queries.questions.ALL, {
+        ...     "site": ["stackoverflow", "serverfault"],
+        ...     "tagged": ["python", "linux"],
+        ...     ("fromdate", "todate"): months,
+        ... })
+        >>> table["serverfault", "linux", months[0]]
+        2213
+
+    :param endpoint:    URL endpoint of query
+    :param matrix:      dictionary of parameter name to list of values. a
+                        tuple of names takes tuples of values, e.g. a date
+                        window ('fromdate', 'todate')
+    :param max_workers: maximum number of requests sent at once
+    :param use_cache:   whether to use the client's response cache
+    :param client:      :class:`pyse.Client` to query, defaults to the default
+                        client
+    :param parameters:  keyword arguments for parameters in API request,
+                        shared by every cell
+
+    :returns: a :class:`CountTable`
+    """
+    if client is None:
+        client = get_client()
+    names = tuple(matrix)
+    cells = list(itertools.product(*matrix.values()))
+
+    urls = []
+    for cell in cells:
+        cell_parameters = dict(parameters, filter=filters.TOTAL)
+        for name, value in zip(names, cell):
+            if isinstance(name, tuple):
+                cell_parameters.update(zip(name, value))
+            else:
+                cell_parameters[name] = value
+        method, url = client._build_query(endpoint, cell_parameters)
+        if method != "GET":
+            raise NotImplementedError("POST not implemented")
+        urls.append(url)
+
+    def count(url):
+        event = hooks.new_event(endpoint, url, "GET") if hooks.active() else None
+        try:
+            j = client._get_json(endpoint, url, use_cache=use_cache, event=event)
+        except Exception as e:
+            if event is not None:
+                hooks.emit(event, error=e)
+            raise
+        if event is not None:
+            hooks.emit(event, j)
+        if "error_id" in j:
+            raise_request_exception(ValueError, j)
+        return j["total"]
+
+    # identical cells share one request
+    unique = list(dict.fromkeys(urls))
+    workers = min(max_workers or default_max_workers, len(unique)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {url: pool.submit(count, url) for url in unique}
+        totals, failures = {}, {}
+        for url, future in futures.items():
+            try:
+                totals[url] = future.result()
+            except Exception as e:
+                failures[url] = e
+
+    errors = {_cell_key(cell): failures[url] for cell, url in zip(cells, urls)
+              if url in failures}
+    return CountTable(names, cells, [totals.get(url) for url in urls], errors)
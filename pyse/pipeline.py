@@ -0,0 +1,206 @@
+"""
+pyse.pipeline
+~~~~~~~~~~~~~
+
+This module implements pipelined bulk fetches.
+
+:func:`query_pipeline` splits paging through a query into three stages that
+run at the same time:
+
+    network       a thread fetching raw pages, one after the other
+    decode        JSON decoding of a page
+    construction  wrapping the decoded page in :class:`pyse.LookupDict`,
+                  :class:`pyse.LazyLookupDict` or records
+
+Decoding and construction run together in an executor, a process pool by
+default, so the CPU work of one page overlaps with the network wait for the
+next ones. Bounded queues between the stages keep the network from running
+ahead of the decoders, and the decoders from running ahead of the caller.
+Pages are yielded in page order.
+
+Example::
+
+    >>> for page in pyse.query_pipeline(pyse.queries.questions.ALL,
+    ...                                 site="stackoverflow", filter="withbody",
+    ...                                 max_pages=50):
+    ...     ingest(page.items)
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from . import utils
+from .api import _wrap_response
+from .client import get_client
+from .utils import get_response, raise_request_exception
+
+# `has_more` of a raw page. a key can't occur inside a JSON string, where
+# its quotes would be escaped
+_has_more = re.compile(rb'"has_more"\s*:\s*(true|false)')
+
+# numeric response fields read by the scheduler, read from a raw page the
+# same way
+_throttle_fields = {name: re.compile(rb'"' + name.encode() + rb'"\s*:\s*(\d+)')
+                    for name in ("quota_remaining", "quota_max", "backoff")}
+
+_done = object()
+
+def _throttle(status_code, content):
+    """
+    Get the response fields read by the scheduler from a raw page, without
+    decoding successful pages
+    """
+    if status_code != HTTPStatus.OK:
+        # error pages are small, and throttle_violation errors carry their
+        # backoff in the message
+        return utils.json_loads(content)
+    throttle = {}
+    for name, pattern in _throttle_fields.items():
+        match = pattern.search(content)
+        if match is not None:
+            throttle[name] = int(match.group(1))
+    return throttle
+
+def _decode_page(content, lazy, typed, endpoint):
+    """
+    Decode and wrap a raw page. Runs in the executor
+    """
+    return _wrap_response(utils.json_loads(content), lazy, typed, endpoint)
+
+def _fetch_pages(client, endpoint, parameters, page, max_pages, fetched, stop):
+    """
+    Fetch raw pages until the last page, putting tuples (status, content)
+    or an exception on `fetched`. Runs in the network thread
+    """
+    scheduler = client.scheduler
+    pages = 0
+
+    def put(item):
+        # wait for room, unless the caller stopped
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        while max_pages is None or pages < max_pages:
+            _, url = client._build_query(endpoint, dict(parameters, page=page))
+            scheduler.wait(endpoint)
+            r = get_response(url, transport=client.transport)
+            pages += 1
+            # before the next wait, so a backoff holds back the next request
+            scheduler.update(endpoint, _throttle(r.status_code, r.content))
+            if not put((r.status_code, r.content)):
+                return
+
+            more = _has_more.search(r.content)
+            if r.status_code != HTTPStatus.OK or more is None or more.group(1) != b"true":
+                break
+            page += 1
+    except Exception as e:
+        put(e)
+    put(_done)
+
+def query_pipeline(endpoint, max_pages=None, executor=None, workers=None, prefetch=4,
+                   lazy=False, typed=False, fields=None, client=None, **parameters):
+    """
+    Page through a query with the network, decode and construction stages
+    running concurrently.
+
+    The response cache and hooks are not used. Every request goes through
+    the scheduler. The network stage reads each page's quota and backoff
+    from the raw bytes, before it sends the next request.
+
+    :param endpoint:   URL endpoint of query
+    :param max_pages:  stop after fetching this many pages
+    :param executor:   ``concurrent.futures`` executor to decode pages in.
+                       defaults to a process pool created for this call.
+                       pass a ``ThreadPoolExecutor`` when pages are small;
+                       results of a process pool are pickled back
+    :param workers:    number of processes of the default executor
+    :param prefetch:   number of raw pages the network stage may fetch ahead
+                       of the decoders, and pages decoded ahead of the caller
+    :param lazy:       see :func:`pyse.query`
+    :param typed:      see :func:`pyse.query`
+    :param fields:     list of item fields to fetch, see :func:`pyse.query`
+    :param client:     :class:`pyse.Client` to query, defaults to the
+                       default client
+    :param parameters: keyword arguments for parameters in API request.
+        `pagesize` defaults to 100. `page` is the page to start from.
+
+    :returns: a generator of page responses, in page order
+
+    :raises ValueError: if the API returns an error for any page, once that
+        page is reached
+    """
+    if client is None:
+        client = get_client()
+    if fields is not None:
+        client._project(endpoint, fields, parameters)
+    method, _ = client._build_query(endpoint, dict(parameters))
+    if method != "GET":
+        raise NotImplementedError("POST not implemented")
+    parameters.setdefault("pagesize", 100)
+    page = parameters.pop("page", 1)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # the first task starts the worker processes. fork them now, before
+        # the network thread may hold a lock the children would inherit
+        executor.submit(int).result()
+
+    fetched = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    network = threading.Thread(target=_fetch_pages, daemon=True,
+                               args=(client, endpoint, parameters, page, max_pages, fetched, stop))
+    network.start()
+
+    pending = deque()
+    network_done = False
+    try:
+        while True:
+            # keep the decoders busy. only wait on the network when there is
+            # no decoded page to hand out
+            while not network_done and len(pending) < prefetch:
+                try:
+                    item = fetched.get(block=not pending)
+                except queue.Empty:
+                    break
+                if item is _done:
+                    network_done = True
+                elif isinstance(item, Exception):
+                    pending.append(item)
+                    network_done = True
+                else:
+                    _, content = item
+                    pending.append(executor.submit(_decode_page, content, lazy,
+                                                   typed, endpoint))
+            if not pending:
+                return
+
+            head = pending.popleft()
+            if isinstance(head, Exception):
+                raise head
+            response = head.result()
+            if response["error_id"] is not None:
+                raise_request_exception(ValueError, response)
+            yield response
+    finally:
+        stop.set()
+        for future in pending:
+            if not isinstance(future, Exception):
+                future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+        network.join()
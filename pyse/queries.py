@@ -43,7 +43,7 @@ _queries = {
         "all": ("GET", "answers"),
         "by_id": {
             "all": ("GET", "answers/{ids}"),
-            "comments": ("GET", "answers/{id}/comments"),
+            "comments": ("GET", "answers/{ids}/comments"),
             "delete": ("POST", "answers/{id}/delete"),
             "downvote": {
                 "cast": ("POST", "answers/{id}/downvote"),
@@ -171,7 +171,7 @@ _queries = {
             "posts": ("GET", "users/{ids}/posts"),
             "privileges": ("GET", "users/{id}/privileges"),
             "questions": {
-                "all":  "users/{ids}/questions",
+                "all": ("GET", "users/{ids}/questions"),
                 "featured": ("GET", "users/{ids}/questions/featured"),
                 "no_answers": ("GET", "users/{ids}/questions/no-answers"),
                 "unaccepted": ("GET", "users/{ids}/questions/unaccepted"),
@@ -222,7 +222,7 @@ _queries = {
             "posts": ("GET", "me/posts"),
             "privileges": ("GET", "me/privileges"),
             "questions": {
-                "all":  "me/questions",
+                "all": ("GET", "me/questions"),
                 "featured": ("GET", "me/questions/featured"),
                 "no_answers": ("GET", "me/questions/no-answers"),
                 "unaccepted": ("GET", "me/questions/unaccepted"),
@@ -260,8 +260,9 @@ _queries = {
         "add": ("POST", "questions/add"),
         "all": ("GET", "questions"),
         "by_id": {
+            "all": ("GET", "questions/{ids}"),
             "answers": {
-                "all": ("GET", "questions/{ids}"),
+                "all": ("GET", "questions/{ids}/answers"),
                 "add": ("POST", "questions/{ids}/answers/add"),
                 "render": ("POST", "questions/{ids}/answers/render"),
             },
@@ -0,0 +1,327 @@
+"""
+pyse.records
+~~~~~~~~~~~~
+
+This module contains compact record types for the main Stack Exchange API
+objects: questions, answers, comments, users and tags.
+
+A record keeps its fields in ``__slots__`` instead of a per-instance
+``__dict__``, and interns strings that repeat across objects, such as tag
+names and user types. Fields a record type doesn't know, e.g. ones added by
+a custom filter, are still kept. Records are built by
+``pyse.query(..., typed=True)``::
+
+    >>> r = pyse.query(pyse.queries.questions.ALL, site="stackoverflow", typed=True)
+    >>> r.items[0]
+    <question 11227809>
+    >>> r.items[0].owner.display_name
+
+Fields missing from a response are None.
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+from sys import intern
+
+from .structures import LookupDict, _lazy_wrap
+
+def _intern(value):
+    return intern(value) if isinstance(value, str) else value
+
+def _intern_list(value):
+    if isinstance(value, list):
+        return [intern(v) if isinstance(v, str) else v for v in value]
+    return value
+
+class Record:
+    """
+    Base class of the record types.
+
+    Subclasses list their fields in ``__slots__``. Nested objects are
+    converted with the functions in `_convert`, strings of the fields in
+    `_interned` are interned, and any other nested object is wrapped in a
+    :class:`pyse.LazyLookupDict`.
+    """
+    __slots__ = ("_extra",)
+
+    _fields = frozenset()
+    # name of the record type, and of the field used in its repr
+    _type = "record"
+    _id_field = None
+    # field name -> function converting the decoded value
+    _convert = {}
+    # fields holding strings that repeat across objects
+    _interned = frozenset()
+
+    def __init__(self, data):
+        """
+        Create a new record
+
+        :param data: decoded JSON object
+        """
+        cls = type(self)
+        fields, convert = cls._fields, cls._convert
+        setter = object.__setattr__
+
+        # unset slots read as None, see __getattr__
+        extra = None
+        for key, value in data.items():
+            if key in fields:
+                if key in convert:
+                    value = convert[key](value)
+                setter(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = _lazy_wrap(value, key)
+        setter(self, "_extra", extra)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # every slot but `_extra`, for fast membership tests
+        cls._fields = frozenset(cls.__slots__)
+        # interning is one more conversion
+        cls._convert = dict(dict.fromkeys(cls._interned, _intern), **cls._convert)
+
+    def __getattr__(self, name):
+        # only called for unset slots and names that aren't slots
+        if name in self._fields:
+            return None
+        extra = object.__getattribute__(self, "_extra")
+        if extra is not None and name in extra:
+            return extra[name]
+        raise AttributeError(f"'{self._type}' record has no field '{name}'")
+
+    def __getitem__(self, key):
+        # allow fallthrough, default to None
+        return self.get(key)
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def keys(self):
+        """
+        Get the fields present in the record
+        """
+        keys = [f for f in self.__slots__ if getattr(self, f) is not None]
+        if self._extra is not None:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self._id_field is not None:
+            return f"<{self._type} {getattr(self, self._id_field)}>"
+        return f"<{self._type}>"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def to_dict(self):
+        """
+        Convert the record back to plain dictionaries and lists
+        """
+        return {key: _to_plain(self[key]) for key in self.keys()}
+
+def _to_plain(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return value
+
+def _record(cls):
+    def convert(value):
+        return cls(value) if isinstance(value, dict) else value
+    return convert
+
+def _records(cls):
+    def convert(value):
+        if isinstance(value, list):
+            return [cls(v) if isinstance(v, dict) else v for v in value]
+        return value
+    return convert
+
+class BadgeCount(Record):
+    __slots__ = ("bronze", "silver", "gold")
+    _type = "badge_count"
+
+class ShallowUser(Record):
+    __slots__ = ("accept_rate", "badge_counts", "display_name", "link",
+                 "profile_image", "reputation", "user_id", "user_type")
+    _type = "shallow_user"
+    _id_field = "user_id"
+    _convert = {"badge_counts": _record(BadgeCount)}
+    # a user shows up once per post, keep one copy of their strings
+    _interned = frozenset({"display_name", "link", "profile_image", "user_type"})
+
+class Comment(Record):
+    __slots__ = ("body", "body_markdown", "comment_id", "content_license",
+                 "creation_date", "edited", "link", "owner", "post_id",
+                 "post_type", "reply_to_user", "score")
+    _type = "comment"
+    _id_field = "comment_id"
+    _convert = {"owner": _record(ShallowUser), "reply_to_user": _record(ShallowUser)}
+    _interned = frozenset({"content_license", "post_type"})
+
+class Answer(Record):
+    __slots__ = ("answer_id", "body", "body_markdown", "comment_count",
+                 "comments", "community_owned_date", "content_license",
+                 "creation_date", "is_accepted", "last_activity_date",
+                 "last_edit_date", "last_editor", "link", "locked_date",
+                 "owner", "question_id", "score", "tags", "title")
+    _type = "answer"
+    _id_field = "answer_id"
+    _convert = {"owner": _record(ShallowUser), "last_editor": _record(ShallowUser),
+                "comments": _records(Comment), "tags": _intern_list}
+    _interned = frozenset({"content_license"})
+
+class Question(Record):
+    __slots__ = ("accepted_answer_id", "answer_count", "answers", "body",
+                 "body_markdown", "bounty_amount", "bounty_closes_date",
+                 "closed_date", "closed_reason", "comment_count", "comments",
+                 "community_owned_date", "content_license", "creation_date",
+                 "is_answered", "last_activity_date", "last_edit_date",
+                 "last_editor", "link", "locked_date", "migrated_from",
+                 "owner", "protected_date", "question_id", "score", "tags",
+                 "title", "view_count")
+    _type = "question"
+    _id_field = "question_id"
+    _convert = {"owner": _record(ShallowUser), "last_editor": _record(ShallowUser),
+                "answers": _records(Answer), "comments": _records(Comment),
+                "tags": _intern_list, "migrated_from": lambda v: _lazy_wrap(v, "migrated_from")}
+    _interned = frozenset({"closed_reason", "content_license"})
+
+class User(Record):
+    __slots__ = ("about_me", "accept_rate", "account_id", "age",
+                 "badge_counts", "creation_date", "display_name",
+                 "is_employee", "last_access_date", "last_modified_date",
+                 "link", "location", "profile_image", "reputation",
+                 "reputation_change_day", "reputation_change_month",
+                 "reputation_change_quarter", "reputation_change_week",
+                 "reputation_change_year", "timed_penalty_date", "user_id",
+                 "user_type", "website_url")
+    _type = "user"
+    _id_field = "user_id"
+    _convert = {"badge_counts": _record(BadgeCount)}
+    _interned = frozenset({"location", "user_type"})
+
+class Tag(Record):
+    __slots__ = ("count", "has_synonyms", "is_moderator_only", "is_required",
+                 "last_activity_date", "name", "synonyms", "user_id")
+    _type = "tag"
+    _id_field = "name"
+    _convert = {"synonyms": _intern_list}
+    _interned = frozenset({"name"})
+
+"""
+API type of the objects nested in a field, used to name nested fields in
+filters. e.g. 'owner.display_name' of a question is 'shallow_user.display_name'
+"""
+nested_types = {
+    "owner": "shallow_user",
+    "last_editor": "shallow_user",
+    "reply_to_user": "shallow_user",
+    "answers": "answer",
+    "comments": "comment",
+    "badge_counts": "badge_count",
+    "migrated_from": "migration_info",
+    "closed_details": "closed_details",
+    "notice": "notice",
+}
+
+"""
+Record type of the items of an endpoint, by the last literal segment of the
+endpoint. e.g. 'users/{ids}/questions/unanswered' holds questions.
+"""
+segment_types = {
+    "questions": Question,
+    "featured": Question,
+    "no-answers": Question,
+    "unaccepted": Question,
+    "unanswered": Question,
+    "my-tags": Question,
+    "linked": Question,
+    "related": Question,
+    "faq": Question,
+    "top-questions": Question,
+    "search": Question,
+    "advanced": Question,
+    "similar": Question,
+    "answers": Answer,
+    "top-answers": Answer,
+    "comments": Comment,
+    "mentioned": Comment,
+    "users": User,
+    "moderators": User,
+    "elected": User,
+    "me": User,
+    "tags": Tag,
+    "info": Tag,
+    "moderator-only": Tag,
+    "required": Tag,
+}
+
+# endpoints the segment rule gets wrong
+endpoint_types = {
+    "badges/tags": None,
+    "tags/{tags}/related": Tag,
+}
+
+_endpoint_types = {}
+
+def record_type(endpoint):
+    """
+    Get the record type of the items of an endpoint
+
+    :param endpoint: URL endpoint, e.g. 'questions/{ids}/answers'
+
+    :returns: a :class:`Record` subclass, or None if items of the endpoint
+        have no record type
+    """
+    try:
+        return _endpoint_types[endpoint]
+    except KeyError:
+        pass
+
+    if endpoint in endpoint_types:
+        cls = endpoint_types[endpoint]
+    else:
+        segments = [s for s in endpoint.split("/") if s and "{" not in s]
+        cls = segment_types.get(segments[-1]) if segments else None
+    _endpoint_types[endpoint] = cls
+    return cls
+
+def wrap_records(j, cls, name="response_wrapper"):
+    """
+    Wrap a decoded response in a :class:`pyse.LookupDict` whose `items` are
+    records of type `cls`
+    """
+    wrapper = LookupDict(data={k: v for k, v in j.items() if k != "items"}, name=name)
+    items = j.get("items")
+    if items is not None:
+        wrapper.items = [cls(item) for item in items]
+    return wrapper
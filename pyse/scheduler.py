@@ -0,0 +1,242 @@
+"""
+pyse.scheduler
+~~~~~~~~~~~~~~
+
+This module contains the request scheduler, which keeps the Stack Exchange
+API wrapper within the API's throttles.
+
+The API returns a `backoff` field when a method must not be called again for
+some number of seconds, and a `quota_remaining` field with the number of
+requests left for the day. The scheduler reads both from every response,
+holds back requests to a method until its backoff has passed, limits the
+request rate with a token bucket, and slows requests down as the quota runs
+low.
+
+Example::
+
+    >>> import pyse
+    >>> pyse.set_scheduler(pyse.Scheduler(pyse.FileTokenBucket("/tmp/pyse.bucket")))
+    >>> pyse.query(pyse.queries.questions.ALL, site="stackoverflow")
+    >>> pyse.get_scheduler().quota_remaining
+    299
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+    """
+    def __init__(self, rate=30, capacity=None):
+        """
+        Create a new TokenBucket
+
+        :param rate:     tokens added per second
+        :param capacity: maximum number of tokens, i.e. the largest burst.
+                         defaults to `rate`
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens):
+        """
+        Take tokens if available
+
+        :returns: 0 if the tokens were taken, otherwise the number of seconds
+            until they will be available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` tokens can be taken from the bucket
+        """
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+class FileTokenBucket(TokenBucket):
+    """
+    A token bucket shared by every process using the same state file.
+
+    The bucket state is kept in a small file that is locked with ``flock``
+    while it is updated. Only available on platforms with ``fcntl``.
+    """
+    def __init__(self, path, rate=30, capacity=None):
+        """
+        Create a new FileTokenBucket
+
+        :param path:     path of the shared state file
+        :param rate:     tokens added per second
+        :param capacity: maximum number of tokens, defaults to `rate`
+
+        :raises RuntimeError: if the platform has no ``fcntl``
+        """
+        if fcntl is None:
+            raise RuntimeError("FileTokenBucket requires fcntl, which this platform lacks")
+        super(FileTokenBucket, self).__init__(rate=rate, capacity=capacity)
+        self.path = path
+
+    def _take(self, tokens):
+        # the thread lock keeps threads of this process from sharing the
+        # file offset, the file lock serializes processes
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = f.read().split()
+                # wall-clock time, monotonic clocks aren't comparable
+                # between processes
+                now = time.time()
+                if len(state) == 2:
+                    available = min(self.capacity,
+                                    float(state[0]) + (now - float(state[1])) * self.rate)
+                else:
+                    available = self.capacity
+
+                wait = 0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                f.write(f"{available} {now}")
+                f.flush()
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class Scheduler:
+    """
+    Schedules API requests around backoffs, rate limits and the daily quota.
+    """
+    # a throttle violation blocks every method, it is recorded under this key
+    _all_endpoints = None
+
+    def __init__(self, bucket=None, low_quota=100, max_quota_delay=10):
+        """
+        Create a new Scheduler
+
+        :param bucket:          :class:`TokenBucket` limiting the request
+                                rate, defaults to 30 requests per second
+        :param low_quota:       once `quota_remaining` drops below this,
+                                requests are delayed
+        :param max_quota_delay: delay in seconds added to each request when
+                                the quota is used up. the delay grows linearly
+                                towards this as the quota runs out
+        """
+        self.bucket = bucket if bucket is not None else TokenBucket()
+        self.low_quota = low_quota
+        self.max_quota_delay = max_quota_delay
+        self.quota_remaining = None
+        self.quota_max = None
+        self._backoffs = {}
+        self._lock = threading.Lock()
+
+    def backoff_remaining(self, endpoint):
+        """
+        Get the number of seconds left before `endpoint` may be called again
+        """
+        with self._lock:
+            until = max(self._backoffs.get(endpoint, 0),
+                        self._backoffs.get(self._all_endpoints, 0))
+        return max(0, until - time.monotonic())
+
+    def quota_delay(self):
+        """
+        Get the delay added to each request because of a low quota
+        """
+        remaining = self.quota_remaining
+        if remaining is None or remaining >= self.low_quota:
+            return 0
+        return self.max_quota_delay * (1 - max(remaining, 0) / self.low_quota)
+
+    def wait(self, endpoint):
+        """
+        Block until a request to `endpoint` may be sent
+
+        :param endpoint: URL endpoint of the request
+        """
+        backoff = self.backoff_remaining(endpoint)
+        if backoff:
+            time.sleep(backoff)
+
+        delay = self.quota_delay()
+        if delay:
+            time.sleep(delay)
+
+        self.bucket.acquire()
+
+    def update(self, endpoint, response):
+        """
+        Record the throttle fields of a response
+
+        :param endpoint: URL endpoint of the request
+        :param response: decoded response wrapper
+        """
+        with self._lock:
+            if "quota_remaining" in response:
+                self.quota_remaining = response["quota_remaining"]
+            if "quota_max" in response:
+                self.quota_max = response["quota_max"]
+            if response.get("backoff"):
+                self._backoffs[endpoint] = time.monotonic() + response["backoff"]
+
+            # throttle_violation: "... more requests available in N seconds"
+            if response.get("error_id") == 502:
+                m = re.search(r"(\d+) seconds", response.get("error_message", ""))
+                if m:
+                    self._backoffs[self._all_endpoints] = time.monotonic() + int(m.group(1))
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Get the scheduler used by :func:`pyse.query`, creating a default
+    :class:`Scheduler` on first use.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
+
+def set_scheduler(scheduler):
+    """
+    Replace the scheduler used by :func:`pyse.query`
+
+    :param scheduler: a :class:`Scheduler`, or None to restore the default
+
+    :returns: the previous scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        previous, _scheduler = _scheduler, scheduler
+    return previous
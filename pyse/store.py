@@ -0,0 +1,334 @@
+"""
+pyse.store
+~~~~~~~~~~
+
+This module contains a local object store for the Stack Exchange API wrapper.
+
+The store keeps API objects (questions, answers, comments, users and tags)
+in a sqlite database, keyed by site, type and id, with indexes on tags,
+owner, creation date and activity date. While a store is set, every item
+returned by :func:`pyse.query` is written to it.
+
+Id lookups are answered from the store, and only ids that are missing or
+older than `max_age` are fetched::
+
+    >>> store = pyse.ObjectStore("objects.db", max_age=3600)
+    >>> pyse.set_object_store(store)
+    >>> r = store.lookup("questions/{ids}", ids=[1, 2, 3], site="stackoverflow")
+    >>> store.select("stackoverflow", "question", tagged=["python"],
+    ...              fromdate=1577836800, sort="activity", limit=10)
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import json
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from .records import record_type
+from .utils import raise_request_exception, sqlite_connection
+
+# id field of each object type
+id_fields = {
+    "question": "question_id",
+    "answer": "answer_id",
+    "comment": "comment_id",
+    "user": "user_id",
+    "tag": "name",
+}
+
+# columns of the date each `sort` orders by
+sort_columns = {
+    "creation": "creation_date",
+    "activity": "last_activity_date",
+}
+
+# endpoints looking objects up by their own ids, with their id argument
+lookup_args = {
+    "questions/{ids}": "ids",
+    "answers/{ids}": "ids",
+    "comments/{ids}": "ids",
+    "users/{ids}": "ids",
+    "tags/{tags}/info": "tags",
+}
+
+class ObjectStore:
+    """
+    API objects kept in a sqlite database, which can be shared by several
+    processes pointed at the same file.
+    """
+    def __init__(self, path, max_age=86400):
+        """
+        Create a new ObjectStore
+
+        :param path:    path of the sqlite database file
+        :param max_age: age in seconds after which a stored object is stale
+                        and fetched again by :meth:`lookup`
+        """
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+
+        with self._db as db:
+            db.execute("CREATE TABLE IF NOT EXISTS objects ("
+                       "site TEXT, type TEXT, id, filter TEXT, fetched REAL, "
+                       "owner_id INTEGER, creation_date INTEGER, "
+                       "last_activity_date INTEGER, value TEXT, "
+                       "PRIMARY KEY (site, type, id))")
+            db.execute("CREATE TABLE IF NOT EXISTS tags ("
+                       "site TEXT, type TEXT, tag TEXT, id, "
+                       "PRIMARY KEY (site, type, tag, id))")
+            for column in ("owner_id", "creation_date", "last_activity_date"):
+                db.execute(f"CREATE INDEX IF NOT EXISTS objects_{column} "
+                           f"ON objects (site, type, {column})")
+
+    @property
+    def _db(self):
+        return sqlite_connection(self._local, self.path)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def put(self, site, type, items, filter="default"):
+        """
+        Store objects, replacing stored objects with the same id
+
+        :param site:   site of the objects
+        :param type:   API type of the objects, e.g. 'question'
+        :param items:  list of decoded objects. objects without an id are
+                       skipped
+        :param filter: filter the objects were fetched with
+
+        :returns: number of objects stored
+        """
+        id_field = id_fields[type]
+        now = time.time()
+        rows, tags, ids = [], [], []
+        for item in items:
+            item_id = item.get(id_field)
+            if item_id is None:
+                continue
+            owner = item.get("owner")
+            rows.append((site, type, item_id, filter, now,
+                         owner.get("user_id") if isinstance(owner, dict) else None,
+                         item.get("creation_date"), item.get("last_activity_date"),
+                         json.dumps(item)))
+            ids.append((site, type, item_id))
+            for tag in item.get("tags") or ():
+                tags.append((site, type, tag, item_id))
+
+        with self._db as db:
+            db.executemany("DELETE FROM tags WHERE site = ? AND type = ? AND id = ?", ids)
+            db.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           rows)
+            db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?, ?, ?)", tags)
+        return len(rows)
+
+    def put_response(self, endpoint, url, j):
+        """
+        Store the items of a decoded response, if the endpoint returns a type
+        of object the store knows. Tags are only stored from site-wide tag
+        endpoints.
+
+        :param endpoint: URL endpoint of the request
+        :param url:      full request URL, holding the site and filter
+        :param j:        decoded response
+        """
+        cls = record_type(endpoint)
+        if cls is None or cls._type not in id_fields or not j.get("items"):
+            return 0
+        # tags of users/{id}/tags and me/tags count a user's posts, not the
+        # site's, but share the site-wide tag's name
+        if cls._type == "tag" and not endpoint.startswith("tags"):
+            return 0
+        qs = parse_qs(urlsplit(url).query)
+        if "site" not in qs:
+            return 0
+        return self.put(qs["site"][0], cls._type, j["items"],
+                        qs.get("filter", ["default"])[0])
+
+    def get(self, site, type, ids, max_age=None, filter="default"):
+        """
+        Get stored objects by id
+
+        :param site:    site of the objects
+        :param type:    API type of the objects, e.g. 'question'
+        :param ids:     list of ids
+        :param max_age: skip objects stored longer ago than this many
+                        seconds, None for no limit
+        :param filter:  only return objects fetched with this filter. objects
+                        fetched with 'withbody' also match 'default'
+
+        :returns: dictionary of id to decoded object, for the ids found
+        """
+        filters = ("default", "withbody") if filter == "default" else (filter,)
+        oldest = time.time() - max_age if max_age is not None else 0
+        found = {}
+        ids = list(ids)
+        # stay below sqlite's limit of bound parameters
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i+500]
+            rows = self._db.execute(
+                "SELECT id, value FROM objects WHERE site = ? AND type = ? "
+                f"AND fetched >= ? AND filter IN ({','.join('?' * len(filters))}) "
+                f"AND id IN ({','.join('?' * len(chunk))})",
+                (site, type, oldest, *filters, *chunk))
+            for item_id, value in rows:
+                found[item_id] = json.loads(value)
+        return found
+
+    def lookup(self, endpoint, ids=None, site=None, max_age=None, lazy=False, typed=False,
+               client=None, **parameters):
+        """
+        Look objects up by id, fetching only the ones that are missing from
+        the store or stale
+
+        :param endpoint:   URL endpoint returning the objects of its ids, one
+                           of `lookup_args`, e.g. 'questions/{ids}'
+        :param ids:        list of ids, or tag names for 'tags/{tags}/info'
+        :param site:       Stack Exchange site to query
+        :param max_age:    age in seconds after which a stored object is
+                           fetched again, defaults to the store's `max_age`
+        :param lazy:       see :func:`pyse.query`
+        :param typed:      see :func:`pyse.query`
+        :param client:     :class:`pyse.Client` fetching the missing objects,
+                           defaults to the default client
+        :param parameters: keyword arguments for parameters in API request
+
+        :returns: a response wrapper like :func:`pyse.query` with the items
+            in the order of `ids`. ids that don't exist are left out.
+            `local` is the number of items answered by the store
+
+        :raises ValueError: if the endpoint doesn't look objects up by their
+            ids, or the API returns an error
+        """
+        # pyse.client imports this module
+        from .api import _wrap_response
+        from .client import get_client
+
+        if client is None:
+            client = get_client()
+
+        arg = lookup_args.get(endpoint)
+        if arg is None:
+            raise ValueError(f"API endpoint '{endpoint}' doesn't look objects up by id")
+        if ids is None:
+            ids = parameters.pop(arg)
+        type = record_type(endpoint)._type
+        # objects are stored under integer ids, only tags go by name
+        ids = [str(i) for i in ids] if type == "tag" else [int(i) for i in ids]
+        filter = parameters.get("filter", "default")
+        max_age = self.max_age if max_age is None else max_age
+
+        found = self.get(site, type, ids, max_age=max_age, filter=filter)
+        local = len(found)
+        missing = [i for i in dict.fromkeys(ids) if i not in found]
+
+        j = {"has_more": False}
+        if missing:
+            parameters.setdefault("pagesize", 100)
+            response = client.query(endpoint, site=site, use_cache=False, lazy=True,
+                                    **{arg: missing}, **parameters)
+            if response["error_id"] is not None:
+                raise_request_exception(ValueError, response)
+            j.update((k, response[k]) for k in ("quota_max", "quota_remaining", "backoff")
+                     if response[k] is not None)
+            items = [item.to_dict() for item in response["items"] or []]
+            # query() already stored them if this is the client's store
+            if client.object_store is not self:
+                self.put(site, type, items, filter)
+            found.update((item[id_fields[type]], item) for item in items)
+
+        j["items"] = [found[i] for i in ids if i in found]
+        j["local"] = local
+        return _wrap_response(j, lazy, typed, endpoint)
+
+    def select(self, site, type, tagged=None, owner_id=None, fromdate=None, todate=None,
+               sort="creation", order="desc", min=None, max=None, limit=None,
+               max_age=None):
+        """
+        Query stored objects, without any network request
+
+        :param site:     site of the objects
+        :param type:     API type of the objects, e.g. 'question'
+        :param tagged:   list of tags, objects must have all of them
+        :param owner_id: user id of the owner
+        :param fromdate: earliest creation date, as a unix timestamp
+        :param todate:   latest creation date, as a unix timestamp
+        :param sort:     'creation' or 'activity', the date to order by
+        :param order:    'desc' or 'asc'
+        :param min:      earliest date of the sort field
+        :param max:      latest date of the sort field
+        :param limit:    maximum number of objects returned
+        :param max_age:  skip objects stored longer ago than this many
+                         seconds, None for no limit
+
+        :returns: list of decoded objects
+        """
+        if sort not in sort_columns:
+            raise ValueError(f"can't sort stored objects by '{sort}'")
+        column = sort_columns[sort]
+
+        where, args = ["o.site = ?", "o.type = ?"], [site, type]
+        for condition, value in (("o.owner_id = ?", owner_id),
+                                 ("o.creation_date >= ?", fromdate),
+                                 ("o.creation_date <= ?", todate),
+                                 (f"o.{column} >= ?", min),
+                                 (f"o.{column} <= ?", max),
+                                 ("o.fetched >= ?",
+                                  None if max_age is None else time.time() - max_age)):
+            if value is not None:
+                where.append(condition)
+                args.append(value)
+        if tagged:
+            tagged = sorted(set(tagged))
+            where.append("o.id IN (SELECT id FROM tags WHERE site = ? AND type = ? "
+                         f"AND tag IN ({','.join('?' * len(tagged))}) "
+                         "GROUP BY id HAVING COUNT(*) = ?)")
+            args.extend([site, type, *tagged, len(tagged)])
+
+        sql = (f"SELECT o.value FROM objects o WHERE {' AND '.join(where)} "
+               f"ORDER BY o.{column} {'ASC' if order == 'asc' else 'DESC'}, o.id")
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [json.loads(value) for value, in self._db.execute(sql, args)]
+
+    def delete(self, site, type, ids):
+        """
+        Remove objects from the store
+        """
+        rows = [(site, type, i) for i in ids]
+        with self._db as db:
+            db.executemany("DELETE FROM objects WHERE site = ? AND type = ? AND id = ?", rows)
+            db.executemany("DELETE FROM tags WHERE site = ? AND type = ? AND id = ?", rows)
+
+    def clear(self):
+        """
+        Remove every object from the store
+        """
+        with self._db as db:
+            db.execute("DELETE FROM objects")
+            db.execute("DELETE FROM tags")
+
+_object_store = None
+
+def get_object_store():
+    """
+    Get the object store :func:`pyse.query` writes items to, or None
+    """
+    return _object_store
+
+def set_object_store(store):
+    """
+    Set the object store :func:`pyse.query` writes items to
+
+    :param store: an :class:`ObjectStore`, or None to stop storing items
+
+    :returns: the previous store
+    """
+    global _object_store
+    previous, _object_store = _object_store, store
+    return previous
@@ -0,0 +1,169 @@
+"""
+pyse.stream
+~~~~~~~~~~~
+
+This module implements streaming decoding of API responses.
+
+A streamed response is read in chunks. Each element of `items` is decoded as
+soon as its last byte arrives, and the rest of the response wrapper
+(`has_more`, `quota_remaining`, `backoff`, ...) is decoded once the whole
+response has been read. Only the element being read is held in memory, never
+the whole response.
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import re
+
+from . import utils
+from .structures import LookupDict, LazyLookupDict
+
+# characters that open or close a JSON value, and the string delimiter
+_structural = re.compile(rb'["\[\]{}]')
+# rest of a JSON string after its opening quote
+_string_rest = re.compile(rb'(?:[^"\\]|\\.)*"', re.S)
+
+def iter_items(chunks, loads=None):
+    """
+    Incrementally decode a response wrapper.
+
+    Elements of `items` must be JSON objects, as they are for every API
+    method.
+
+    :param chunks: iterable of bytes chunks of the response body
+    :param loads:  function decoding a bytes JSON document, defaults to the
+                   JSON backend of :mod:`pyse.utils`
+
+    :returns: a generator yielding every decoded element of `items`, whose
+        return value is the decoded wrapper without its `items`
+    """
+    if loads is None:
+        loads = utils.json_loads
+
+    buf = bytearray()
+    pos = 0
+    depth = 0
+    last_string = None
+    in_items = False
+    item_start = None
+    head = None
+
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            m = _structural.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+
+            c = buf[m.start()]
+            if c == 0x22:  # "
+                end = _string_rest.match(buf, m.end())
+                if end is None:
+                    # string continues in the next chunk
+                    pos = m.start()
+                    break
+                if depth == 1:
+                    last_string = buf[m.end():end.end() - 1]
+                pos = end.end()
+            elif c == 0x7b or c == 0x5b:  # { [
+                depth += 1
+                pos = m.end()
+                if depth == 2 and c == 0x5b and last_string == b"items":
+                    # keep the wrapper up to and including the `[`
+                    in_items = True
+                    head = bytes(buf[:pos])
+                    del buf[:pos]
+                    pos = 0
+                elif in_items and depth == 3:
+                    item_start = m.start()
+            else:  # } ]
+                depth -= 1
+                pos = m.end()
+                if in_items and depth == 2:
+                    yield loads(buf[item_start:pos])
+                    del buf[:pos]
+                    pos = 0
+                    item_start = None
+                elif in_items and depth == 1:
+                    # end of `items`, keep the `]` and the rest of the wrapper
+                    in_items = False
+                    del buf[:m.start()]
+                    pos = 1
+
+        if in_items and item_start is None:
+            # drop separators between elements
+            del buf[:pos]
+            pos = 0
+
+    if head is None:
+        # no `items` in the response, e.g. an error
+        return loads(buf)
+    return loads(head + buf)
+
+class StreamedResponse:
+    """
+    An API response whose items are decoded while it is being read.
+
+    Iterate over it to get the items. Once every item has been read, the
+    other fields of the response wrapper are available on :attr:`wrapper`
+    and as attributes.
+
+    A streamed response can only be iterated over once.
+    """
+    def __init__(self, chunks, lazy=False, on_wrapper=None, close=None):
+        """
+        Create a new StreamedResponse
+
+        :param chunks:     iterable of bytes chunks of the response body
+        :param lazy:       wrap items in :class:`LazyLookupDict` instead of
+                           :class:`LookupDict`
+        :param on_wrapper: function called with the decoded wrapper once the
+                           whole response has been read
+        :param close:      function releasing the underlying connection
+        """
+        self._chunks = chunks
+        self._lazy = lazy
+        self._on_wrapper = on_wrapper
+        self._close = close
+        self.wrapper = None
+
+    def __repr__(self):
+        return "<streamed response>"
+
+    def __iter__(self):
+        if self._chunks is None:
+            raise RuntimeError("a streamed response can only be iterated over once")
+        chunks, self._chunks = self._chunks, None
+
+        wrap = LazyLookupDict if self._lazy else LookupDict
+        name = "response_wrapper/items"
+        items = iter_items(chunks)
+        while True:
+            try:
+                item = next(items)
+            except StopIteration as stop:
+                self._finish(stop.value)
+                return
+            yield wrap(data=item, name=name)
+
+    def close(self):
+        """
+        Stop reading the response and release its connection. Not needed
+        once every item has been read.
+        """
+        self._chunks = None
+        if self._close is not None:
+            self._close()
+
+    def _finish(self, wrapper):
+        if self._on_wrapper is not None:
+            self._on_wrapper(wrapper)
+        self.wrapper = LookupDict(data=wrapper, name="response_wrapper")
+
+    def __getattr__(self, key):
+        # wrapper fields, once the response has been read
+        if key.startswith("_") or self.wrapper is None:
+            raise AttributeError(key)
+        return getattr(self.wrapper, key)
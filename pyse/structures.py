@@ -7,6 +7,17 @@ This module contains the structures used in the Stack Exchange API wrapper
 :copyright: (c) 2020 by Jake Grossman
 :license: MIT, see LICENSE for more details.
 """
+from collections.abc import Sequence
+from string import Formatter
+
+def _restore_lookup(cls, attributes):
+    """
+    Rebuild a pickled :class:`LookupDict`
+    """
+    lookup = cls.__new__(cls)
+    lookup.__dict__.update(attributes)
+    return lookup
+
 # FIXME: Needs tests
 class LookupDict(dict):
     """
@@ -48,6 +59,11 @@ class LookupDict(dict):
         # allow fallthrough, default to None
         return self.__dict__.get(key, None)
 
+    def __reduce__(self):
+        # pickle the attributes. the default for dict subclasses calls
+        # self.items(), which the `items` of a response hides
+        return (_restore_lookup, (type(self), self.__dict__))
+
     def get(self, key, default=None):
         return self.__dict__.get(key, default)
 
@@ -93,6 +109,219 @@ class LookupDict(dict):
             elif v == target:
                 return [k]
 
+def _lazy_wrap(value, name):
+    """
+    Wrap a decoded JSON value in a lazy view, leaving leaves untouched
+    """
+    if isinstance(value, dict):
+        return LazyLookupDict(value, name)
+    if isinstance(value, list):
+        return LazyList(value, name)
+    return value
+
+class LazyLookupDict:
+    """
+    A read-only view of a decoded JSON object with the same attribute and
+    item access as :class:`LookupDict`.
+
+    Unlike :class:`LookupDict`, nothing is copied up front. The decoded
+    dictionary is kept as is, and nested objects and lists are wrapped when
+    they are accessed.
+    """
+    __slots__ = ("_data", "_name")
+
+    def __init__(self, data=None, name=None):
+        """
+        Create a new LazyLookupDict
+
+        :param data: decoded JSON object to wrap
+        :param name: internal name of LazyLookupDict
+        """
+        self._data = data if data is not None else {}
+        self._name = name if name else ""
+
+    def __repr__(self):
+        return f"<lookup '{self._name}'>"
+
+    def __getattr__(self, key):
+        # only called for names that aren't slots or methods. private names
+        # are never JSON fields, and must not recurse while unpickling
+        if key.startswith("_"):
+            raise AttributeError(key)
+        try:
+            value = self._data[key]
+        except KeyError:
+            raise AttributeError(key) from None
+        return _lazy_wrap(value, self._name + "/" + key)
+
+    def __getitem__(self, key):
+        # allow fallthrough, default to None
+        return self.get(key, None)
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        return _lazy_wrap(self._data[key], self._name + "/" + key)
+
+    def keys(self):
+        return self._data.keys()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyLookupDict):
+            return self._data == other._data
+        return NotImplemented
+
+    def to_dict(self):
+        """
+        Get the wrapped decoded JSON object
+        """
+        return self._data
+
+class LazyList(Sequence):
+    """
+    A read-only view of a decoded JSON list whose object elements are wrapped
+    in :class:`LazyLookupDict` when they are accessed.
+    """
+    __slots__ = ("_data", "_name")
+
+    def __init__(self, data, name=None):
+        self._data = data
+        self._name = name if name else ""
+
+    def __repr__(self):
+        return f"<lookup list '{self._name}'>"
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyList(self._data[index], self._name)
+        return _lazy_wrap(self._data[index], self._name)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        name = self._name
+        for value in self._data:
+            yield _lazy_wrap(value, name)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyList):
+            return self._data == other._data
+        if isinstance(other, list):
+            return self._data == other
+        return NotImplemented
+
+    def to_list(self):
+        """
+        Get the wrapped decoded JSON list
+        """
+        return self._data
+
+class Endpoint:
+    """
+    A compiled URL endpoint.
+
+    The endpoint template is split into literal text and format argument
+    names once, on first use, so URLs can be built without parsing the
+    template again. Building a URLTree doesn't parse any template.
+    """
+    __slots__ = ("template", "method", "path", "_args", "_pieces")
+
+    def __init__(self, template, method="GET", path=None):
+        """
+        Create a new Endpoint
+
+        :param template: URL endpoint, e.g. 'questions/{ids}/answers'
+        :param method:   HTTP method of the endpoint
+        :param path:     list of property names leading to the endpoint in
+                         its URLTree
+        """
+        self.template = template
+        self.method = method
+        self.path = path
+        self._pieces = None
+        self._args = None
+
+    def __repr__(self):
+        return f"<endpoint {self.method} '{self.template}'>"
+
+    def _compile(self):
+        self._pieces = tuple((literal, arg) for literal, arg, _, _ in
+                             Formatter().parse(self.template))
+        self._args = tuple(arg for _, arg in self._pieces if arg)
+
+    @property
+    def args(self):
+        """
+        Names of the format arguments of the endpoint
+        """
+        if self._args is None:
+            self._compile()
+        return self._args
+
+    def format(self, values):
+        """
+        Build the URL endpoint with its format arguments filled in
+
+        :param values: dictionary of format argument name to string value
+        """
+        if self._pieces is None:
+            self._compile()
+        return "".join(literal + values[arg] if arg else literal
+                       for literal, arg in self._pieces)
+
+class EndpointRegistry:
+    """
+    A flat index of compiled URL endpoints, with a reverse index from a URL
+    endpoint to its property path.
+    """
+    def __init__(self):
+        self._endpoints = {}
+
+    def __len__(self):
+        return len(self._endpoints)
+
+    def __contains__(self, template):
+        return template in self._endpoints
+
+    def __iter__(self):
+        return iter(self._endpoints)
+
+    def __getitem__(self, template):
+        """
+        Get the compiled endpoint of a URL endpoint. Endpoints that weren't
+        registered, e.g. formatted URLs, get a GET endpoint that isn't kept.
+        """
+        endpoint = self._endpoints.get(template)
+        if endpoint is None:
+            endpoint = Endpoint(template)
+        return endpoint
+
+    def add(self, template, method, path):
+        """
+        Register a URL endpoint
+
+        A URL endpoint can appear several times in a URLTree. The last
+        method wins, the first path is kept.
+        """
+        endpoint = self._endpoints.get(template)
+        if endpoint is None:
+            self._endpoints[template] = Endpoint(template, method, path)
+        else:
+            endpoint.method = method
+
+    def items(self):
+        return self._endpoints.items()
+
 # FIXME: Needs tests
 class URLTree(LookupDict):
     """
@@ -101,8 +330,11 @@ class URLTree(LookupDict):
     Two components:
         A tree of URL endpoints
         A mapping from URL endpoints to HTTP methods
+
+    Every subtree shares the `methods` lookup and the `registry` of compiled
+    endpoints of its root.
     """
-    def __init__(self, data, name=None):
+    def __init__(self, data, name=None, _root=None, _path=()):
         """
         Create a new URL Tree
 
@@ -117,29 +349,35 @@ class URLTree(LookupDict):
         """
 
         super(URLTree, self).__init__(name=name)
-        self.methods = LookupDict(name="methods")
-        self.site_required = LookupDict(name="site_required")
+        self._path = list(_path)
+        if _root is None:
+            self.methods = LookupDict(name="methods")
+            self.site_required = LookupDict(name="site_required")
+            self.registry = EndpointRegistry()
+        else:
+            self.methods = _root.methods
+            self.site_required = _root.site_required
+            self.registry = _root.registry
+        root = _root if _root is not None else self
+
         if isinstance(data, dict):
             for k, v in data.items():
                 if isinstance(v, dict):
-                    sub_tree = URLTree(
-                        data[k],
-                        name=name + "/" + k if name else None
-                    )
-
                     # set subtree
-                    setattr(self, k, sub_tree)
-
-                    # set method lookup
-                    self.methods.update(sub_tree.methods)
-                    self.site_required.update(sub_tree.site_required)
+                    setattr(self, k, URLTree(
+                        v,
+                        name=name + "/" + k if name else None,
+                        _root=root,
+                        _path=self._path + [k],
+                    ))
                 else:
                     # upper- and lower-case allowed
                     setattr(self, k.upper(), v[1])
                     setattr(self, k, v[1])
 
-
+                    # set method lookup
                     setattr(self.methods, v[1], v[0])
+                    self.registry.add(v[1], v[0], self._path + [k.upper()])
 
     def __repr__(self):
         return f"<url_tree '{self._name}'>"
@@ -153,3 +391,17 @@ class URLTree(LookupDict):
         :returns : HTTP method of target URL
         """
         return self.methods[target]
+
+    def path(self, target):
+        """
+        Get property path given a target URL endpoint, relative to this tree.
+
+        :param target: URL endpoint to look for
+
+        :returns: a list of property names, or None if `target` isn't in
+            this tree
+        """
+        path = self.registry[target].path
+        if path is None or path[:len(self._path)] != self._path:
+            return None
+        return path[len(self._path):]
@@ -0,0 +1,294 @@
+"""
+pyse.transport
+~~~~~~~~~~~~~~
+
+This module contains the HTTP transports used to talk to the Stack Exchange API
+
+:copyright: (c) 2020 by Jake Grossman
+:license: MIT, see LICENSE for more details.
+"""
+
+import os
+import threading
+from http import HTTPStatus
+
+# (connect, read) timeout in seconds
+default_timeout = (3.05, 30)
+
+# query parameters left out of cassette keys, so recordings hold no secrets
+# and replay with any key
+cassette_ignored_parameters = ("key", "access_token")
+
+class Transport:
+    """
+    Base class for HTTP transports.
+
+    A transport takes a fully-formed request URL and returns a
+    ``requests.Response``. Subclasses can be swapped in with
+    :func:`set_transport`, e.g. to point pyse at a local stub server.
+    """
+    def get(self, url, timeout=None, stream=False):
+        """
+        Perform a GET request
+
+        :param url:     full request URL
+        :param timeout: per-request timeout, overrides the transport default
+        :param stream:  don't read the body up front, it is read through
+                        ``Response.iter_content`` instead
+
+        :returns: a ``requests.Response``
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any resources held by the transport
+        """
+        pass
+
+class SessionTransport(Transport):
+    """
+    A pooled, keep-alive transport backed by ``requests.Session``.
+
+    All threads share one connection pool. Each thread gets its own
+    ``requests.Session`` mounted on that pool, so no session state is shared
+    between threads.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 timeout=default_timeout, headers=None):
+        """
+        Create a new SessionTransport
+
+        :param pool_connections: number of host pools to cache
+        :param pool_maxsize:     maximum number of connections kept per host
+        :param pool_block:       whether to block when the pool is exhausted
+                                 instead of opening an extra connection
+        :param timeout:          default timeout, seconds or (connect, read)
+        :param headers:          extra headers sent with every request
+        """
+        self.timeout = timeout
+        self.headers = {
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+        }
+        if headers:
+            self.headers.update(headers)
+
+        # requests is slow to import, only import it once a transport is
+        # created instead of on `import pyse`
+        from requests.adapters import HTTPAdapter
+        self._adapter = HTTPAdapter(pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        The ``requests.Session`` for the calling thread
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, timeout=None, stream=False):
+        return self.session.get(url, timeout=timeout or self.timeout, stream=stream)
+
+    def close(self):
+        # sessions only hold a reference to the shared adapter, closing the
+        # adapter drops every pooled connection
+        self._adapter.close()
+
+def _response(url, status, content):
+    """
+    Build a ``requests.Response`` holding a body that was already read
+    """
+    import requests
+    r = requests.models.Response()
+    r.url = url
+    r.status_code = status
+    try:
+        r.reason = HTTPStatus(status).phrase
+    except ValueError:
+        pass
+    r._content = content
+    # iter_content() serves the body instead of reading `raw`
+    r._content_consumed = True
+    return r
+
+class CassetteTransport(Transport):
+    """
+    A transport recording responses to, and replaying them from, a cassette
+    on disk.
+
+    A cassette is two files: `path`, holding the response bodies one after
+    the other, and `path`.idx, with one line per response holding the
+    offset and length of its body, its status and its URL. Replayed bodies
+    are sliced out of a memory map of `path`, nothing is sent.
+
+    A URL recorded several times is replayed in the order of the
+    recordings, repeating the last one once they are used up. Query
+    parameters in `cassette_ignored_parameters` aren't part of the URLs
+    responses are recorded under.
+
+    Example::
+
+        >>> pyse.set_transport(pyse.CassetteTransport("test/cassettes/questions",
+        ...                                           mode="once"))
+    """
+    modes = ("record", "replay", "once")
+
+    def __init__(self, path, mode="replay", transport=None):
+        """
+        Create a new CassetteTransport
+
+        :param path:      path of the cassette's body file
+        :param mode:      'record' to send every request and record the
+                          responses in a new cassette, 'replay' to only
+                          serve recorded responses, or 'once' to serve
+                          recorded responses and record the missing ones
+        :param transport: transport the recorded requests are sent with,
+                          defaults to a new :class:`SessionTransport`
+        """
+        if mode not in self.modes:
+            raise ValueError(f"unknown cassette mode '{mode}'")
+        self.path = path
+        self.index_path = path + ".idx"
+        self.mode = mode
+        self.transport = transport
+        if self.transport is None and mode != "replay":
+            self.transport = SessionTransport()
+
+        # cassette URL -> list of tuples (offset, length, status)
+        self._entries = {}
+        # cassette URL -> number of times it was replayed
+        self._replayed = {}
+        self._lock = threading.Lock()
+        self._map = None
+        self._size = 0
+        self._body_file = None
+        self._index_file = None
+
+        if mode == "record" or not os.path.exists(self.index_path):
+            if mode == "replay":
+                raise FileNotFoundError(f"no cassette at '{path}'")
+            open(self.path, "wb").close()
+            open(self.index_path, "w").close()
+        with open(self.index_path) as f:
+            for line in f:
+                offset, length, status, url = line.rstrip("\n").split("\t", 3)
+                self._entries.setdefault(url, []).append((int(offset), int(length),
+                                                          int(status)))
+        self._size = os.path.getsize(self.path)
+
+    @staticmethod
+    def key(url):
+        """
+        Get the URL a request is recorded under
+        """
+        base, _, query = url.partition("?")
+        if not query:
+            return base
+        kept = [p for p in query.split("&")
+                if p.partition("=")[0] not in cassette_ignored_parameters]
+        return base + "?" + "&".join(kept) if kept else base
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _read(self, offset, length):
+        # called with the lock held. the map is rebuilt once it doesn't
+        # cover bodies recorded since it was made
+        if self._map is None or offset + length > len(self._map):
+            import mmap
+            if self._map is not None:
+                self._map.close()
+            if self._body_file is not None:
+                self._body_file.flush()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def _replay(self, key):
+        """
+        Get the next recorded (status, body) of a URL, or None
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            served = self._replayed.get(key, 0)
+            self._replayed[key] = served + 1
+            offset, length, status = entries[min(served, len(entries) - 1)]
+            return status, self._read(offset, length) if length else b""
+
+    def _record(self, key, status, content):
+        with self._lock:
+            if self._body_file is None:
+                self._body_file = open(self.path, "ab")
+                self._index_file = open(self.index_path, "a")
+            offset = self._size
+            self._body_file.write(content)
+            self._body_file.flush()
+            self._size += len(content)
+            self._index_file.write(f"{offset}\t{len(content)}\t{status}\t{key}\n")
+            self._index_file.flush()
+            self._entries.setdefault(key, []).append((offset, len(content), status))
+            # a URL recorded in this session replays its newest response
+            self._replayed[key] = len(self._entries[key]) - 1
+
+    def get(self, url, timeout=None, stream=False):
+        key = self.key(url)
+        if self.mode != "record":
+            recorded = self._replay(key)
+            if recorded is not None:
+                return _response(url, *recorded)
+            if self.mode == "replay":
+                raise LookupError(f"no response recorded for '{key}' in '{self.path}'")
+
+        r = self.transport.get(url, timeout=timeout)
+        self._record(key, r.status_code, r.content)
+        return r
+
+    def close(self):
+        with self._lock:
+            for f in (self._map, self._body_file, self._index_file):
+                if f is not None:
+                    f.close()
+            self._map = self._body_file = self._index_file = None
+        if self.transport is not None:
+            self.transport.close()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """
+    Get the transport used by :func:`pyse.query`, creating a default
+    :class:`SessionTransport` on first use.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = SessionTransport()
+    return _transport
+
+def set_transport(transport):
+    """
+    Replace the transport used by :func:`pyse.query`
+
+    :param transport: a :class:`Transport`, or None to restore the default
+
+    :returns: the previous transport
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
@@ -8,22 +8,87 @@ This module contains utility functions for the Stack Exchange wrapper
 :license: MIT, see LICENSE for more details.
 """
 
-import requests
 import json
+from http import HTTPStatus
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from .structures import LookupDict
+from .transport import get_transport
 
-# FIXME: Don't expose
-def get_json(url):
-    r = requests.get(url)
+# decodes a JSON document from bytes, without decoding it to a str first.
+# orjson is used when it is installed
+json_loads = orjson.loads if orjson is not None else json.loads
+
+def set_json_backend(loads):
+    """
+    Replace the function used to decode JSON responses
+
+    :param loads: a function taking bytes and returning the decoded
+                  document, or None to restore the default
+
+    :returns: the previous function
+    """
+    global json_loads
+    previous = json_loads
+    if loads is None:
+        loads = orjson.loads if orjson is not None else json.loads
+    json_loads = loads
+    return previous
+
+def sqlite_connection(local, path):
+    """
+    Get the calling thread's connection to a sqlite database, opening it in
+    WAL mode on first use. sqlite connections can't be shared between
+    threads, so each thread keeps its own in `local`.
+
+    :param local: ``threading.local`` holding the connections of one database
+    :param path:  path of the database file
+    """
+    db = getattr(local, "db", None)
+    if db is None:
+        # imported here, sqlite3 is only needed once a database is used
+        import sqlite3
+        db = sqlite3.connect(path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        local.db = db
+    return db
+
+def get_response(url, timeout=None, transport=None):
+    """
+    GET a URL, raising for any status other than OK and bad request
+
+    :param url:       full request URL
+    :param timeout:   per-request timeout, overrides the transport default
+    :param transport: transport to use instead of the default transport
+
+    :returns: a ``requests.Response``
+    """
+    if transport is None:
+        transport = get_transport()
+    r = transport.get(url, timeout=timeout)
 
     # will manually handle bad requests (400) when needed
-    if r.status_code == requests.codes.ok or r.status_code == requests.codes.bad:
-        j = json.loads(r.text)
-        return j
+    if r.status_code == HTTPStatus.OK or r.status_code == HTTPStatus.BAD_REQUEST:
+        return r
     else:
         # raise exception
         r.raise_for_status()
 
+# FIXME: Don't expose
+def get_json(url, timeout=None, transport=None):
+    """
+    GET a URL and decode the JSON response
+
+    :param url:       full request URL
+    :param timeout:   per-request timeout, overrides the transport default
+    :param transport: transport to use instead of the default transport
+    """
+    r = get_response(url, timeout=timeout, transport=transport)
+    return json_loads(r.content)
+
 def raise_request_exception(e, resp):
     raise e(f"{resp['error_name']} {resp['error_id']}: {resp['error_message']}")
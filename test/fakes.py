@@ -0,0 +1,137 @@
+"""
+Fake transports and isolated global settings shared by the tests
+"""
+import asyncio
+import json
+import threading
+import unittest
+from urllib.parse import urlsplit, parse_qs
+
+from pyse import (aio, set_transport, set_cache, set_scheduler, Transport, Scheduler,
+                  TokenBucket)
+from pyse.transport import _response
+
+def params(url):
+    """
+    Get the query string parameters of a URL, one value per name
+    """
+    return {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+
+def path(url):
+    """
+    Get the path segments of a request URL below the API version, e.g.
+    ['questions', '1;2', 'answers']
+    """
+    return urlsplit(url).path.split("/2.2/", 1)[-1].split("/")
+
+def page_of(items, qs):
+    """
+    Get the response body of the page of `items` asked for by the query
+    string parameters `qs`, honouring `page` and `pagesize`
+    """
+    page, pagesize = int(qs.get("page", 1)), int(qs.get("pagesize", 30))
+    start = (page - 1) * pagesize
+    return {"items": items[start:start + pagesize], "has_more": start + pagesize < len(items)}
+
+class FakeTransport(Transport):
+    """
+    Records the URLs it gets and answers each with the body returned by
+    :meth:`respond`, as JSON. :meth:`respond` may also return a tuple
+    (status, body). Bodies given as bytes are sent as they are.
+    """
+    def __init__(self, body=None):
+        """
+        :param body: body of every response, unless :meth:`respond` is
+                     overridden
+        """
+        self.body = body
+        self.urls = []
+        self.lock = threading.Lock()
+
+    def respond(self, url):
+        return self.body
+
+    def get(self, url, timeout=None, stream=False):
+        with self.lock:
+            self.urls.append(url)
+        result = self.respond(url)
+        status, body = result if isinstance(result, tuple) else (200, result)
+        content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        return _response(url, status, content)
+
+    def params(self, i=-1):
+        """
+        Get the query string parameters of the `i`-th request
+        """
+        return params(self.urls[i])
+
+class PagedTransport(FakeTransport):
+    """
+    Serves `total` numbered questions, honouring `page` and `pagesize`
+    """
+    def __init__(self, total):
+        super().__init__()
+        self.total = total
+
+    def item(self, i):
+        return {"question_id": i}
+
+    def respond(self, url):
+        return page_of([self.item(i) for i in range(self.total)], params(url))
+
+class AsyncTransport(aio.AsyncTransport):
+    """
+    Answers like the fake `transport` after `delay` seconds, counting the
+    requests in flight
+    """
+    def __init__(self, transport, delay=0.01):
+        self.transport = transport
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def urls(self):
+        return self.transport.urls
+
+    async def get(self, url, timeout=None):
+        r = self.transport.get(url, timeout=timeout)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return r.status_code, r.content
+
+class SettingsTestCase(unittest.TestCase):
+    """
+    Runs every test without a response cache and with a fresh, fast
+    scheduler, kept as `self.scheduler`, restoring the previous global
+    settings afterwards
+    """
+    def setUp(self):
+        self.replace(set_cache, None)
+        self.scheduler = self.replace(set_scheduler, Scheduler(TokenBucket(rate=1000)))
+
+    def replace(self, setter, value):
+        """
+        Replace a global setting until the end of the test
+
+        :param setter: function setting the value and returning the
+                       previous one, e.g. :func:`pyse.set_cache`
+
+        :returns: `value`
+        """
+        self.addCleanup(setter, setter(value))
+        return value
+
+    def use_transport(self, transport):
+        """
+        Send the requests of the test through `transport`, kept as
+        `self.transport`. Asynchronous transports are set for
+        :mod:`pyse.aio`
+        """
+        setter = aio.set_transport if isinstance(transport, aio.AsyncTransport) else set_transport
+        self.transport = self.replace(setter, transport)
+        return transport
@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from pyse import (aio, queries, Client, set_client, set_cache, register_hook, unregister_hook,
+                  MemoryCache, Scheduler, TokenBucket)
+
+import fakes
+from fakes import SettingsTestCase
+
+class PagedTransport(fakes.PagedTransport):
+    """
+    Serves `total` numbered questions, using one unit of quota per request
+    """
+    def respond(self, url):
+        return dict(super().respond(url), quota_remaining=9000 - len(self.urls))
+
+class TestAsyncQuery(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(fakes.AsyncTransport(PagedTransport(250)))
+
+    def test_concurrent_queries(self):
+        async def main():
+            return await asyncio.gather(*(
+                aio.query(queries.questions.ALL, site="stackoverflow", page=p)
+                for p in range(1, 6)))
+
+        responses = asyncio.run(main())
+        self.assertEqual(len(responses), 5)
+        self.assertEqual(responses[1]["items"][0].question_id, 30)
+        self.assertGreater(self.transport.max_in_flight, 1)
+
+    def test_query_iter(self):
+        async def main():
+            return [q.question_id async for q in
+                    aio.query_iter(queries.questions.ALL, max_items=150,
+                                   site="stackoverflow")]
+
+        self.assertEqual(asyncio.run(main()), list(range(150)))
+        self.assertEqual(len(self.transport.urls), 2)
+
+    def test_scheduler_cache_and_hooks(self):
+        events = []
+        hook = register_hook(events.append)
+        self.replace(set_cache, MemoryCache())
+
+        async def main():
+            await asyncio.gather(*(
+                aio.query(queries.questions.ALL, site="stackoverflow", page=p)
+                for p in range(1, 4)))
+            return await aio.query(queries.questions.ALL, site="stackoverflow", page=1)
+
+        try:
+            response = asyncio.run(main())
+        finally:
+            unregister_hook(hook)
+        self.assertEqual(response["items"][0].question_id, 0)
+        self.assertEqual(len(self.transport.urls), 3)
+        self.assertEqual(self.scheduler.quota_remaining, 8997)
+        self.assertEqual([e["cache"] for e in events], ["miss"] * 3 + ["hit"])
+
+    def test_client_settings(self):
+        client = Client(key="K", base_url="http://stub/2.2/", defaults={"site": "so"},
+                        scheduler=Scheduler(TokenBucket(rate=1000)))
+        self.replace(set_client, client)
+        asyncio.run(aio.query(queries.questions.ALL))
+        self.assertEqual(self.transport.urls, ["http://stub/2.2/questions?site=so&key=K"])
+        self.assertEqual(client.scheduler.quota_remaining, 8999)
+        self.assertIsNone(self.scheduler.quota_remaining)
+
+if __name__ == "__main__":
+    unittest.main()
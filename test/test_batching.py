@@ -0,0 +1,62 @@
+import unittest
+
+from pyse import query, queries
+
+import fakes
+from fakes import SettingsTestCase
+
+class IdsTransport(fakes.FakeTransport):
+    """
+    Echoes each id in the URL path back as an item, one page of `pagesize`
+    items at a time. Requests containing `fail_id` get an API error response.
+    """
+    def __init__(self, fail_id=None):
+        super().__init__()
+        self.fail_id = fail_id
+
+    def respond(self, url):
+        ids = [int(i) for i in fakes.path(url)[-1].split(";")]
+        if self.fail_id in ids:
+            return 400, {"error_id": 400, "error_name": "bad_parameter",
+                         "error_message": "ids"}
+        body = fakes.page_of([{"answer_id": i} for i in ids], fakes.params(url))
+        body["quota_remaining"] = 1000 - len(self.urls)
+        return body
+
+class TestBatching(SettingsTestCase):
+    def test_small_list_single_request(self):
+        self.use_transport(IdsTransport())
+        r = query(queries.answers.by_id.ALL, ids=list(range(100)), site="stackoverflow",
+                  pagesize=100)
+        self.assertEqual(len(self.transport.urls), 1)
+        self.assertEqual(len(r["items"]), 100)
+        self.assertIsNone(r["batch_errors"])
+
+    def test_split_and_merge(self):
+        self.use_transport(IdsTransport())
+        ids = list(range(1, 451))
+        r = query(queries.answers.by_id.ALL, ids=ids, site="stackoverflow")
+        self.assertEqual(len(self.transport.urls), 5)
+        self.assertEqual([a.answer_id for a in r["items"]], ids)
+        self.assertEqual(r.batch_errors, [])
+        self.assertFalse(r.has_more)
+        self.assertLessEqual(r.quota_remaining, 995)
+
+    def test_explicit_pagesize(self):
+        self.use_transport(IdsTransport())
+        r = query(queries.answers.by_id.ALL, ids=list(range(1, 201)), site="stackoverflow",
+                  pagesize=10)
+        self.assertEqual(len(r["items"]), 20)
+        self.assertTrue(r.has_more)
+
+    def test_batch_errors(self):
+        self.use_transport(IdsTransport(fail_id=150))
+        r = query(queries.answers.by_id.ALL, ids=list(range(1, 301)), site="stackoverflow")
+        self.assertEqual(len(r["items"]), 200)
+        self.assertEqual(len(r.batch_errors), 1)
+        self.assertEqual(r.batch_errors[0].ids, list(range(101, 201)))
+        self.assertEqual(r.batch_errors[0].error_name, "bad_parameter")
+        self.assertIsNone(r["error_id"])
+
+if __name__ == "__main__":
+    unittest.main()
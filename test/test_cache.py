@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from pyse import (query, queries, build_url, create_filter, set_cache, set_filter_store,
+                  MemoryCache, SqliteCache, FilterStore)
+
+import fakes
+from fakes import SettingsTestCase
+
+class CountingTransport(fakes.FakeTransport):
+    """
+    Answers with the number of requests sent so far
+    """
+    def respond(self, url):
+        return {"items": [{"n": len(self.urls)}]}
+
+class FilterTransport(fakes.FakeTransport):
+    """
+    Creates filters named after the length of their URL
+    """
+    def respond(self, url):
+        return {"items": [{"filter": "!%d" % len(url)}]}
+
+class TestMemoryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        cache = MemoryCache(ttl=60, ttls={"events": 0})
+        cache.set("u", 1, endpoint="events")
+        self.assertIsNone(cache.get("u"))
+        cache._set("u", 1, 0)
+        self.assertIsNone(cache.get("u"))
+        self.assertEqual(cache.stats()["misses"], 2)
+
+class TestSqliteCache(unittest.TestCase):
+    def test_shared_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "cache.db")
+            SqliteCache(path).set("u", {"items": []})
+            other = SqliteCache(path, maxsize=1)
+            self.assertEqual(other.get("u"), {"items": []})
+            other.set("v", {})
+            self.assertIsNone(other.get("u"))
+            self.assertEqual(len(other), 1)
+
+class TestQueryCache(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(CountingTransport())
+        self.cache = self.replace(set_cache, MemoryCache())
+
+    def test_hit(self):
+        a = query(queries.tags.ALL, site="stackoverflow")
+        b = query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(len(self.transport.urls), 1)
+        self.assertEqual(a["items"][0].n, b["items"][0].n)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_bypass_and_refresh(self):
+        query(queries.tags.ALL, site="stackoverflow")
+        query(queries.tags.ALL, site="stackoverflow", use_cache=False)
+        r = query(queries.tags.ALL, site="stackoverflow", refresh_cache=True)
+        self.assertEqual(r["items"][0].n, 3)
+        self.assertEqual(query(queries.tags.ALL, site="stackoverflow")["items"][0].n, 3)
+
+    def test_invalidate(self):
+        query(queries.tags.ALL, site="stackoverflow")
+        self.cache.invalidate(build_url(queries.tags.ALL, site="stackoverflow"))
+        query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(len(self.transport.urls), 2)
+
+class TestFilterStore(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(FilterTransport())
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "filters.json")
+        self.replace(set_filter_store, FilterStore(self.path))
+
+    def test_memoized(self):
+        a = create_filter(include=["question.body", "answer.body"])
+        b = create_filter(include=["answer.body", "question.body"])
+        self.assertEqual(a, b)
+        self.assertEqual(len(self.transport.urls), 1)
+
+    def test_prewarmed_from_file(self):
+        a = create_filter(exclude=["question.title"])
+        set_filter_store(FilterStore(self.path))
+        self.assertEqual(create_filter(exclude=["question.title"]), a)
+        self.assertEqual(len(self.transport.urls), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from pyse import Client, get_client, set_client, query, queries, MemoryCache
+
+import fakes
+from fakes import SettingsTestCase
+
+class RecordingTransport(fakes.FakeTransport):
+    """
+    Records the URLs it gets, answering with one item and a fixed quota
+    """
+    def __init__(self, quota_remaining=9000):
+        super().__init__({"items": [{"n": 1}], "has_more": False,
+                          "quota_remaining": quota_remaining})
+
+class TestClient(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(RecordingTransport())
+
+    def test_key_and_defaults(self):
+        transport = RecordingTransport()
+        client = Client(key="abc", defaults={"site": "stackoverflow", "pagesize": 100},
+                        transport=transport)
+        client.query(queries.tags.ALL)
+        self.assertEqual(transport.params(), {"key": "abc", "site": "stackoverflow",
+                                              "pagesize": "100"})
+        client.query(queries.tags.ALL, site="serverfault")
+        self.assertEqual(transport.params()["site"], "serverfault")
+        self.assertEqual(self.transport.urls, [])
+
+    def test_base_url(self):
+        transport = RecordingTransport()
+        client = Client(base_url="http://127.0.0.1/2.2/", transport=transport)
+        self.assertEqual(client.build_url(queries.tags.ALL, site="stackoverflow"),
+                         "http://127.0.0.1/2.2/tags?site=stackoverflow")
+
+    def test_isolated_state(self):
+        first = Client(transport=RecordingTransport(1000), cache=MemoryCache())
+        second = Client(transport=RecordingTransport(2000))
+        first.query(queries.tags.ALL, site="stackoverflow")
+        second.query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(first.scheduler.quota_remaining, 1000)
+        self.assertEqual(second.scheduler.quota_remaining, 2000)
+
+        first.query(queries.tags.ALL, site="stackoverflow")
+        second.query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(len(first.transport.urls), 1)
+        self.assertEqual(len(second.transport.urls), 2)
+
+    def test_endpoints(self):
+        transport = RecordingTransport()
+        client = Client(transport=transport, defaults={"site": "stackoverflow"})
+        r = client.tags.ALL(sort="name")
+        self.assertEqual(r.items[0].n, 1)
+        self.assertIn("/tags?", transport.urls[-1])
+        client.questions.by_id.ALL(ids=[1, 2])
+        self.assertIn("/questions/1;2?", transport.urls[-1])
+        self.assertEqual([i.n for i in client.tags.ALL.iter()], [1])
+        self.assertIn("questions", dir(client))
+        with self.assertRaises(AttributeError):
+            client.nothing
+        with self.assertRaises(AttributeError):
+            client.registry
+
+    def test_default_client(self):
+        query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(len(self.transport.urls), 1)
+
+        transport = RecordingTransport()
+        previous = set_client(Client(key="abc", transport=transport))
+        try:
+            query(queries.tags.ALL, site="stackoverflow")
+            self.assertEqual(transport.params()["key"], "abc")
+        finally:
+            set_client(previous)
+        self.assertEqual(len(self.transport.urls), 1)
+
+        set_client(None)
+        self.assertIs(get_client(), previous)
+
+if __name__ == "__main__":
+    unittest.main()
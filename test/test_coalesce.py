@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import requests
+
+from pyse import aio, api, get_client, queries, query
+from pyse.coalesce import SingleFlight, get_single_flight, set_single_flight
+
+import fakes
+from fakes import SettingsTestCase
+
+class SlowTransport(fakes.FakeTransport):
+    """
+    Answers every request with its URL after a delay
+    """
+    def __init__(self, delay=0.05, status=200):
+        super().__init__()
+        self.delay = delay
+        self.status = status
+
+    def respond(self, url):
+        time.sleep(self.delay)
+        return self.status, {"items": [{"url": url}], "has_more": False}
+
+def run_threads(n, fn):
+    results, errors = [], []
+    barrier = threading.Barrier(n)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+class TestSingleFlight(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(SlowTransport())
+        self.replace(set_single_flight, SingleFlight())
+
+    def test_identical_requests_share_one(self):
+        results, errors = run_threads(8, lambda: query(queries.tags.ALL, site="stackoverflow"))
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.transport.urls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r.items[0].url == self.transport.urls[0] for r in results))
+        self.assertEqual(get_single_flight().shared, 7)
+
+    def test_different_requests_not_shared(self):
+        sites = iter(["stackoverflow", "serverfault", "superuser", "askubuntu"])
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                site = next(sites)
+            return query(queries.tags.ALL, site=site)
+
+        run_threads(4, call)
+        self.assertEqual(len(set(self.transport.urls)), 4)
+
+    def test_error_shared(self):
+        self.transport.status = 500
+        results, errors = run_threads(4, lambda: query(queries.tags.ALL, site="stackoverflow"))
+        self.assertEqual(len(self.transport.urls), 1)
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(e, requests.HTTPError) for e in errors))
+
+    def test_disabled(self):
+        set_single_flight(None)
+        run_threads(4, lambda: query(queries.tags.ALL, site="stackoverflow"))
+        self.assertEqual(len(self.transport.urls), 4)
+
+    def test_post_not_shared(self):
+        url = api.api_base_url + "answers/1/accept"
+        get_client()._get_json(queries.answers.accept.CAST, url)
+        self.assertEqual(get_single_flight().calls, 0)
+
+class TestAsyncSingleFlight(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(fakes.AsyncTransport(SlowTransport(delay=0), delay=0.02))
+        self.replace(aio.set_single_flight, aio.AsyncSingleFlight())
+
+    def test_identical_requests_share_one(self):
+        async def main():
+            return await asyncio.gather(*(
+                aio.query(queries.tags.ALL, site=site)
+                for site in ["stackoverflow"] * 5 + ["serverfault"] * 5))
+
+        responses = asyncio.run(main())
+        self.assertEqual(len(self.transport.urls), 2)
+        self.assertEqual([r.items[0].url for r in responses],
+                         [self.transport.urls[0]] * 5 + [self.transport.urls[1]] * 5)
+        self.assertEqual(aio.get_single_flight().shared, 8)
+
+    def test_cancelled_waiter(self):
+        async def main():
+            first = asyncio.ensure_future(aio.query(queries.tags.ALL, site="stackoverflow"))
+            second = asyncio.ensure_future(aio.query(queries.tags.ALL, site="stackoverflow"))
+            await asyncio.sleep(0)
+            second.cancel()
+            return await first
+
+        response = asyncio.run(main())
+        self.assertEqual(response.items[0].url, self.transport.urls[0])
+        self.assertEqual(len(self.transport.urls), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+
+from pyse import CrawlQueue, JsonlSink, crawl, queries
+
+import fakes
+
+class SiteTransport(fakes.FakeTransport):
+    """
+    Serves a site of 250 questions with two answers each, owned by seven
+    users. Question ids listed in `broken` make their answer requests fail
+    """
+    def __init__(self, broken=()):
+        super().__init__()
+        self.broken = broken
+
+    def respond(self, url):
+        path = fakes.path(url)
+        ids = [int(i) for i in path[1].split(";")] if len(path) > 1 else []
+
+        if path == ["questions"]:
+            found = [{"question_id": i, "owner": {"user_id": i % 7}} for i in range(250)]
+        elif path[-1] == "answers":
+            if set(ids) & set(self.broken):
+                raise requests.ConnectionError("broken")
+            found = [{"answer_id": q * 10 + k, "question_id": q, "owner": {"user_id": k}}
+                     for q in ids for k in range(2)]
+        elif path[0] == "users":
+            found = [{"user_id": i} for i in ids]
+        else:
+            found = []
+        return dict(fakes.page_of(found, fakes.params(url)), quota_remaining=9000)
+
+class TestCrawl(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.queue = CrawlQueue(os.path.join(self.dir.name, "crawl.db"))
+        self.queue.add(queries.questions.ALL, site="stackoverflow")
+        self.output = os.path.join(self.dir.name, "export")
+        self.transport = SiteTransport()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def crawl(self, **kwargs):
+        kwargs.setdefault("transport", self.transport)
+        with JsonlSink(self.output) as sink:
+            return crawl(self.queue, sink, processes=False, rate=1000, **kwargs)
+
+    def exported(self, type):
+        path = os.path.join(self.output, "stackoverflow", type + ".jsonl")
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_export(self):
+        stats = self.crawl()
+        self.assertEqual(len(self.exported("question")), 250)
+        answers = self.exported("answer")
+        self.assertEqual(len(answers), 500)
+        self.assertEqual(len({a["answer_id"] for a in answers}), 500)
+        # each user once, though every page refers to them
+        self.assertEqual(sorted(u["user_id"] for u in self.exported("user")), list(range(7)))
+        self.assertEqual(stats["failures"], 0)
+        self.assertEqual(stats["counts"]["pending"], 0)
+        self.assertEqual(stats["counts"]["waiting_ids"], 0)
+
+        answer_urls = [u for u in self.transport.urls if "/answers?" in u]
+        batches = [fakes.path(u)[-2].split(";") for u in answer_urls]
+        self.assertTrue(all(len(b) <= 100 for b in batches))
+        self.assertEqual(len({tuple(b) for b in batches}), 3)
+
+    def test_resume(self):
+        stats = self.crawl(max_tasks=2)
+        self.assertEqual(stats["tasks"], 2)
+        self.assertGreater(stats["counts"]["pending"], 0)
+
+        # a crawl that died with a claimed task
+        self.queue.claim(1)
+        self.crawl()
+        self.assertEqual(len(self.exported("question")), 250)
+        self.assertEqual(len(self.exported("answer")), 500)
+
+    def test_failures(self):
+        self.transport.broken = (3,)
+        stats = self.crawl(max_attempts=2)
+        self.assertEqual(stats["failures"], 2)
+        self.assertEqual(stats["counts"]["failed"], 1)
+        self.assertEqual(len(self.exported("answer")), 300)
+
+        self.transport.broken = ()
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.crawl()
+        self.assertEqual(len(self.exported("answer")), 500)
+
+    def test_processes(self):
+        with JsonlSink(self.output) as sink:
+            stats = crawl(self.queue, sink, expansions={}, workers=2,
+                          transport=self.transport)
+        self.assertEqual(stats["items"], 250)
+        self.assertTrue(os.path.exists(self.queue.path + ".bucket"))
+
+    def test_add_twice(self):
+        self.assertFalse(self.queue.add(queries.questions.ALL, site="stackoverflow"))
+
+if __name__ == "__main__":
+    unittest.main()
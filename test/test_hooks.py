@@ -0,0 +1,51 @@
+import unittest
+
+from pyse import query, queries, set_cache, register_hook, unregister_hook, MemoryCache
+from pyse.hooks import Metrics
+
+import fakes
+from fakes import SettingsTestCase
+
+class TestHooks(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.metrics = Metrics()
+        register_hook(self.events.append)
+        self.addCleanup(unregister_hook, self.events.append)
+        register_hook(self.metrics)
+        self.addCleanup(unregister_hook, self.metrics)
+        self.use_transport(fakes.FakeTransport({"items": [{"n": 1}], "quota_remaining": 42,
+                                                "backoff": 5}))
+        self.replace(set_cache, MemoryCache())
+
+    def test_event(self):
+        query(queries.badges.ALL, site="stackoverflow")
+        event, = self.events
+        self.assertEqual(event["endpoint"], queries.badges.ALL)
+        self.assertEqual(event["method"], "GET")
+        self.assertEqual(event["status"], 200)
+        self.assertEqual(event["cache"], "miss")
+        self.assertEqual(event["quota_remaining"], 42)
+        self.assertEqual(event["backoff"], 5)
+        self.assertGreater(event["bytes"], 0)
+        self.assertEqual(set(event["timings"]),
+                         {"wait", "network", "decode", "wrap", "total"})
+
+    def test_metrics(self):
+        query(queries.badges.ALL, site="stackoverflow")
+        query(queries.badges.ALL, site="stackoverflow")
+        stats = self.metrics.snapshot()[queries.badges.ALL]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["cache_hits"], 1)
+        self.assertEqual(stats["quota_used"], 1)
+        self.assertEqual(sum(stats["latency_buckets"]), 2)
+        self.assertIn('pyse_requests_total{endpoint="badges"} 2', self.metrics.prometheus())
+
+    def test_error_event(self):
+        with self.assertRaises(ValueError):
+            query(queries.questions.by_id.COMMENTS, site="stackoverflow")
+        self.assertEqual(self.events, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def run(code):
+    """
+    Run code in a fresh interpreter and decode the JSON it prints
+    """
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, check=True,
+                         capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+class TestLazyImport(unittest.TestCase):
+    def test_import_is_lazy(self):
+        modules = run("import sys, json, pyse; print(json.dumps(sorted(sys.modules)))")
+        for module in ("requests", "sqlite3", "concurrent.futures", "pyse.api", "pyse.cache"):
+            self.assertNotIn(module, modules)
+
+    def test_requests_imported_on_first_transport(self):
+        loaded = run("import sys, json, pyse; pyse.query; a = 'requests' in sys.modules; "
+                     "pyse.get_transport(); print(json.dumps([a, 'requests' in sys.modules]))")
+        self.assertEqual(loaded, [False, True])
+
+    def test_names_shadowed_by_submodules(self):
+        types = run("import json, pyse; pyse.SyncState; import pyse.incremental; "
+                    "print(json.dumps([type(pyse.sync).__name__, type(pyse.queries).__name__]))")
+        self.assertEqual(types, ["function", "URLTree"])
+
+    def test_submodule_imported_first(self):
+        types = run("import json, pyse.incremental, pyse.crawler, pyse.queries; "
+                    "print(json.dumps([type(pyse.sync).__name__, type(pyse.crawl).__name__, "
+                    "type(pyse.queries).__name__]))")
+        self.assertEqual(types, ["function", "function", "URLTree"])
+
+    def test_no_export_named_like_submodule(self):
+        import pyse
+        self.assertEqual(set(pyse._exports) & pyse._submodules, set())
+
+    def test_exports(self):
+        import pyse
+        for name in pyse.__all__:
+            self.assertTrue(hasattr(pyse, name), name)
+        with self.assertRaises(AttributeError):
+            pyse.not_a_name
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import pickle
+import unittest
+
+from pyse import LookupDict, LazyLookupDict
+
+data = {
+    "items": [
+        {"question_id": 1, "tags": ["python", "json"],
+         "owner": {"user_id": 7, "display_name": "a"}},
+        {"question_id": 2, "tags": [], "owner": {"user_id": 8}},
+    ],
+    "has_more": True,
+    "quota_remaining": 299,
+}
+
+class TestLazyLookupDict(unittest.TestCase):
+    def setUp(self):
+        self.eager = LookupDict(data=data, name="response_wrapper")
+        self.lazy = LazyLookupDict(data=data, name="response_wrapper")
+
+    def test_same_access(self):
+        for r in (self.eager, self.lazy):
+            self.assertEqual(r.has_more, True)
+            self.assertEqual(r["quota_remaining"], 299)
+            self.assertIsNone(r["backoff"])
+            self.assertEqual(r.get("backoff", 0), 0)
+            self.assertEqual(r.items[0].owner.user_id, 7)
+            self.assertEqual(r["items"][1]["owner"]["user_id"], 8)
+            self.assertEqual(r.items[0].tags, ["python", "json"])
+            self.assertEqual([q.question_id for q in r.items], [1, 2])
+            self.assertEqual(repr(r.items[0].owner), "<lookup 'response_wrapper/items/owner'>")
+            self.assertEqual(set(r.keys()), set(data.keys()))
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            self.lazy.backoff
+
+    def test_no_copy(self):
+        self.assertIs(self.lazy.items[0].owner.to_dict(), data["items"][0]["owner"])
+
+    def test_pickle(self):
+        copy = pickle.loads(pickle.dumps(self.lazy))
+        self.assertEqual(copy, self.lazy)
+        self.assertEqual(copy.items[0].owner.display_name, "a")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import time
+import unittest
+
+from pyse import query_sites, query_sharded, query_counts, queries, register_hook, unregister_hook
+
+import fakes
+from fakes import SettingsTestCase
+
+class SitesTransport(fakes.FakeTransport):
+    """
+    Answers slower for sites earlier in `delays`, and with an API error for
+    the site 'broken'
+    """
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+        self.in_flight = self.max_in_flight = 0
+
+    def respond(self, url):
+        site = fakes.params(url)["site"]
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delays.get(site, 0))
+        with self.lock:
+            self.in_flight -= 1
+
+        if site == "broken":
+            return 400, {"error_id": 400, "error_name": "bad_parameter",
+                         "error_message": "site"}
+        return {"items": [{"name": site}], "quota_remaining": 100}
+
+class TestQuerySites(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(SitesTransport({"stackoverflow": 0.2, "serverfault": 0.1}))
+
+    def test_completion_order_and_errors(self):
+        sites = ["stackoverflow", "serverfault", "broken", "superuser"]
+        results = list(query_sites(queries.tags.ALL, sites))
+        self.assertEqual([r[0] for r in results][-2:], ["serverfault", "stackoverflow"])
+        by_site = {site: (response, error) for site, response, error in results}
+        self.assertIsInstance(by_site["broken"][1], ValueError)
+        self.assertIsNone(by_site["broken"][0])
+        self.assertEqual(by_site["superuser"][0]["items"][0].name, "superuser")
+        self.assertGreater(self.transport.max_in_flight, 1)
+
+    def test_max_workers(self):
+        list(query_sites(queries.tags.ALL, ["a", "b", "c"], max_workers=1))
+        self.assertEqual(self.transport.max_in_flight, 1)
+
+    def test_quota_reserve(self):
+        results = list(query_sites(queries.tags.ALL, ["a", "b", "c"], max_workers=1,
+                                   quota_reserve=150))
+        errors = [e for _, _, e in results if e is not None]
+        self.assertEqual(len(errors), 2)
+
+class DatedTransport(fakes.FakeTransport):
+    """
+    Serves questions created at the given dates, honouring `fromdate`,
+    `todate`, `sort`, `order`, paging and the `total` filter
+    """
+    def __init__(self, dates):
+        super().__init__()
+        self.questions = [{"question_id": i, "creation_date": d, "score": i % 7}
+                          for i, d in enumerate(dates)]
+        self.probes = 0
+        self.pages = []
+
+    def respond(self, url):
+        qs = fakes.params(url)
+        found = [q for q in self.questions
+                 if int(qs.get("fromdate", 0)) <= q["creation_date"] <= int(qs["todate"])]
+        if qs.get("filter") == "total":
+            with self.lock:
+                self.probes += 1
+            body = {"total": len(found)}
+        else:
+            field = {"creation": "creation_date", "votes": "score"}[qs["sort"]]
+            found.sort(key=lambda q: (q[field], q["question_id"]),
+                       reverse=qs.get("order", "desc") == "desc")
+            with self.lock:
+                self.pages.append(int(qs.get("page", 1)))
+            body = fakes.page_of(found, qs)
+        body["quota_remaining"] = 9000
+        return body
+
+class TestQuerySharded(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        # a dense burst between quiet periods
+        dates = list(range(0, 1000, 10)) + [1000 + i // 4 for i in range(400)] + [5000]
+        self.use_transport(DatedTransport(dates))
+
+    def fetch(self, **parameters):
+        return list(query_sharded(queries.questions.ALL, site="stackoverflow", fromdate=0,
+                                  todate=9999, window_items=50, pagesize=20, **parameters))
+
+    def test_creation_order(self):
+        items = self.fetch(order="asc")
+        self.assertEqual([q.question_id for q in items], list(range(501)))
+        items = self.fetch()
+        self.assertEqual([q.question_id for q in items], list(range(500, -1, -1)))
+        # windows are shallow
+        self.assertLessEqual(max(self.transport.pages), 3)
+
+    def test_votes_order(self):
+        items = self.fetch(sort="votes")
+        self.assertEqual(len(items), 501)
+        scores = [q.score for q in items]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_unmergeable_sort(self):
+        with self.assertRaises(ValueError):
+            self.fetch(sort="hot")
+
+class TestQueryCounts(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(DatedTransport(range(100)))
+
+    def test_matrix(self):
+        table = query_counts(queries.questions.ALL, {
+            "site": ["stackoverflow", "serverfault"],
+            ("fromdate", "todate"): [(0, 9), (10, 49), (50, 1000)],
+        })
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.names, ("site", ("fromdate", "todate")))
+        self.assertEqual([c for _, c in table], [10, 40, 50] * 2)
+        self.assertEqual(table["serverfault", (10, 49)], 40)
+        self.assertEqual(table.errors, {})
+        with self.assertRaises(KeyError):
+            table["superuser", (0, 9)]
+
+    def test_identical_cells_shared(self):
+        events = []
+        register_hook(events.append)
+        try:
+            table = query_counts(queries.questions.ALL, {"todate": [5, 5, 9]},
+                                 site="stackoverflow")
+        finally:
+            unregister_hook(events.append)
+        self.assertEqual(table.counts, [6, 6, 10])
+        self.assertEqual(table.get(todate=9), 10)
+        self.assertEqual(self.transport.probes, 2)
+        self.assertEqual(len(events), 2)
+
+    def test_list_axis(self):
+        table = query_counts(queries.questions.ALL,
+                             {"tagged": [["python", "django"], ["rust"]]},
+                             site="stackoverflow", todate=1000)
+        self.assertEqual(table.counts, [100, 100])
+        self.assertEqual(table.get(tagged=["python", "django"]), 100)
+        self.assertEqual(table[(["rust"],)], 100)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from pyse import query_pipeline, queries, set_scheduler, Scheduler
+from pyse.records import Question
+
+import fakes
+from fakes import SettingsTestCase
+
+class PagedTransport(fakes.PagedTransport):
+    """
+    Serves `total` numbered questions with a body, reporting the quota and
+    `backoff`. Pages listed in `errors` are API errors
+    """
+    def __init__(self, total, errors=()):
+        super().__init__(total)
+        self.errors = errors
+        self.backoff = None
+
+    def item(self, i):
+        return {"question_id": i, "body": "x" * 100}
+
+    def respond(self, url):
+        page = int(fakes.params(url).get("page", 1))
+        if page in self.errors:
+            return 400, {"error_id": 400, "error_name": "bad_parameter",
+                         "error_message": "page"}
+        body = super().respond(url)
+        body["quota_remaining"] = 1000 - page
+        if self.backoff:
+            body["backoff"] = self.backoff
+        return body
+
+class TestQueryPipeline(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(PagedTransport(1050))
+        self.executor = ThreadPoolExecutor(4)
+        self.addCleanup(self.executor.shutdown)
+
+    def ids(self, **kwargs):
+        return [q.question_id for page in query_pipeline(queries.questions.ALL,
+                                                         site="stackoverflow", **kwargs)
+                for q in page.items]
+
+    def test_pages_in_order(self):
+        self.assertEqual(self.ids(executor=self.executor), list(range(1050)))
+        self.assertEqual(len(self.transport.urls), 11)
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(2) as executor:
+            pages = list(query_pipeline(queries.questions.ALL, site="stackoverflow",
+                                        executor=executor, typed=True, max_pages=3))
+        self.assertEqual([p.items[0].question_id for p in pages], [0, 100, 200])
+        self.assertIsInstance(pages[0].items[0], Question)
+
+    def test_max_pages(self):
+        self.assertEqual(self.ids(executor=self.executor, max_pages=2, page=3),
+                         list(range(200, 400)))
+
+    def test_scheduler_updated(self):
+        scheduler = self.replace(set_scheduler, Scheduler())
+        self.ids(executor=self.executor, max_pages=2)
+        self.assertEqual(scheduler.quota_remaining, 998)
+
+    def test_backoff_before_next_request(self):
+        waits = []
+
+        class RecordingScheduler(Scheduler):
+            def wait(self, endpoint):
+                waits.append(self.backoff_remaining(endpoint))
+                return super().wait(endpoint)
+
+        self.replace(set_scheduler, RecordingScheduler())
+        self.transport.backoff = 1
+        pages = query_pipeline(queries.questions.ALL, site="stackoverflow",
+                               executor=self.executor, max_pages=2)
+        next(pages)
+        pages.close()
+        # the network thread saw the first page's backoff before its second wait
+        self.assertGreater(waits[1], 0)
+
+    def test_error_in_order(self):
+        self.transport.errors = (3,)
+        pages = query_pipeline(queries.questions.ALL, site="stackoverflow",
+                               executor=self.executor)
+        self.assertEqual(next(pages).items[0].question_id, 0)
+        self.assertEqual(next(pages).items[0].question_id, 100)
+        with self.assertRaises(ValueError):
+            next(pages)
+        self.assertEqual(len(self.transport.urls), 3)
+
+    def test_backpressure(self):
+        pages = query_pipeline(queries.questions.ALL, site="stackoverflow",
+                               executor=self.executor, prefetch=2)
+        next(pages)
+        time.sleep(0.1)
+        # one page handed out, two decoded ahead, two fetched ahead, and one
+        # fetched and waiting for room
+        self.assertLessEqual(len(self.transport.urls), 6)
+        pages.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import hashlib
+import unittest
+
+from pyse import query, query_iter, queries, projection_fields, set_filter_store, FilterStore
+
+import fakes
+from fakes import SettingsTestCase
+
+class FilterTransport(fakes.FakeTransport):
+    """
+    Creates filters named after their fields, and serves `total` questions
+    holding only the fields of the filter
+    """
+    def __init__(self, total=150):
+        super().__init__()
+        self.total = total
+        self.filters = {}
+
+    def respond(self, url):
+        qs = fakes.params(url)
+        if url.split("?", 1)[0].endswith("filters/create"):
+            include = qs["include"].split(";")
+            name = "!" + hashlib.sha1(qs["include"].encode()).hexdigest()[:8]
+            self.filters[name] = include
+            return {"items": [{"filter": name}], "has_more": False}
+
+        include = self.filters[qs["filter"]]
+        fields = [f.split(".", 1)[1] for f in include if f.startswith("question.")]
+        full = lambda i: {"question_id": i, "title": "t", "score": 1, "body": "b",
+                          "owner": {"display_name": "u"}}
+        return fakes.page_of([{f: full(i)[f] for f in fields} for i in range(self.total)], qs)
+
+    def created(self):
+        return [u for u in self.urls if "filters/create" in u]
+
+class TestProjection(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(FilterTransport())
+        self.replace(set_filter_store, FilterStore())
+
+    def test_projection_fields(self):
+        include = projection_fields(queries.questions.ALL, ["title", "owner.display_name",
+                                                            "answer.body"])
+        for field in ("question.title", "question.owner", "shallow_user.display_name",
+                      "answer.body", ".items", ".has_more", ".quota_remaining"):
+            self.assertIn(field, include)
+        self.assertNotIn("question.body", include)
+
+    def test_unknown_item_type(self):
+        with self.assertRaises(ValueError):
+            projection_fields(queries.sites, ["name"])
+        self.assertIn("site.name", projection_fields(queries.sites, ["site.name"]))
+
+    def test_query(self):
+        r = query(queries.questions.ALL, site="stackoverflow", fields=["title", "score"])
+        self.assertEqual(set(r.items[0].__dict__) - {"_name"}, {"title", "score"})
+        query(queries.questions.ALL, site="stackoverflow", fields=["score", "title"])
+        self.assertEqual(len(self.transport.created()), 1)
+
+    def test_query_iter(self):
+        items = list(query_iter(queries.questions.ALL, site="stackoverflow",
+                                fields=["question_id"]))
+        self.assertEqual([i.question_id for i in items], list(range(150)))
+        self.assertEqual(len(self.transport.created()), 1)
+
+    def test_fields_and_filter(self):
+        with self.assertRaises(ValueError):
+            query(queries.questions.ALL, site="stackoverflow", fields=["title"],
+                  filter="withbody")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from pyse import queries, build_url
+from pyse.structures import Endpoint
+
+class TestEndpointRegistry(unittest.TestCase):
+    def test_compiled_endpoint(self):
+        endpoint = queries.registry[queries.users.by_id.tags.by_tag.TOP_ANSWERS]
+        self.assertEqual(endpoint.args, ("id", "tags"))
+        self.assertEqual(endpoint.method, "GET")
+        self.assertEqual(endpoint.format({"id": "1", "tags": "python"}),
+                         "users/1/tags/python/top-answers")
+
+    def test_methods(self):
+        self.assertEqual(queries.methods[queries.answers.accept.CAST], "POST")
+        self.assertEqual(queries.answers.methods[queries.questions.ALL], "GET")
+        self.assertEqual(queries.registry[queries.answers.accept.UNDO].method, "POST")
+
+    def test_unregistered_endpoint(self):
+        size = len(queries.registry)
+        endpoint = queries.registry["questions/123"]
+        self.assertIsInstance(endpoint, Endpoint)
+        self.assertEqual(endpoint.method, "GET")
+        self.assertEqual(len(queries.registry), size)
+        self.assertNotIn("questions/123", queries.registry)
+        self.assertIsNone(queries.path("questions/123"))
+
+    def test_path(self):
+        self.assertEqual(queries.path("answers/{id}/accept"), ["answers", "accept", "CAST"])
+        self.assertEqual(queries.answers.path("answers/{id}/accept"), ["accept", "CAST"])
+        self.assertIsNone(queries.questions.path("answers"))
+        self.assertIsNone(queries.path("not/an/endpoint"))
+
+    def test_build_url(self):
+        url = build_url(queries.questions.by_id.COMMENTS, ids=[1, 2, 3],
+                        site="stackoverflow", pagesize=100)
+        self.assertTrue(url.endswith("questions/1;2;3/comments?site=stackoverflow&pagesize=100"))
+
+    def test_missing_argument(self):
+        with self.assertRaises(ValueError):
+            build_url(queries.questions.by_id.COMMENTS, site="stackoverflow")
+
+if __name__ == "__main__":
+    unittest.main()
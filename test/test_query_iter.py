@@ -0,0 +1,31 @@
+import unittest
+
+from pyse import query_iter, queries
+
+from fakes import PagedTransport, SettingsTestCase
+
+class TestQueryIter(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_transport(PagedTransport(250))
+
+    def test_all_pages(self):
+        ids = [q.question_id for q in query_iter(queries.questions.ALL, site="stackoverflow")]
+        self.assertEqual(ids, list(range(250)))
+        self.assertEqual(len(self.transport.urls), 3)
+        self.assertIn("pagesize=100", self.transport.urls[0])
+
+    def test_max_items(self):
+        ids = [q.question_id for q in query_iter(queries.questions.ALL, max_items=100,
+                                                 site="stackoverflow")]
+        self.assertEqual(ids, list(range(100)))
+        self.assertEqual(len(self.transport.urls), 1)
+
+    def test_max_pages(self):
+        items = list(query_iter(queries.questions.ALL, max_pages=2, pagesize=50,
+                                site="stackoverflow"))
+        self.assertEqual(len(items), 100)
+        self.assertEqual(len(self.transport.urls), 2)
+
+if __name__ == "__main__":
+    unittest.main()
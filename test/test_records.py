@@ -0,0 +1,84 @@
+import json
+import pickle
+import unittest
+
+from pyse import query, queries
+from pyse.records import Question, Answer, Tag, ShallowUser, record_type, wrap_records
+
+from fakes import FakeTransport, SettingsTestCase
+
+question = {
+    "question_id": 1,
+    "title": "How do I parse JSON?",
+    "tags": ["python", "json"],
+    "owner": {"user_id": 7, "display_name": "jake", "user_type": "registered",
+              "badge_counts": {"bronze": 1, "silver": 2, "gold": 3}},
+    "answers": [{"answer_id": 2, "question_id": 1, "is_accepted": True}],
+    "score": 5,
+    "notice": {"body": "custom filter field"},
+}
+
+class TestRecords(unittest.TestCase):
+    def test_fields(self):
+        q = Question(question)
+        self.assertEqual(q.question_id, 1)
+        self.assertEqual(q["title"], "How do I parse JSON?")
+        self.assertIsInstance(q.owner, ShallowUser)
+        self.assertEqual(q.owner.badge_counts.gold, 3)
+        self.assertIsInstance(q.answers[0], Answer)
+        self.assertTrue(q.answers[0].is_accepted)
+        self.assertEqual(repr(q), "<question 1>")
+
+    def test_missing_and_extra_fields(self):
+        q = Question(question)
+        self.assertIsNone(q.closed_date)
+        self.assertIsNone(q["closed_date"])
+        self.assertEqual(q.notice.body, "custom filter field")
+        self.assertIn("notice", q.keys())
+        self.assertNotIn("closed_date", q.keys())
+        with self.assertRaises(AttributeError):
+            q.not_a_field
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Question(question).__dict__
+
+    def test_interned(self):
+        a = Question(json.loads(json.dumps(question)))
+        b = Question(json.loads(json.dumps(question)))
+        self.assertIs(a.tags[0], b.tags[0])
+        self.assertIs(a.owner.display_name, b.owner.display_name)
+
+    def test_to_dict_and_pickle(self):
+        q = Question(question)
+        self.assertEqual(q.to_dict(), question)
+        self.assertEqual(pickle.loads(pickle.dumps(q)), q)
+
+    def test_record_type(self):
+        self.assertIs(record_type(queries.questions.ALL), Question)
+        self.assertIs(record_type("questions/{ids}/answers"), Answer)
+        self.assertIs(record_type(queries.users.by_id.questions.UNANSWERED), Question)
+        self.assertIs(record_type(queries.tags.by_tag.INFO), Tag)
+        self.assertIs(record_type("tags/{tags}/related"), Tag)
+        self.assertIsNone(record_type(queries.badges.TAGS))
+        self.assertIsNone(record_type(queries.sites))
+
+    def test_wrap_records(self):
+        r = wrap_records({"items": [question], "has_more": False}, Question)
+        self.assertFalse(r.has_more)
+        self.assertIsInstance(r["items"][0], Question)
+
+class TestTypedQuery(SettingsTestCase):
+    def test_typed(self):
+        self.use_transport(FakeTransport({"items": [question], "has_more": False}))
+        r = query(queries.questions.ALL, site="stackoverflow", typed=True)
+        self.assertIsInstance(r.items[0], Question)
+        self.assertEqual(r.items[0].owner.display_name, "jake")
+
+    def test_untyped_endpoint(self):
+        self.use_transport(FakeTransport({"items": [{"site_url": "x"}], "has_more": False}))
+        r = query(queries.sites, typed=True)
+        self.assertEqual(r.items[0].site_url, "x")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+import unittest
+
+from pyse import query, queries, set_scheduler, Scheduler, TokenBucket, FileTokenBucket
+
+import fakes
+from fakes import SettingsTestCase
+
+class BackoffTransport(fakes.FakeTransport):
+    """
+    Answers with a fixed quota and `backoff`, recording when each request
+    was sent
+    """
+    def __init__(self, backoff=None, quota_remaining=299):
+        super().__init__()
+        self.backoff = backoff
+        self.quota_remaining = quota_remaining
+        self.times = []
+
+    def respond(self, url):
+        self.times.append(time.monotonic())
+        body = {"items": [], "quota_remaining": self.quota_remaining, "quota_max": 300}
+        if self.backoff:
+            body["backoff"] = self.backoff
+        return body
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_file_bucket_shared(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "bucket")
+            a = FileTokenBucket(path, rate=1, capacity=2)
+            b = FileTokenBucket(path, rate=1, capacity=2)
+            self.assertEqual(a._take(1), 0)
+            self.assertEqual(b._take(1), 0)
+            self.assertGreater(a._take(1), 0)
+
+class TestScheduler(SettingsTestCase):
+    def use(self, transport, scheduler):
+        self.use_transport(transport)
+        self.scheduler = self.replace(set_scheduler, scheduler)
+
+    def test_backoff_per_endpoint(self):
+        self.use(BackoffTransport(backoff=0.2), Scheduler())
+        query(queries.questions.ALL, site="stackoverflow")
+        self.assertGreater(self.scheduler.backoff_remaining(queries.questions.ALL), 0)
+        self.assertEqual(self.scheduler.backoff_remaining(queries.answers.ALL), 0)
+        query(queries.questions.ALL, site="stackoverflow")
+        self.assertGreaterEqual(self.transport.times[1] - self.transport.times[0], 0.19)
+
+    def test_quota(self):
+        self.use(BackoffTransport(quota_remaining=50),
+                 Scheduler(low_quota=100, max_quota_delay=1))
+        query(queries.questions.ALL, site="stackoverflow")
+        self.assertEqual(self.scheduler.quota_remaining, 50)
+        self.assertEqual(self.scheduler.quota_max, 300)
+        self.assertAlmostEqual(self.scheduler.quota_delay(), 0.5)
+
+class TestThrottleViolation(unittest.TestCase):
+    def test_blocks_every_endpoint(self):
+        scheduler = Scheduler()
+        scheduler.update(queries.questions.ALL, {
+            "error_id": 502, "error_name": "throttle_violation",
+            "error_message": "too many requests from this IP, more requests available in 30 seconds"})
+        self.assertGreater(scheduler.backoff_remaining(queries.answers.ALL), 29)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import time
+import unittest
+
+from pyse import query, queries, ObjectStore, set_object_store
+from pyse.records import Question
+
+import fakes
+from fakes import SettingsTestCase
+
+def question(i):
+    return {"question_id": i, "title": f"q{i}", "tags": ["python"] if i % 2 else ["rust"],
+            "owner": {"user_id": i % 3}, "creation_date": 1000 + i,
+            "last_activity_date": 2000 - i}
+
+class QuestionsTransport(fakes.FakeTransport):
+    """
+    Serves questions by id, the first page of `questions`, or one `python`
+    tag counting every question in `tags` and three in `users/{id}/tags`
+    """
+    def respond(self, url):
+        path = fakes.path(url)
+        if path[-1] == "tags":
+            items = [{"name": "python", "count": 3 if path[0] == "users" else 2000000}]
+        elif path[0] == "questions" and len(path) > 1:
+            # id 0 doesn't exist
+            items = [question(int(i)) for i in path[1].split(";") if i != "0"]
+        else:
+            items = [question(i) for i in range(1, 11)]
+        return {"items": items, "has_more": False, "quota_remaining": 99}
+
+class TestObjectStore(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.store = ObjectStore(os.path.join(self.dir.name, "objects.db"))
+        self.use_transport(QuestionsTransport())
+        self.replace(set_object_store, self.store)
+
+    def test_query_stores_items(self):
+        query(queries.questions.ALL, site="stackoverflow")
+        self.assertEqual(len(self.store), 10)
+        self.assertEqual(self.store.get("stackoverflow", "question", [3])[3], question(3))
+        self.assertEqual(self.store.get("serverfault", "question", [3]), {})
+
+    def test_untyped_endpoint_not_stored(self):
+        query(queries.badges.ALL, site="stackoverflow")
+        self.assertEqual(len(self.store), 0)
+
+    def test_lookup_fetches_only_missing(self):
+        query(queries.questions.ALL, site="stackoverflow")
+        self.transport.urls.clear()
+
+        r = self.store.lookup("questions/{ids}", ids=[12, 2, 11, 0, 4],
+                              site="stackoverflow")
+        self.assertEqual([i.question_id for i in r.items], [12, 2, 11, 4])
+        self.assertEqual(r.local, 2)
+        url, = self.transport.urls
+        self.assertIn("questions/12;11;0", url)
+
+        r = self.store.lookup("questions/{ids}", ids=[11, 12], site="stackoverflow",
+                              typed=True)
+        self.assertEqual(len(self.transport.urls), 1)
+        self.assertIsInstance(r.items[0], Question)
+
+    def test_lookup_string_ids(self):
+        query(queries.questions.ALL, site="stackoverflow")
+        self.transport.urls.clear()
+        r = self.store.lookup("questions/{ids}", ids=["2", "4"], site="stackoverflow")
+        self.assertEqual([i.question_id for i in r.items], [2, 4])
+        self.assertEqual(self.transport.urls, [])
+
+    def test_user_tags_not_stored(self):
+        query(queries.tags.ALL, site="stackoverflow")
+        query(queries.users.by_id.tags.ALL, id=1, site="stackoverflow")
+        self.assertEqual(self.store.get("stackoverflow", "tag", ["python"])["python"]["count"],
+                         2000000)
+
+    def test_lookup_stale(self):
+        self.store.lookup("questions/{ids}", ids=[1], site="stackoverflow")
+        time.sleep(0.01)
+        self.store.lookup("questions/{ids}", ids=[1], site="stackoverflow",
+                          max_age=0.001)
+        self.assertEqual(len(self.transport.urls), 2)
+
+    def test_lookup_filter(self):
+        self.store.lookup("questions/{ids}", ids=[1], site="stackoverflow")
+        self.store.lookup("questions/{ids}", ids=[1], site="stackoverflow",
+                          filter="!abc")
+        self.assertEqual(len(self.transport.urls), 2)
+
+    def test_lookup_needs_ids(self):
+        with self.assertRaises(ValueError):
+            self.store.lookup(queries.questions.ALL, ids=[1], site="stackoverflow")
+
+    def test_lookup_needs_own_ids(self):
+        for endpoint, ids in (("questions/{ids}/answers", [1, 2]),
+                              ("tags/{tags}/faq", ["python"])):
+            with self.assertRaises(ValueError):
+                self.store.lookup(endpoint, ids=ids, site="stackoverflow")
+        self.assertEqual(self.transport.urls, [])
+
+    def test_select(self):
+        query(queries.questions.ALL, site="stackoverflow")
+        python = self.store.select("stackoverflow", "question", tagged=["python"])
+        self.assertEqual([q["question_id"] for q in python], [9, 7, 5, 3, 1])
+        rows = self.store.select("stackoverflow", "question", owner_id=1, sort="activity",
+                                 order="asc")
+        self.assertEqual([q["question_id"] for q in rows], [10, 7, 4, 1])
+        rows = self.store.select("stackoverflow", "question", fromdate=1003, todate=1006,
+                                 limit=2)
+        self.assertEqual([q["question_id"] for q in rows], [6, 5])
+        self.assertEqual(self.store.select("stackoverflow", "question",
+                                           tagged=["python", "rust"]), [])
+
+    def test_retag(self):
+        self.store.put("stackoverflow", "question", [question(1)])
+        self.store.put("stackoverflow", "question", [dict(question(1), tags=["go"])])
+        self.assertEqual(self.store.select("stackoverflow", "question", tagged=["python"]), [])
+        self.assertEqual(len(self.store.select("stackoverflow", "question", tagged=["go"])), 1)
+
+if __name__ == "__main__":
+    unittest.main()
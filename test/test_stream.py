@@ -0,0 +1,92 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyse.api
+from pyse import query_stream, queries, set_transport, SessionTransport, set_json_backend
+from pyse.stream import iter_items
+
+wrapper = {
+    "items": [
+        {"question_id": i, "title": 'a "quoted\\" [title] {%d}' % i,
+         "tags": ["c#", "json"], "owner": {"user_id": i * 7}}
+        for i in range(50)
+    ],
+    "has_more": True,
+    "quota_max": 300,
+    "quota_remaining": 297,
+}
+
+def decode(chunks):
+    gen = iter_items(chunks)
+    items = []
+    while True:
+        try:
+            items.append(next(gen))
+        except StopIteration as stop:
+            return items, stop.value
+
+class TestIterItems(unittest.TestCase):
+    def test_any_chunk_size(self):
+        body = json.dumps(wrapper).encode()
+        for size in (1, 3, 64, len(body)):
+            items, rest = decode(body[i:i+size] for i in range(0, len(body), size))
+            self.assertEqual(items, wrapper["items"])
+            self.assertEqual(rest, {**wrapper, "items": []})
+
+    def test_error_response(self):
+        error = {"error_id": 400, "error_name": "bad_parameter", "error_message": "site"}
+        self.assertEqual(decode([json.dumps(error).encode()]), ([], error))
+
+    def test_json_backend(self):
+        calls = []
+        previous = set_json_backend(lambda b: calls.append(b) or json.loads(b))
+        try:
+            decode([json.dumps(wrapper).encode()])
+        finally:
+            set_json_backend(previous)
+        self.assertEqual(len(calls), 51)
+
+class GzipHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = gzip.compress(json.dumps(wrapper).encode())
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestQueryStream(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = pyse.api.api_base_url
+        pyse.api.api_base_url = "http://127.0.0.1:%d/2.2/" % self.server.server_port
+        self.transport = SessionTransport()
+        self.previous = set_transport(self.transport)
+
+    def tearDown(self):
+        set_transport(self.previous)
+        pyse.api.api_base_url = self.base_url
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stream(self):
+        r = query_stream(queries.questions.ALL, site="stackoverflow", chunk_size=512)
+        self.assertIsNone(r.wrapper)
+        ids = [q.owner.user_id for q in r]
+        self.assertEqual(ids, [i * 7 for i in range(50)])
+        self.assertTrue(r.has_more)
+        self.assertEqual(r.quota_remaining, 297)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+from pyse import sync, SyncState, queries
+
+import fakes
+from fakes import SettingsTestCase
+
+class ActivityTransport(fakes.FakeTransport):
+    """
+    Serves `objects` sorted by `sort` ascending, honouring `min`, `page`
+    and `pagesize`
+    """
+    def __init__(self, objects, sort="activity", id_field="question_id"):
+        super().__init__()
+        self.objects = objects
+        self.sort = sort
+        self.id_field = id_field
+
+    def respond(self, url):
+        qs = fakes.params(url)
+        assert qs["sort"] == self.sort and qs["order"] == "asc"
+        date_field = {"activity": "last_activity_date", "creation": "creation_date"}[self.sort]
+        low = int(qs.get("min", 0))
+        matching = sorted((o for o in self.objects.values() if o[date_field] >= low),
+                          key=lambda o: (o[date_field], o[self.id_field]))
+        return fakes.page_of(matching, qs)
+
+class TestSync(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        # three questions per second of activity
+        self.questions = {i: {"question_id": i, "last_activity_date": 1000 + i // 3}
+                          for i in range(30)}
+        self.use_transport(ActivityTransport(self.questions))
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "sync.db")
+
+    def run_sync(self, **parameters):
+        return [q.question_id for q in sync(queries.questions.ALL, SyncState(self.path),
+                                            site="stackoverflow", pagesize=4, **parameters)]
+
+    def test_full_then_delta(self):
+        self.assertEqual(self.run_sync(), list(range(30)))
+        self.assertEqual(self.run_sync(), [])
+
+        self.questions[5]["last_activity_date"] = 2000
+        self.questions[30] = {"question_id": 30, "last_activity_date": 2000}
+        self.assertEqual(self.run_sync(), [5, 30])
+        self.assertEqual(self.run_sync(), [])
+
+    def test_boundary_larger_than_page(self):
+        for q in self.questions.values():
+            q["last_activity_date"] = 1000
+        self.assertEqual(self.run_sync(), list(range(30)))
+        self.questions[30] = {"question_id": 30, "last_activity_date": 1000}
+        self.assertEqual(self.run_sync(), [30])
+
+    def test_resume(self):
+        state = SyncState(self.path)
+        seen = []
+        for q in sync(queries.questions.ALL, state, site="stackoverflow", pagesize=4):
+            seen.append(q.question_id)
+            if len(seen) == 10:
+                # crash in the middle of the third page
+                break
+        # the unfinished page is delivered again, nothing before it
+        self.assertEqual(self.run_sync(), list(range(7, 30)))
+
+    def test_nested_endpoint(self):
+        # every question shares one date, only their ids tell them apart
+        for q in self.questions.values():
+            q["last_activity_date"] = 1000
+        items = sync(queries.users.by_id.questions.ALL, SyncState(self.path), ids=[1],
+                     site="stackoverflow", pagesize=4)
+        self.assertEqual([q.question_id for q in items], list(range(30)))
+
+    def test_unknown_id_field(self):
+        with self.assertRaises(ValueError):
+            next(sync(queries.badges.ALL, SyncState(self.path), site="stackoverflow"))
+        items = sync(queries.users.by_id.questions.ALL, SyncState(self.path), ids=[1],
+                     site="stackoverflow", id_field="question_id")
+        self.assertEqual(len(list(items)), 30)
+
+    def test_creation_sort_default(self):
+        comments = {i: {"comment_id": i, "creation_date": 1000 + i // 3} for i in range(10)}
+        self.use_transport(ActivityTransport(comments, sort="creation", id_field="comment_id"))
+        items = sync("users/{ids}/mentioned", SyncState(self.path), ids=[1],
+                     site="stackoverflow", pagesize=4)
+        self.assertEqual([c.comment_id for c in items], list(range(10)))
+
+    def test_missing_date_field(self):
+        with self.assertRaises(ValueError):
+            next(sync(queries.users.ALL, SyncState(self.path), site="stackoverflow",
+                      sort="activity"))
+        self.assertEqual(len(self.transport.urls), 0)
+
+    def test_separate_watermarks(self):
+        self.run_sync()
+        self.assertEqual(len(self.run_sync(tagged=["python"])), 30)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyse import get_json, query, queries, SessionTransport, CassetteTransport, set_transport
+
+import fakes
+from fakes import SettingsTestCase
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        self.server.headers.append(dict(self.headers))
+        body = json.dumps({"items": [], "has_more": False}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestSessionTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.clients = set()
+        self.server.headers = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/2.2/info" % self.server.server_port
+        self.transport = SessionTransport(pool_maxsize=2)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        for _ in range(5):
+            j = get_json(self.url, transport=self.transport)
+            self.assertEqual(j, {"items": [], "has_more": False})
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_gzip_accepted(self):
+        get_json(self.url, transport=self.transport)
+        self.assertIn("gzip", self.server.headers[0]["Accept-Encoding"])
+
+    def test_set_transport(self):
+        previous = set_transport(self.transport)
+        try:
+            get_json(self.url)
+        finally:
+            set_transport(previous)
+        self.assertEqual(len(self.server.headers), 1)
+
+class CountingTransport(fakes.FakeTransport):
+    """
+    Answers with the number of requests sent so far, and 400 for 'bad' URLs
+    """
+    def respond(self, url):
+        return 400 if "bad" in url else 200, {"items": [{"n": len(self.urls)}],
+                                              "quota_remaining": 9000}
+
+class TestCassetteTransport(SettingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "cassette")
+        self.inner = CountingTransport()
+
+    def test_record_and_replay(self):
+        recorder = CassetteTransport(self.path, mode="record", transport=self.inner)
+        for url in ("http://a/2.2/info?key=secret", "http://a/2.2/info", "http://a/bad"):
+            recorder.get(url)
+        recorder.close()
+        with open(self.path + ".idx") as f:
+            self.assertNotIn("secret", f.read())
+
+        player = CassetteTransport(self.path)
+        self.assertEqual(len(player), 3)
+        # in recording order, then the last one again
+        for n in (1, 2, 2):
+            r = player.get("http://a/2.2/info?key=other")
+            self.assertEqual(r.json(), {"items": [{"n": n}], "quota_remaining": 9000})
+        r = player.get("http://a/bad")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(b"".join(r.iter_content(4)), r.content)
+        with self.assertRaises(LookupError):
+            player.get("http://a/2.2/sites")
+        player.close()
+        self.assertEqual(len(self.inner.urls), 3)
+
+    def test_once(self):
+        cassette = CassetteTransport(self.path, mode="once", transport=self.inner)
+        self.assertEqual(cassette.get("http://a/1").json()["items"][0]["n"], 1)
+        self.assertEqual(cassette.get("http://a/1").json()["items"][0]["n"], 1)
+        self.assertEqual(cassette.get("http://a/2").json()["items"][0]["n"], 2)
+        cassette.close()
+
+        cassette = CassetteTransport(self.path, mode="once", transport=self.inner)
+        cassette.get("http://a/2")
+        cassette.get("http://a/3")
+        cassette.close()
+        self.assertEqual(len(self.inner.urls), 3)
+
+    def test_replay_missing_cassette(self):
+        with self.assertRaises(FileNotFoundError):
+            CassetteTransport(self.path)
+
+    def test_query(self):
+        self.use_transport(CassetteTransport(self.path, mode="once", transport=self.inner))
+        first = query(queries.tags.ALL, site="stackoverflow")
+        set_transport(CassetteTransport(self.path))
+        second = query(queries.tags.ALL, site="stackoverflow")
+        self.assertEqual(first.items[0].n, second.items[0].n)
+        self.assertEqual(len(self.inner.urls), 1)
+
+if __name__ == "__main__":
+    unittest.main()